@@ -10,14 +10,6 @@ import asyncio
 import json
 import logging
 
-# Import Groq at the top level
-try:
-    from groq import AsyncGroq
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
-    AsyncGroq = None
-
 logger = logging.getLogger(__name__)
 
 # Knowledge base - In production, this would be from vector DB
@@ -94,12 +86,14 @@ class BudgetAgent:
     def _init_groq_client(self):
         """Initialize Groq client separately to avoid circular imports"""
         try:
-            if not GROQ_AVAILABLE:
-                logger.warning("⚠️ Groq library not available")
-                return
-            
             GROQ_API_KEY = os.getenv("GROQ_API_KEY")
             if GROQ_API_KEY and GROQ_API_KEY != "your-groq-key-here":
+                # Imported here, not at module level: only a configured key pays for the SDK
+                try:
+                    from groq import AsyncGroq
+                except ImportError:
+                    logger.warning("⚠️ Groq library not available")
+                    return
                 self.groq_client = AsyncGroq(api_key=GROQ_API_KEY)
                 logger.info("✅ Groq client initialized successfully")
             else:
@@ -142,7 +136,7 @@ class BudgetAgent:
             prompt = self._build_prompt(jamaah, duration, budget_max, preferences)
             
             # Call Groq API with timeout
-            logger.info(f"Calling Groq API for {jamaah} jamaah, {duration} days")
+            logger.info("Calling Groq API for %d jamaah, %d days", jamaah, duration)
             
             response = await asyncio.wait_for(
                 self.groq_client.chat.completions.create(
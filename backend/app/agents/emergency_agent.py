@@ -3,11 +3,32 @@
 Emergency Assistance Agent
 """
 from app.agents.base_agent import BaseAgent
+from app.services.regions import region_resolver, region_label
+from app.services.poi_index import poi_index
 from typing import Dict, Any
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def location_context(latitude: float, longitude: float) -> str:
+    """Where the jamaah is + nearest hospitals (offline, no API)"""
+    lines = []
+    region = region_resolver.resolve(latitude, longitude)
+    if region:
+        lines.append(f"📍 Lokasi Anda: {region_label(region)}")
+        if region["kind"] == "masyair":
+            lines.append("⛺ Di Masyair: cari pos kesehatan atau petugas haji terdekat")
+    
+    hospitals = poi_index.nearest(latitude, longitude, k=3, categories=["hospital"], max_km=20)
+    if hospitals:
+        lines.append("")
+        lines.append("🏥 Rumah sakit terdekat:")
+        for hospital in hospitals:
+            lines.append(f"- {hospital['name']} ({hospital['distance_km']:.1f} km)")
+    return "\n".join(lines)
+
+
 class EmergencyAgent(BaseAgent):
     """Agent for emergency situations"""
     
@@ -55,16 +76,25 @@ class EmergencyAgent(BaseAgent):
         try:
             query = input_data.get("query", "").lower()
             emergency_type = input_data.get("type", "general")
+            user_location = input_data.get("user_location")
             
             # Detect emergency type
             if any(word in query for word in ['sakit', 'medis', 'rumah sakit', 'ambulans']):
-                return self._medical_emergency()
+                result = self._medical_emergency()
             elif any(word in query for word in ['hilang', 'paspor', 'dompet', 'polisi']):
-                return self._lost_items_emergency()
+                result = self._lost_items_emergency()
             elif any(word in query for word in ['tersesat', 'lost', 'tidak tahu']):
-                return self._lost_location_emergency()
+                result = self._lost_location_emergency()
             else:
-                return self._general_emergency_info()
+                result = self._general_emergency_info()
+            
+            # Shared location: say where they are and what is nearest
+            if user_location:
+                context = location_context(user_location.get("lat"), user_location.get("lon"))
+                if context:
+                    result["response"] = f"{context}\n\n{result['response']}"
+            
+            return result
                 
         except Exception as e:
             logger.error(f"Error in EmergencyAgent: {e}")
@@ -7,6 +7,7 @@ from app.agents.guide_agent import GuideAgent
 from app.agents.doa_agent import DoaAgent
 from app.agents.budget_agent import BudgetAgent
 from app.agents.location_agent import LocationAgent
+from app.core.metrics import AGENT_SECONDS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -27,19 +28,16 @@ class AgentOrchestrator:
         # Determine which agent should handle the query
         agent_name = self._classify_query(query)
         
-        logger.info(f"Routing query to {agent_name} agent: {query}")
+        logger.info("Routing query to %s agent", agent_name, extra={"query_chars": len(query)})
         
         # Execute agent
         agent = self.agents.get(agent_name)
-        if agent:
-            result = await agent.execute({
-                "query": query,
-                "context": context or {}
-            })
-            return result
-        else:
+        if not agent:
             # Fallback to guide agent
-            return await self.agents["guide"].execute({
+            agent_name, agent = "guide", self.agents["guide"]
+        
+        with AGENT_SECONDS.time(agent_name):
+            return await agent.execute({
                 "query": query,
                 "context": context or {}
             })
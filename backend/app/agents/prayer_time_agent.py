@@ -3,10 +3,18 @@
 Prayer Time Agent with Real-time Data
 """
 from app.agents.base_agent import BaseAgent
-from typing import Dict, Any
+from app.services.prayer_engine import (
+    resolve_location_key,
+    guess_utc_offset,
+    local_today,
+    KNOWN_LOCATIONS,
+    TIMING_KEYS
+)
+from app.services.prayer_tables import prayer_tables
+from app.services.regions import region_resolver, region_label
+from app.services.free_prayer_times import prayer_times_service
+from typing import Dict, Any, Optional
 from datetime import datetime
-import pytz
-import requests
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,22 +27,36 @@ class PrayerTimeAgent(BaseAgent):
             name="Prayer Time Agent",
             description="Provides accurate prayer times based on location"
         )
-        self.api_url = "https://api.aladhan.com/v1/timings"
     
     async def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """Get prayer times for location"""
         try:
-            location = input_data.get("location", "Makkah")
-            date = input_data.get("date", datetime.now())
+            user_location = input_data.get("user_location")
+            date = input_data.get("date")
             
             # Get coordinates
-            coords = self._get_coordinates(location)
+            if user_location:
+                coords = {
+                    "latitude": user_location.get("lat"),
+                    "longitude": user_location.get("lon"),
+                    "utc_offset": guess_utc_offset(user_location.get("lat"), user_location.get("lon"))
+                }
+                # Inside a city boundary -> that city's precomputed table
+                region = region_resolver.resolve(coords["latitude"], coords["longitude"])
+                city = region["city_key"] if region and region["kind"] == "city" else None
+                location = input_data.get("location") or (region_label(region) if region else "Lokasi Anda")
+            else:
+                coords = self._get_coordinates(input_data.get("location") or "Makkah")
+                city = coords["city_key"]
+                location = coords["name"]
             
             # Fetch prayer times
             prayer_times = await self._fetch_prayer_times(
                 coords["latitude"],
                 coords["longitude"],
-                date
+                date,
+                coords.get("utc_offset"),
+                city
             )
             
             # Format response
@@ -55,44 +77,60 @@ class PrayerTimeAgent(BaseAgent):
                 "error": str(e)
             }
     
-    def _get_coordinates(self, location: str) -> Dict[str, float]:
-        """Get coordinates for location"""
+    def _get_coordinates(self, location: str) -> Dict[str, Any]:
+        """Coordinates for a city, masyair or miqat name (Makkah if unknown)"""
         # Predefined major locations
-        locations = {
-            "makkah": {"latitude": 21.4225, "longitude": 39.8262},
-            "madinah": {"latitude": 24.5247, "longitude": 39.5692},
-            "jeddah": {"latitude": 21.5433, "longitude": 39.1728},
-        }
+        city = resolve_location_key(location)
+        if city:
+            return {**KNOWN_LOCATIONS[city], "city_key": city}
+        
+        # Mina, Arafah, Bir Ali, ... from the region boundaries
+        region = region_resolver.find(location)
+        if region:
+            return {
+                "name": region_label(region),
+                "latitude": region["latitude"],
+                "longitude": region["longitude"],
+                "utc_offset": guess_utc_offset(region["latitude"], region["longitude"]),
+                "city_key": None
+            }
         
-        return locations.get(location.lower(), locations["makkah"])
+        logger.info("Unknown location %r, using Makkah", location)
+        makkah = KNOWN_LOCATIONS["makkah"]
+        return {
+            **makkah,
+            "name": f"{makkah['name']} ('{location}' tidak dikenal)",
+            "city_key": "makkah"
+        }
     
     async def _fetch_prayer_times(
         self,
         lat: float,
         lon: float,
-        date: datetime
+        date: Optional[datetime] = None,
+        utc_offset: Optional[float] = None,
+        city: Optional[str] = None
     ) -> Dict[str, str]:
-        """Fetch prayer times from API"""
+        """Prayer times from the precomputed table, else computed locally"""
         try:
-            timestamp = int(date.timestamp())
-            url = f"{self.api_url}/{timestamp}"
-            
-            params = {
-                "latitude": lat,
-                "longitude": lon,
-                "method": 4  # Umm Al-Qura University, Makkah
-            }
+            if date:
+                day = date.date()
+            elif utc_offset is not None:
+                day = local_today(utc_offset)
+            else:
+                day = None
             
-            response = requests.get(url, params=params, timeout=10)
-            data = response.json()
+            if city and day:
+                tabled = prayer_tables.get_timings(city, day)
+                if tabled:
+                    return tabled
             
-            if data["code"] == 200:
-                return data["data"]["timings"]
-            else:
-                raise Exception("API returned error")
+            # Arbitrary coordinates: geohash-bucketed cache (shared per day)
+            result = await prayer_times_service.get_prayer_times(lat, lon, date)
+            return {key: result[key.lower()] for key in TIMING_KEYS}
                 
         except Exception as e:
-            logger.error(f"Error fetching prayer times: {e}")
+            logger.error(f"Error computing prayer times: {e}")
             # Return default Makkah times as fallback
             return {
                 "Fajr": "05:00",
@@ -2,8 +2,20 @@
 """Advanced Features API"""
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from datetime import datetime
+from app.services.prayer_engine import (
+    prayer_engine,
+    resolve_location_key,
+    guess_utc_offset,
+    local_today,
+    KNOWN_LOCATIONS
+)
+from app.services.prayer_tables import prayer_tables
+from app.services.poi_index import poi_index
+from app.services.free_maps import free_maps
+from app.services.routing import routing_engine
+from app.services.regions import region_resolver, region_label
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,47 +24,262 @@ router = APIRouter()
 class PrayerTimeRequest(BaseModel):
     location: str = "Makkah"
     date: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+
+def _resolve_place(request: PrayerTimeRequest):
+    """
+    (table city key or None, place dict) for a name or coordinates
+
+    place["key"] is the canonical name to ask for again (city key or region
+    id); an unknown name gets Makkah times, labelled and with "resolved" False.
+    """
+    if request.latitude is not None and request.longitude is not None:
+        lat, lon = request.latitude, request.longitude
+        region = region_resolver.resolve(lat, lon)
+        if region and region["kind"] == "city" and region["city_key"] in KNOWN_LOCATIONS:
+            city = region["city_key"]
+            return city, {**KNOWN_LOCATIONS[city], "key": city, "resolved": True}
+        name, key = (region_label(region), region["id"]) if region else ("Lokasi Anda", None)
+    else:
+        city = resolve_location_key(request.location)
+        if city:
+            return city, {**KNOWN_LOCATIONS[city], "key": city, "resolved": True}
+        region = region_resolver.find(request.location)
+        if not region:
+            makkah = KNOWN_LOCATIONS["makkah"]
+            return "makkah", {
+                **makkah,
+                "name": f"{makkah['name']} (lokasi '{request.location}' tidak dikenali)",
+                "key": None,
+                "resolved": False
+            }
+        name, key = region_label(region), region["id"]
+        lat, lon = region["latitude"], region["longitude"]
+    
+    return None, {
+        "name": name,
+        "latitude": lat,
+        "longitude": lon,
+        "utc_offset": guess_utc_offset(lat, lon),
+        "key": key,
+        "resolved": True
+    }
+
 
 @router.post("/prayer-times")
 async def prayer_times(request: PrayerTimeRequest):
-    """Prayer times endpoint"""
+    """
+    Prayer times endpoint - computed offline (Umm Al-Qura)
+    
+    By name (city, masyair, miqat) or by "latitude"/"longitude"; points
+    inside a city boundary use that city's precomputed table.
+    """
     try:
-        now = datetime.now()
+        city, place = _resolve_place(request)
+        utc_offset = place["utc_offset"]
+        day = request.date.date() if request.date else local_today(utc_offset)
         
-        response_text = f"""Jadwal Sholat - {request.location.title()}
-Tanggal: {now.strftime('%A, %d %B %Y')}
+        # Popular cities: O(1) lookup in the memory-mapped yearly table
+        times = prayer_tables.get_timings(city, day) if city else None
+        if times is None:
+            times = prayer_engine.get_timings(
+                place["latitude"], place["longitude"], day, utc_offset
+            )
+        hijri = prayer_engine.hijri_date(day)
+        
+        response_text = f"""Jadwal Sholat - {place['name']}
+Tanggal: {day.strftime('%A, %d %B %Y')}
+Hijriah: {hijri['day']} {hijri['month']['en']} {hijri['year']} H
 
 Waktu Sholat:
-- Subuh: 05:00
-- Terbit: 06:20
-- Dzuhur: 12:30
-- Ashar: 15:45
-- Maghrib: 18:15
-- Isya: 19:45
-
-Lokasi: {request.location.title()}
+- Subuh: {times['Fajr']}
+- Terbit: {times['Sunrise']}
+- Dzuhur: {times['Dhuhr']}
+- Ashar: {times['Asr']}
+- Maghrib: {times['Maghrib']}
+- Isya: {times['Isha']}
+
+Lokasi: {place['name']}
 Metode: Umm Al-Qura, Makkah
 
 Tips:
 - Sholat 15 menit setelah adzan
-- Cek jadwal di hotel untuk waktu akurat
-
-Waktu approximate untuk Makkah"""
+- Cek jadwal di hotel untuk waktu akurat"""
         
         return {
             "agent": "Prayer Times",
-            "response": response_text
+            "response": response_text,
+            "data": {
+                "location": place["name"],
+                "location_key": place["key"],
+                "resolved": place["resolved"],
+                "date": day.isoformat(),
+                "utc_offset": utc_offset,
+                "hijri": hijri,
+                "timings": times
+            }
         }
         
     except Exception as e:
         logger.error(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+# Query keywords -> POI categories for location-aware navigation
+NAVIGATION_CATEGORIES = [
+    (("rumah sakit", "rs ", "hospital", "klinik", "dokter"), ["hospital"]),
+    (("apotek", "obat", "pharmacy"), ["pharmacy"]),
+    (("pintu", "gate", "bab "), ["haram_gate"]),
+    (("atm", "bank", "uang", "tukar"), ["atm"]),
+    (("makan", "restoran", "restaurant", "kuliner"), ["restaurant"]),
+    (("hotel", "penginapan", "menginap"), ["hotel"]),
+    (("masjid", "mosque"), ["mosque", "landmark"]),
+]
+
+CATEGORY_LABELS = {
+    "hotel": "🏨 Hotel",
+    "hospital": "🏥 Rumah Sakit",
+    "pharmacy": "💊 Apotek",
+    "haram_gate": "🚪 Pintu Masjid",
+    "restaurant": "🍽️ Tempat Makan",
+    "atm": "🏧 ATM",
+    "mosque": "🕌 Masjid",
+    "landmark": "📍 Lokasi Penting",
+}
+
+WALKING_KM_PER_MIN = 0.075  # ~4.5 km/h, crowded streets
+
+HARAM_KEYS = ("masjidil_haram", "masjid_nabawi")
+HOTEL_CANDIDATES = 4  # Nearest limit * 4 hotels go into the Haram re-ranking
+
+
+def _rank_hotels(lat: float, lon: float, hotels: List[Dict], limit: int) -> List[Dict]:
+    """
+    Rank hotels by the walk to the user and to the nearer Haram alike
+
+    Pilgrims pick hotels by the Haram, not only by where they stand; the
+    winners are re-measured with Vincenty.
+    """
+    harams = [
+        (free_maps.important_locations[key]["lat"], free_maps.important_locations[key]["lon"])
+        for key in HARAM_KEYS
+    ]
+    haram = harams[int(free_maps.distance_matrix([(lat, lon)], harams)[0].argmin())]
+    
+    ranked = free_maps.rank_by_distance(
+        [(h["coordinates"]["latitude"], h["coordinates"]["longitude"]) for h in hotels],
+        [(lat, lon), haram],
+        top=limit
+    )
+    results = []
+    for rank in ranked:
+        hotel = hotels[rank["index"]]
+        hotel["distance_km"], hotel["haram_km"] = rank["distances_km"]
+        results.append(hotel)
+    return results
+
+
+def _navigation_categories(query: str) -> Optional[List[str]]:
+    for keywords, categories in NAVIGATION_CATEGORIES:
+        if any(word in query for word in keywords):
+            return categories
+    return None
+
+
+def _format_nearby(results: List[Dict], categories: Optional[List[str]]) -> str:
+    title = CATEGORY_LABELS.get(categories[0], "📍 Lokasi") if categories else "📍 Lokasi"
+    if not results:
+        return f"""{title} Terdekat
+
+Tidak ditemukan dalam radius pencarian.
+Coba perbesar radius atau tanya petugas/hotel terdekat."""
+    
+    lines = [f"{title} Terdekat", ""]
+    for i, poi in enumerate(results, 1):
+        distance = poi["distance_km"]
+        walk = max(1, round(distance / WALKING_KM_PER_MIN))
+        shown = f"{distance * 1000:.0f} m" if distance < 1 else f"{distance:.1f} km"
+        lines.append(f"{i}. {poi['name']}")
+        lines.append(f"   {shown} - jalan kaki ±{walk} menit")
+        if "haram_km" in poi:
+            lines.append(f"   {poi['haram_km']:.1f} km ke Masjid")
+    return "\n".join(lines)
+
+
+def _format_route(route: Dict, destination: str) -> str:
+    distance = route["distance_m"]
+    shown = f"{distance} m" if distance < 1000 else f"{distance / 1000:.1f} km"
+    return f"""🚶 Rute Jalan Kaki
+
+Tujuan: {destination}
+Jarak: {shown} (±{route['duration_min']} menit)
+
+Ikuti jalur pejalan kaki, perhatikan arus jamaah."""
+
+
 @router.post("/navigation")
 async def navigation(request: dict):
-    """Navigation endpoint"""
+    """
+    Navigation endpoint
+    
+    With coordinates ("latitude"/"longitude" or "lat"/"lon") the answer comes
+    from the offline POI index; optional "category", "radius_km" and "limit".
+    With "to_latitude"/"to_longitude" - or when asking for a Haram gate - a
+    walking route from the offline pedestrian graph is included.
+    """
     try:
         query = request.get("query", "").lower()
+        lat = request.get("latitude", request.get("lat"))
+        lon = request.get("longitude", request.get("lon"))
+        to_lat = request.get("to_latitude", request.get("to_lat"))
+        to_lon = request.get("to_longitude", request.get("to_lon"))
+        
+        region = None
+        if lat is not None and lon is not None:
+            region = region_resolver.resolve(float(lat), float(lon))
+        where = f"📍 Lokasi Anda: {region_label(region)}\n\n" if region else ""
+        
+        if lat is not None and lon is not None and to_lat is not None and to_lon is not None:
+            route = routing_engine.route(float(lat), float(lon), float(to_lat), float(to_lon))
+            if route:
+                return {
+                    "agent": "Navigation",
+                    "response": where + _format_route(route, request.get("destination", "Lokasi tujuan")),
+                    "route": route,
+                    "region": region
+                }
+        
+        if lat is not None and lon is not None:
+            category = request.get("category")
+            categories = [category] if category else _navigation_categories(query)
+            limit = int(request.get("limit", 5))
+            hotels = categories == ["hotel"]
+            results = poi_index.nearest(
+                float(lat),
+                float(lon),
+                # Hotels: a wider candidate pool, re-ranked below
+                k=limit * HOTEL_CANDIDATES if hotels else limit,
+                categories=categories,
+                max_km=float(request.get("radius_km", 10))
+            )
+            if hotels and results:
+                results = _rank_hotels(float(lat), float(lon), results, limit)
+            response = _format_nearby(results, categories)
+            
+            route = None
+            if categories == ["haram_gate"]:
+                route = routing_engine.route_to_nearest(float(lat), float(lon))
+                if route:
+                    response = _format_route(route, route["destination"]["name"]) + "\n\n" + response
+            
+            return {
+                "agent": "Navigation",
+                "response": where + response,
+                "results": results,
+                "route": route,
+                "region": region
+            }
         
         if "hotel" in query:
             response = """Hotel Dekat Masjidil Haram
@@ -107,7 +334,8 @@ Jarak dalam Haram:
 - 1x thawaf: 450m
 - 7x thawaf: 3.1km
 
-Tanya: hotel terdekat atau tempat makan"""
+Tanya: hotel terdekat atau tempat makan
+Kirim lokasi untuk jarak dari posisi Anda"""
         
         return {
             "agent": "Navigation",
@@ -120,9 +348,16 @@ Tanya: hotel terdekat atau tempat makan"""
 
 @router.post("/emergency")
 async def emergency(request: dict):
-    """Emergency endpoint"""
+    """
+    Emergency endpoint
+    
+    With "latitude"/"longitude" the answer starts with the resolved region
+    (e.g. Mina) and the nearest hospitals.
+    """
     try:
         emerg_type = request.get("type", "general")
+        lat = request.get("latitude", request.get("lat"))
+        lon = request.get("longitude", request.get("lon"))
         
         if emerg_type == "medical":
             response = """DARURAT MEDIS
@@ -156,6 +391,12 @@ KJRI Jeddah:
 
 Ketik: darurat medis untuk info kesehatan"""
         
+        if lat is not None and lon is not None:
+            from app.agents.emergency_agent import location_context
+            context = location_context(float(lat), float(lon))
+            if context:
+                response = f"{context}\n\n{response}"
+        
         return {
             "agent": "Emergency",
             "response": response
@@ -8,6 +8,8 @@ from pydantic import BaseModel
 from typing import Optional, Dict
 import logging
 
+from app.core.metrics import AGENT_SECONDS
+
 logger = logging.getLogger(__name__)
 
 # ✅ Create router with correct prefix
@@ -70,15 +72,16 @@ async def optimize_budget(request: BudgetRequest):
         # Create agent instance
         agent = BudgetAgent()
         
-        logger.info(f"Budget optimization request: {request.jamaah} jamaah, {request.duration} days")
+        logger.info("Budget optimization request: %d jamaah, %d days", request.jamaah, request.duration)
         
         # Call agent
-        result = await agent.analyze_and_recommend(
-            jamaah=request.jamaah,
-            duration=request.duration,
-            budget_max=request.budget_max,
-            preferences=request.preferences or {}
-        )
+        with AGENT_SECONDS.time("budget"):
+            result = await agent.analyze_and_recommend(
+                jamaah=request.jamaah,
+                duration=request.duration,
+                budget_max=request.budget_max,
+                preferences=request.preferences or {}
+            )
         
         # Check for errors in result
         if "error" in result:
@@ -90,7 +93,7 @@ async def optimize_budget(request: BudgetRequest):
             logger.error("No packages in result")
             raise HTTPException(status_code=500, detail="Failed to generate packages")
         
-        logger.info(f"✅ Generated {len(result['packages'])} packages")
+        logger.info("✅ Generated %d packages", len(result["packages"]))
         
         return {
             "status": "success",
@@ -3,7 +3,7 @@
 Configuration with FREE APIs
 """
 from pydantic_settings import BaseSettings
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 class Settings(BaseSettings):
     """Application settings with FREE API options"""
@@ -35,6 +35,50 @@ class Settings(BaseSettings):
     
     # Free Location Services (NO API KEY NEEDED!)
     NOMINATIM_USER_AGENT: str = "umrah-assistant-app"  # For OpenStreetMap
+    NOMINATIM_MIN_INTERVAL: float = 1.0  # Usage policy: max 1 request/second
+    GEOCODE_CACHE_PATH: Optional[str] = None  # Default: data/geocode_cache.sqlite3
+    
+    # Offline points of interest (see data/poi/README.md)
+    POI_DATA_DIR: Optional[str] = None  # Default: data/poi
+    
+    # Region boundaries: cities, masyair, miqat (see data/regions/README.md)
+    REGIONS_PATH: Optional[str] = None  # Default: data/regions/regions.geojson
+    
+    # Offline pedestrian routing (see data/routing/README.md)
+    ROUTING_DATA_DIR: Optional[str] = None  # Default: data/routing
+    ROUTE_CACHE_SIZE: int = 2048
+    
+    # Precomputed prayer tables (build: python -m app.services.prayer_tables)
+    PRAYER_TABLE_DIR: Optional[str] = None  # Default: data/prayer_tables
+    PRAYER_TABLE_CITIES: List[str] = [
+        "makkah", "madinah", "jeddah",
+        "jakarta", "surabaya", "medan", "makassar", "solo", "batam",
+        "padang", "palembang", "banda_aceh", "banjarmasin", "balikpapan", "lombok"
+    ]
+    
+    # Prayer times cache for arbitrary coordinates
+    PRAYER_CACHE_MAX_ENTRIES: int = 10000
+    PRAYER_CACHE_GEOHASH_PRECISION: int = 5  # ~5 km buckets
+    
+    # Logging (see app/core/logging_config.py)
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: Optional[str] = "api.log"  # Empty: stdout only
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024  # Rotated at 10 MB
+    LOG_BACKUP_COUNT: int = 5
+    LOG_JSON: bool = True
+    LOG_QUEUE_SIZE: int = 10000  # Records beyond this are dropped, never waited for
+    # Share of INFO/DEBUG records kept for hot-path loggers (1.0 = all)
+    LOG_SAMPLE_RATES: Dict[str, float] = {
+        "app.agents.orchestrator": 0.1,
+        "app.rag.retriever": 0.1,
+        "app.rag.groq_llm": 0.1,
+        "app.api.v1.budget_routes": 0.25,
+        "app.agents.budget_agent": 0.25,
+        "app.agents.prayer_time_agent": 0.25
+    }
+    
+    # Startup budget (checked by `python -m app.core.import_budget`)
+    STARTUP_IMPORT_BUDGET_MS: int = 1000  # `import app.main`, cumulative
     
     # CORS
     ALLOWED_ORIGINS: List[str] = ["*"]
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Startup Import Budget
+Imports app.main in a fresh interpreter under `python -X importtime` and
+fails when the import takes longer than STARTUP_IMPORT_BUDGET_MS, or when
+one of the heavy provider SDKs (LAZY_PACKAGES) is imported at startup
+instead of on first use.
+
+The best of a few runs is kept (disk cache and CPU noise only add time).
+Self time is summed per top-level package, so the report shows where the
+budget goes: fastapi/pydantic, numpy, app itself, ...
+
+Run with:
+    python -m app.core.import_budget
+    python -m app.core.import_budget --budget-ms 800 --runs 5
+"""
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import argparse
+import os
+import subprocess
+import sys
+
+from app.config import settings
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+ENTRY_MODULE = "app.main"
+
+# Imported by the agents/RAG services on first use - never at startup
+LAZY_PACKAGES = ("openai", "anthropic", "groq", "qdrant_client", "geopy")
+
+
+class ImportProfile:
+    """One `-X importtime` run, limited to the modules imported by `module`"""
+
+    def __init__(self, module: str, modules: Dict[str, Tuple[int, int]]):
+        self.module = module
+        self.modules = modules  # name -> (self µs, cumulative µs)
+
+    @classmethod
+    def parse(cls, stderr: str, module: str = ENTRY_MODULE) -> "ImportProfile":
+        # Children are printed (indented) before the module that imported them
+        pending: Dict[str, Tuple[int, int]] = {}
+        for line in stderr.splitlines():
+            # "import time:       self [us] |   cumulative | imported package"
+            if not line.startswith("import time:"):
+                continue
+            fields = line[len("import time:"):].split("|")
+            if len(fields) != 3 or not fields[0].strip().isdigit():
+                continue
+            name = fields[2][1:].rstrip()  # Nesting is shown by the indent
+            pending[name.strip()] = (int(fields[0]), int(fields[1]))
+            if not name.startswith(" "):
+                if name == module:
+                    return cls(module, pending)
+                pending = {}
+        return cls(module, {})
+
+    def total_ms(self) -> Optional[float]:
+        if self.module not in self.modules:
+            return None
+        return self.modules[self.module][1] / 1000
+
+    def by_package(self) -> List[Tuple[str, float]]:
+        """Self time summed per top-level package, heaviest first (ms)"""
+        totals: Dict[str, int] = defaultdict(int)
+        for name, (own, _) in self.modules.items():
+            totals[name.split(".")[0]] += own
+        return sorted(((package, us / 1000) for package, us in totals.items()), key=lambda item: -item[1])
+
+    def imported(self, packages: Tuple[str, ...]) -> List[str]:
+        roots = {name.split(".")[0] for name in self.modules}
+        return [package for package in packages if package in roots]
+
+
+def profile_startup(module: str = ENTRY_MODULE) -> ImportProfile:
+    """Import `module` in a fresh interpreter and parse its import timings"""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", LOG_FILE="")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return ImportProfile.parse(result.stderr, module)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail when importing the API exceeds its startup budget")
+    parser.add_argument("--budget-ms", type=float, default=settings.STARTUP_IMPORT_BUDGET_MS)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to try; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Packages listed in the report")
+    parser.add_argument("--module", default=ENTRY_MODULE)
+    args = parser.parse_args()
+
+    try:
+        profiles = [profile_startup(args.module) for _ in range(max(1, args.runs))]
+    except RuntimeError as e:
+        print(f"✗ {e}", file=sys.stderr)
+        sys.exit(2)
+
+    best = min(profiles, key=lambda profile: profile.total_ms() or float("inf"))
+    total = best.total_ms()
+    if total is None:
+        print(f"✗ {args.module} missing from the -X importtime output", file=sys.stderr)
+        sys.exit(2)
+
+    print(f"import {args.module}: {total:.0f} ms (budget {args.budget_ms:.0f} ms, best of {len(profiles)})")
+    for package, ms in best.by_package()[:args.top]:
+        print(f"  {ms:8.1f} ms  {package}")
+
+    failed = False
+    eager = best.imported(LAZY_PACKAGES)
+    if eager:
+        print(f"✗ Imported at startup, should load on first use: {', '.join(eager)}")
+        failed = True
+    if total > args.budget_ms:
+        print(f"✗ Over budget by {total - args.budget_ms:.0f} ms")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("✓ Within budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Non-blocking Logging
+Request handlers never write logs themselves: records go into a bounded
+in-memory queue (QueueHandler) and a background thread (QueueListener)
+formats and writes them to stdout and a size-rotated file.
+
+- lazy: %-style arguments are merged and JSON-encoded in the listener
+  thread, not on the event loop (use logger.info("x %s", y), not f-strings)
+- structured: one JSON object per line, `extra={...}` fields included
+- sampled: hot-path modules (LOG_SAMPLE_RATES) keep only a share of their
+  INFO/DEBUG records; warnings and errors always pass
+- never blocking: when the queue is full the record is dropped and counted
+"""
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+import atexit
+import json
+import logging
+import queue
+import sys
+
+# Attributes every LogRecord has - anything else came in through `extra`
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep every n-th INFO/DEBUG record of the configured loggers
+    (rate 0.1 -> every 10th; child loggers inherit their parent's rate)
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._every: Dict[str, int] = {}
+        self._seen: Dict[str, int] = {}
+
+    def _interval(self, name: str) -> int:
+        every = self._every.get(name)
+        if every is None:
+            rate, prefix = 1.0, name
+            while prefix:
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+                prefix = prefix.rpartition(".")[0]
+            every = self._every[name] = 0 if rate <= 0 else max(1, round(1 / rate))
+        return every
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        every = self._interval(record.name)
+        if every == 1:
+            return True
+        if every == 0:
+            return False
+        seen = self._seen[record.name] = self._seen.get(record.name, 0) + 1
+        return seen % every == 1
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler that hands over the raw record and never waits"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The queue stays in-process: no pickling, so message formatting can
+        # wait for the listener thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class DrainingQueueListener(QueueListener):
+    """Stop marker waits for room, so a full queue is still written out on shutdown"""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel, timeout=5)
+
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[NonBlockingQueueHandler] = None
+
+
+def setup_logging(
+    level: str = "INFO",
+    log_file: Optional[str] = "api.log",
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    json_format: bool = True,
+    queue_size: int = 10000,
+    sample_rates: Optional[Dict[str, float]] = None
+) -> NonBlockingQueueHandler:
+    """Route the root logger through the queue; safe to call more than once"""
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        return _queue_handler
+
+    if json_format:
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    outputs = [logging.StreamHandler(sys.stdout)]
+    if log_file:
+        outputs.append(RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+        ))
+    for output in outputs:
+        output.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    if sample_rates:
+        _queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper())
+
+    _listener = DrainingQueueListener(log_queue, *outputs, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _queue_handler
+
+
+def stop_logging():
+    """
+    Detach the queue handler, write out what is still queued and stop the
+    listener thread; setup_logging can run again afterwards (--reload, a
+    second lifespan in tests)
+    """
+    global _listener, _queue_handler
+    if _queue_handler is not None:
+        logging.getLogger().removeHandler(_queue_handler)
+    if _listener is not None:
+        _listener.stop()
+        for output in _listener.handlers:
+            output.close()
+        _listener = None
+    if _queue_handler is not None:
+        if _queue_handler.dropped:
+            print(f"logging: {_queue_handler.dropped} records dropped (queue full)", file=sys.stderr)
+        _queue_handler.close()
+        _queue_handler = None
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Prometheus Metrics
+In-process counters and histograms, rendered in the Prometheus text format
+at GET /metrics.
+
+- umrah_http_request_duration_seconds{method,route,status}: every request,
+  labelled with the route template (/api/v1/users/{user_id}), not the path
+- umrah_agent_duration_seconds{agent,outcome}
+- umrah_llm_request_duration_seconds{provider,outcome}, umrah_llm_tokens_total
+- umrah_external_api_duration_seconds{api,outcome}: Nominatim, Qdrant, ...
+- umrah_cache_requests_total{cache,result}, umrah_cache_entries{cache}:
+  read from the registered caches' stats() when scraped
+
+An observation is a dict lookup, a bisect and two additions on the event
+loop thread (~1 µs) - cheap enough to stay on in production. Calls handed
+to worker threads are timed around the await, so no locks are needed.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Starlette appends the charset
+
+# Seconds; LLM and geocoding calls reach into the tens of seconds
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], le: str = None) -> str:
+    pairs = [
+        '%s="%s"' % (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+class Counter:
+    """Monotonic counter, one value per label combination"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """
+    Latency histogram, one series per label combination
+
+    Counts are kept per bucket (a single increment per observation) and
+    summed into Prometheus' cumulative buckets only when scraped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._bounds = [repr(float(b)) for b in self.buckets] + ["+Inf"]
+        self._series: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, seconds: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            # [bucket counts..., +Inf count, sum]
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    @contextmanager
+    def time(self, *labels: str):
+        """Observe the block's duration with an extra "ok"/"error" outcome label"""
+        started = perf_counter()
+        outcome = "error"
+        try:
+            yield
+            outcome = "ok"
+        finally:
+            self.observe(perf_counter() - started, *labels, outcome)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self._bounds, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, bound)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CacheStats:
+    """Hit/miss counters and sizes of the registered caches, read at scrape time"""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], Dict[str, int]]] = {}
+
+    def register(self, cache: str, stats: Callable[[], Dict[str, int]]):
+        self._sources[cache] = stats
+
+    def collect(self) -> List[str]:
+        requests = [
+            "# HELP umrah_cache_requests_total Cache lookups by result",
+            "# TYPE umrah_cache_requests_total counter"
+        ]
+        entries = ["# HELP umrah_cache_entries Entries held", "# TYPE umrah_cache_entries gauge"]
+        for cache, source in list(self._sources.items()):
+            try:
+                stats = source()
+            except Exception as e:
+                logger.warning(f"Cache stats for {cache} unavailable: {e}")
+                continue
+            for result, value in stats.items():
+                if result == "entries":
+                    entries.append(f'umrah_cache_entries{{cache="{cache}"}} {value}')
+                else:
+                    requests.append(f'umrah_cache_requests_total{{cache="{cache}",result="{result}"}} {value}')
+        return requests + entries
+
+
+class MetricsRegistry:
+    """Every metric of the process, in registration order"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self.caches = CacheStats()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._metrics.setdefault(name, Counter(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.collect())
+        lines.extend(self.caches.collect())
+        return "\n".join(lines) + "\n"
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = metrics.histogram(
+    "umrah_http_request_duration_seconds", "HTTP requests by route template", ["method", "route", "status"]
+)
+AGENT_SECONDS = metrics.histogram(
+    "umrah_agent_duration_seconds", "Agent executions", ["agent", "outcome"]
+)
+LLM_SECONDS = metrics.histogram(
+    "umrah_llm_request_duration_seconds", "LLM provider calls", ["provider", "outcome"]
+)
+LLM_TOKENS = metrics.counter("umrah_llm_tokens_total", "Tokens reported by LLM providers", ["provider"])
+EXTERNAL_API_SECONDS = metrics.histogram(
+    "umrah_external_api_duration_seconds", "Calls to external services", ["api", "outcome"]
+)
@@ -2,33 +2,49 @@
 """
 Custom Middleware
 """
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-import time
+from time import perf_counter
 import logging
 
+from app.core.metrics import HTTP_REQUEST_SECONDS
+
 logger = logging.getLogger(__name__)
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware for logging requests"""
+SLOW_REQUEST_SECONDS = 2.0  # Logged as a warning; everything else only goes to /metrics
+UNMATCHED_ROUTE = "unmatched"  # Scanners' random paths must not become label values
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording request latency per route template and status
+
+    No BaseHTTPMiddleware: the response is streamed through untouched, only
+    the status code is read off the "http.response.start" message.
+    """
     
-    async def dispatch(self, request: Request, call_next):
-        start_time = time.time()
-        
-        # Log request
-        logger.info(f"Request: {request.method} {request.url.path}")
-        
-        # Process request
-        response = await call_next(request)
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
         
-        # Calculate duration
-        duration = time.time() - start_time
+        started = perf_counter()
+        status = 500  # Unless a response starts, the server answers 500
         
-        # Log response
-        logger.info(
-            f"Response: {response.status_code} - "
-            f"{request.method} {request.url.path} - "
-            f"{duration:.2f}s"
-        )
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
         
-        return response
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            duration = perf_counter() - started
+            # The router stores the matched route in the (shared) scope
+            route = scope.get("route")
+            template = getattr(route, "path", None) or UNMATCHED_ROUTE
+            HTTP_REQUEST_SECONDS.observe(duration, scope["method"], template, str(status))
+            if duration >= SLOW_REQUEST_SECONDS:
+                logger.warning(f"Slow request: {status} - {scope['method']} {scope['path']} - {duration:.2f}s")
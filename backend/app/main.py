@@ -6,19 +6,26 @@ FIXED VERSION - Correct budget router import path
 """
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from time import perf_counter
+from typing import Dict, Optional
+import asyncio
+import importlib
 import logging
-import sys
 import os
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler('api.log', encoding='utf-8')
-    ]
+from app.config import settings
+from app.core.logging_config import setup_logging, stop_logging
+
+# Setup logging: queue + background writer thread, JSON lines, rotated file
+setup_logging(
+    level=settings.LOG_LEVEL,
+    log_file=settings.LOG_FILE,
+    max_bytes=settings.LOG_MAX_BYTES,
+    backup_count=settings.LOG_BACKUP_COUNT,
+    json_format=settings.LOG_JSON,
+    queue_size=settings.LOG_QUEUE_SIZE,
+    sample_rates=settings.LOG_SAMPLE_RATES
 )
 logger = logging.getLogger(__name__)
 
@@ -78,7 +85,8 @@ async def root():
             "swagger": "/docs",
             "redoc": "/redoc"
         },
-        "health_check": "/health"
+        "health_check": "/health",
+        "readiness_check": "/ready"
     }
 
 @app.get("/health")
@@ -90,6 +98,7 @@ async def health():
         "status": "healthy",
         "service": "umrah-assistant-api",
         "version": "3.0.0",
+        "ready": readiness["ready"],
         "components": {
             "api": "operational",
             "agents": "operational",
@@ -99,6 +108,20 @@ async def health():
         }
     }
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness check - 503 until the background warmup has finished
+    (point the load balancer / Railway healthcheck here, /health is liveness)
+    """
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content={"status": "warming_up"})
+    return {
+        "status": "ready",
+        "warmup_seconds": readiness["warmup_seconds"],
+        "components": readiness["components"]
+    }
+
 @app.get("/features")
 async def features():
     """
@@ -244,6 +267,94 @@ except Exception as e:
 # LIFECYCLE EVENTS
 # ============================================================================
 
+# Flipped by warmup(); until then /ready answers 503
+readiness = {"ready": False, "warmup_seconds": None, "components": {}}
+warmup_task: Optional[asyncio.Task] = None
+
+# SDKs imported ahead of the first request, when their provider is configured
+WARMUP_SDKS = {
+    "groq": settings.GROQ_API_KEY,
+    "openai": settings.OPENAI_API_KEY
+}
+
+def warm_components() -> Dict[str, str]:
+    """
+    Blocking part of the warmup, run in a worker thread
+    """
+    components = {}
+    
+    # Offline POI spatial index (built from data/poi, cached as .npz)
+    try:
+        from app.services.poi_index import poi_index
+        poi_index.ensure_loaded()
+        components["poi_index"] = f"{len(poi_index)} points"
+        logger.info(f"  ✓ POI index: {len(poi_index)} points")
+    except Exception as e:
+        components["poi_index"] = "unavailable"
+        logger.warning(f"  ✗ POI index not available: {e}")
+    
+    # Region boundaries (cities, masyair, miqat) for offline region detection
+    try:
+        from app.services.regions import region_resolver
+        region_resolver.ensure_loaded()
+        components["regions"] = f"{len(region_resolver)} boundaries"
+        logger.info(f"  ✓ Regions: {len(region_resolver)} boundaries")
+    except Exception as e:
+        components["regions"] = "unavailable"
+        logger.warning(f"  ✗ Regions not available: {e}")
+    
+    # Offline pedestrian routing (OSM extracts in data/routing)
+    try:
+        from app.services.routing import routing_engine
+        routing_engine.ensure_loaded()
+        if routing_engine.available:
+            warmed = routing_engine.warm_common_routes()
+            components["routing"] = f"{len(routing_engine)} nodes, {warmed} routes cached"
+            logger.info(f"  ✓ Routing graph: {len(routing_engine)} nodes, {warmed} hotel→gate routes cached")
+        else:
+            components["routing"] = "straight-line only"
+            logger.info("  ✗ Routing graph: no OSM extract (straight-line distances only)")
+    except Exception as e:
+        components["routing"] = "unavailable"
+        logger.warning(f"  ✗ Routing not available: {e}")
+    
+    # Offline gazetteer (hotel / landmark names, built from the POI index)
+    try:
+        from app.services.gazetteer import gazetteer
+        gazetteer.ensure_loaded()
+        components["gazetteer"] = f"{len(gazetteer.entries)} names"
+        logger.info(f"  ✓ Gazetteer: {len(gazetteer.entries)} names")
+    except Exception as e:
+        components["gazetteer"] = "unavailable"
+        logger.warning(f"  ✗ Gazetteer not available: {e}")
+    
+    # Provider SDKs are imported lazily by the agents; pay for them here instead
+    for module, configured in WARMUP_SDKS.items():
+        if not configured:
+            continue
+        try:
+            importlib.import_module(module)
+            components[f"sdk_{module}"] = "imported"
+            logger.info(f"  ✓ SDK: {module}")
+        except ImportError as e:
+            components[f"sdk_{module}"] = "unavailable"
+            logger.warning(f"  ✗ SDK {module} not available: {e}")
+    
+    return components
+
+async def warmup():
+    """
+    Load everything the first requests would otherwise wait for, then flip readiness
+    """
+    started = perf_counter()
+    try:
+        readiness["components"] = await asyncio.to_thread(warm_components)
+    except Exception as e:
+        logger.error(f"Warmup failed: {e}", exc_info=True)
+    readiness["warmup_seconds"] = round(perf_counter() - started, 3)
+    readiness["ready"] = True
+    logger.info(f"✅ Warmup done in {readiness['warmup_seconds']}s - API is ready")
+
 @app.on_event("startup")
 async def startup_event():
     """
@@ -263,6 +374,7 @@ async def startup_event():
     logger.info("  • API Docs: /docs")
     logger.info("  • ReDoc: /redoc")
     logger.info("  • Health Check: /health")
+    logger.info("  • Readiness: /ready")
     logger.info("  • Features List: /features")
     logger.info("")
     logger.info("🤖 Available Features:")
@@ -276,8 +388,13 @@ async def startup_event():
             logger.info(f"  ✗ {router_name.capitalize()}: {error}")
         logger.info("")
     
+    # Indexes, routing graph and SDKs load in the background: the port opens
+    # right away, /ready flips once everything is warm
+    global warmup_task
+    warmup_task = asyncio.create_task(warmup(), name="warmup")
+    
     logger.info("=" * 80)
-    logger.info("✅ API is ready to accept requests!")
+    logger.info("✅ API is accepting requests (warmup running, see /ready)")
     logger.info("=" * 80)
 
 @app.on_event("shutdown")
@@ -291,8 +408,17 @@ async def shutdown_event():
     
     # Cleanup tasks here (close DB connections, etc.)
     logger.info("Performing cleanup tasks...")
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    try:
+        from app.services.geocoding import geocode_cache, nominatim_worker
+        await nominatim_worker.stop()
+        geocode_cache.close()
+    except Exception as e:
+        logger.warning(f"Geocoding cleanup failed: {e}")
     
     logger.info("✅ Shutdown complete")
+    stop_logging()
 
 # ============================================================================
 # EXCEPTION HANDLERS
@@ -334,31 +460,20 @@ async def not_found_handler(request, exc):
     )
 
 # ============================================================================
-# MIDDLEWARE (Optional - for logging requests)
+# METRICS
 # ============================================================================
 
-@app.middleware("http")
-async def log_requests(request, call_next):
+# Request latency per route template / status (pure ASGI, ~µs per request)
+from app.core.middleware import MetricsMiddleware
+from app.core.metrics import metrics, CONTENT_TYPE
+app.add_middleware(MetricsMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
     """
-    Log all incoming requests
+    Prometheus scrape endpoint
     """
-    import time
-    
-    start_time = time.time()
-    
-    # Log request
-    logger.info(f"→ {request.method} {request.url.path}")
-    
-    # Process request
-    response = await call_next(request)
-    
-    # Calculate duration
-    duration = time.time() - start_time
-    
-    # Log response
-    logger.info(f"← {response.status_code} - {request.method} {request.url.path} - {duration:.2f}s")
-    
-    return response
+    return PlainTextResponse(metrics.render(), media_type=CONTENT_TYPE)
 
 # ============================================================================
 # APPLICATION INFO
@@ -64,7 +64,7 @@ class AdvancedRAGRetriever:
             # Cache results
             self.cache[cache_key] = reranked[:top_k]
             
-            logger.info(f"Retrieved {len(reranked)} documents")
+            logger.info("Retrieved %d documents", len(reranked))
             return reranked[:top_k]
             
         except Exception as e:
@@ -3,7 +3,6 @@
 Embedding Service for RAG
 """
 from typing import List
-from openai import OpenAI
 from app.config import settings
 import logging
 
@@ -13,6 +12,8 @@ class EmbeddingService:
     """Service for generating embeddings"""
     
     def __init__(self):
+        from openai import OpenAI  # Imported on first use
+
         self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = "text-embedding-3-small"
         self.dimension = 1536
@@ -3,9 +3,9 @@
 Groq LLM Service - FREE & FAST!
 Get API key from: https://console.groq.com
 """
-from typing import List, Dict, Any
-from groq import Groq
+from typing import List, Dict, Any, Optional
 from app.config import settings
+from app.core.metrics import LLM_SECONDS, LLM_TOKENS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,9 +19,7 @@ class GroqLLMService:
     def __init__(self):
         if not settings.GROQ_API_KEY:
             logger.warning("GROQ_API_KEY not set, using fallback responses")
-            self.client = None
-        else:
-            self.client = Groq(api_key=settings.GROQ_API_KEY)
+        self._client = None
         
         # FREE models available on Groq
         self.model = "llama3-70b-8192"  # Best free model
@@ -29,6 +27,14 @@ class GroqLLMService:
         # - llama3-8b-8192 (faster, lighter)
         # - mixtral-8x7b-32768 (good for long context)
     
+    @property
+    def client(self) -> Optional[Any]:
+        """Groq client, created (and the SDK imported) on first use"""
+        if self._client is None and settings.GROQ_API_KEY:
+            from groq import Groq
+            self._client = Groq(api_key=settings.GROQ_API_KEY)
+        return self._client
+    
     async def generate(
         self, 
         query: str, 
@@ -69,26 +75,29 @@ Tugas Anda:
 Jawab dengan ramah, informatif, dan praktis."""
             
             # Call Groq API
-            chat_completion = self.client.chat.completions.create(
-                messages=[
-                    {
-                        "role": "system",
-                        "content": system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": query
-                    }
-                ],
-                model=self.model,
-                temperature=0.7,
-                max_tokens=1024,
-                top_p=1,
-                stream=False
-            )
+            with LLM_SECONDS.time("groq"):
+                chat_completion = self.client.chat.completions.create(
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": system_prompt
+                        },
+                        {
+                            "role": "user",
+                            "content": query
+                        }
+                    ],
+                    model=self.model,
+                    temperature=0.7,
+                    max_tokens=1024,
+                    top_p=1,
+                    stream=False
+                )
+            if chat_completion.usage:
+                LLM_TOKENS.inc("groq", amount=chat_completion.usage.total_tokens)
             
             response = chat_completion.choices[0].message.content
-            logger.info(f"Generated response using Groq {self.model}")
+            logger.info("Generated response using Groq %s", self.model)
             
             return response
             
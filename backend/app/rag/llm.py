@@ -3,9 +3,8 @@
 LLM Service for RAG Generation
 """
 from typing import List, Dict, Any
-from openai import OpenAI
-from anthropic import Anthropic
 from app.config import settings
+from app.core.metrics import LLM_SECONDS, LLM_TOKENS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,10 +14,13 @@ class LLMService:
     
     def __init__(self, provider: str = "openai"):
         self.provider = provider
+        # SDKs are imported on first use, not when the module is imported
         if provider == "openai":
+            from openai import OpenAI
             self.client = OpenAI(api_key=settings.OPENAI_API_KEY)
             self.model = "gpt-4-turbo-preview"
         elif provider == "anthropic":
+            from anthropic import Anthropic
             self.client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
             self.model = "claude-3-sonnet-20240229"
     
@@ -54,27 +56,32 @@ Konteks dari knowledge base:
             
             # Generate with OpenAI
             if self.provider == "openai":
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": formatted_system},
-                        {"role": "user", "content": query}
-                    ],
-                    temperature=0.7,
-                    max_tokens=1000
-                )
+                with LLM_SECONDS.time("openai"):
+                    response = self.client.chat.completions.create(
+                        model=self.model,
+                        messages=[
+                            {"role": "system", "content": formatted_system},
+                            {"role": "user", "content": query}
+                        ],
+                        temperature=0.7,
+                        max_tokens=1000
+                    )
+                if response.usage:
+                    LLM_TOKENS.inc("openai", amount=response.usage.total_tokens)
                 return response.choices[0].message.content
             
             # Generate with Anthropic
             elif self.provider == "anthropic":
-                response = self.client.messages.create(
-                    model=self.model,
-                    max_tokens=1000,
-                    system=formatted_system,
-                    messages=[
-                        {"role": "user", "content": query}
-                    ]
-                )
+                with LLM_SECONDS.time("anthropic"):
+                    response = self.client.messages.create(
+                        model=self.model,
+                        max_tokens=1000,
+                        system=formatted_system,
+                        messages=[
+                            {"role": "user", "content": query}
+                        ]
+                    )
+                LLM_TOKENS.inc("anthropic", amount=response.usage.input_tokens + response.usage.output_tokens)
                 return response.content[0].text
         
         except Exception as e:
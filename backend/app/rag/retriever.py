@@ -35,7 +35,7 @@ class RAGRetriever:
                 filter_dict=filter_dict
             )
             
-            logger.info(f"Retrieved {len(results)} documents for query: {query}")
+            logger.info("Retrieved %d documents", len(results), extra={"query_chars": len(query)})
             return results
             
         except Exception as e:
@@ -3,16 +3,8 @@
 Qdrant Vector Store Manager
 """
 from typing import List, Dict, Any
-from qdrant_client import QdrantClient
-from qdrant_client.models import (
-    Distance, 
-    VectorParams, 
-    PointStruct,
-    Filter,
-    FieldCondition,
-    MatchValue
-)
 from app.config import settings
+from app.core.metrics import EXTERNAL_API_SECONDS
 import logging
 import uuid
 
@@ -22,6 +14,9 @@ class VectorStore:
     """Qdrant vector store manager"""
     
     def __init__(self):
+        # qdrant_client (and its grpc/protobuf stack) is imported on first use
+        from qdrant_client import QdrantClient
+
         self.client = QdrantClient(
             url=settings.QDRANT_URL,
             api_key=settings.QDRANT_API_KEY if settings.QDRANT_API_KEY else None
@@ -31,6 +26,8 @@ class VectorStore:
     
     def create_collection(self):
         """Create collection if not exists"""
+        from qdrant_client.models import Distance, VectorParams
+
         try:
             collections = self.client.get_collections().collections
             exists = any(c.name == self.collection_name for c in collections)
@@ -57,6 +54,8 @@ class VectorStore:
         metadatas: List[Dict[str, Any]]
     ):
         """Add documents to vector store"""
+        from qdrant_client.models import PointStruct
+
         try:
             points = [
                 PointStruct(
@@ -86,6 +85,8 @@ class VectorStore:
         filter_dict: Dict[str, Any] = None
     ) -> List[Dict[str, Any]]:
         """Search similar documents"""
+        from qdrant_client.models import Filter, FieldCondition, MatchValue
+
         try:
             search_filter = None
             if filter_dict:
@@ -98,12 +99,13 @@ class VectorStore:
                 ]
                 search_filter = Filter(must=conditions)
             
-            results = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_vector,
-                limit=limit,
-                query_filter=search_filter
-            )
+            with EXTERNAL_API_SECONDS.time("qdrant"):
+                results = self.client.search(
+                    collection_name=self.collection_name,
+                    query_vector=query_vector,
+                    limit=limit,
+                    query_filter=search_filter
+                )
             
             return [
                 {
@@ -4,10 +4,12 @@ AI Service with Smart Fallback
 Primary: Groq (FREE!)
 Fallback: OpenAI (if needed)
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Awaitable
+from time import perf_counter
 import httpx
 import logging
 from app.config import settings
+from app.core.metrics import LLM_SECONDS, LLM_TOKENS
 
 logger = logging.getLogger(__name__)
 
@@ -56,14 +58,14 @@ class AIService:
         
         # Try Groq first (PRIMARY - FREE!)
         if self.groq_key and self.groq_key != "your-groq-key-here":
-            result = await self._call_groq(query, system_prompt)
+            result = await self._observed("groq", self._call_groq(query, system_prompt))
             if result:
                 logger.info("✅ Used Groq (FREE)")
                 return result
         
         # Fallback to OpenAI (if configured)
         if self.openai_key and self.openai_key != "your-openai-key-here":
-            result = await self._call_openai(query, system_prompt)
+            result = await self._observed("openai", self._call_openai(query, system_prompt))
             if result:
                 logger.warning("⚠️ Used OpenAI fallback (PAID)")
                 return result
@@ -72,6 +74,15 @@ class AIService:
         logger.warning("⚠️ Using keyword fallback (no API)")
         return self._keyword_fallback(query)
     
+    async def _observed(self, provider: str, call: Awaitable[Optional[Dict]]) -> Optional[Dict]:
+        """Record a provider call's latency, outcome and token usage"""
+        started = perf_counter()
+        result = await call
+        LLM_SECONDS.observe(perf_counter() - started, provider, "ok" if result else "error")
+        if result:
+            LLM_TOKENS.inc(provider, amount=result.get("tokens", 0))
+        return result
+    
     async def _call_groq(self, query: str, system_prompt: str) -> Optional[Dict]:
         """Call Groq API (PRIMARY - FREE!)"""
         try:
@@ -3,13 +3,20 @@
 Free Maps Service using OpenStreetMap
 NO API KEY NEEDED!
 """
-from typing import Dict, Any, Optional, Tuple
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from typing import Dict, Any, List, Optional, Tuple
 from app.config import settings
+from app.services.poi_index import poi_index
+from app.services import geo_distance
+from app.services.gazetteer import gazetteer
+from app.services.geocoding import (
+    geocode_cache,
+    nominatim_worker,
+    address_key,
+    reverse_key,
+    CACHE_MISS
+)
+import numpy as np
 import logging
-import time
 
 logger = logging.getLogger(__name__)
 
@@ -20,10 +27,7 @@ class FreeMapsService:
     """
     
     def __init__(self):
-        self.geolocator = Nominatim(
-            user_agent=settings.NOMINATIM_USER_AGENT,
-            timeout=10
-        )
+        self._geolocator = None
         
         # Important locations in Makkah & Madinah
         self.important_locations = {
@@ -65,22 +69,48 @@ class FreeMapsService:
             }
         }
     
-    async def geocode(self, address: str) -> Optional[Dict[str, Any]]:
+    @property
+    def geolocator(self):
+        """Nominatim client; geopy is only imported once Nominatim is needed"""
+        if self._geolocator is None:
+            from geopy.geocoders import Nominatim
+            self._geolocator = Nominatim(
+                user_agent=settings.NOMINATIM_USER_AGENT,
+                timeout=10
+            )
+        return self._geolocator
+    
+    async def geocode(self, address: str, city: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """
         Convert address to coordinates
-        FREE - uses OpenStreetMap
+        Order: offline gazetteer -> SQLite cache -> Nominatim (rate limited)
+        
+        Args:
+            address: place name or address
+            city: caller's city or region city, breaks gazetteer ties
         """
+        match = gazetteer.best_match(address, city=city)
+        if match:
+            return {
+                "address": f"{match['name']}, {match['city']}",
+                "latitude": match["latitude"],
+                "longitude": match["longitude"],
+                "raw": {"source": "gazetteer", **match}
+            }
+        
+        key = address_key(address)
+        cached = await geocode_cache.aget(key)
+        if cached is not CACHE_MISS:
+            return cached
+        
+        from geopy.exc import GeocoderTimedOut, GeocoderServiceError
         try:
-            location = self.geolocator.geocode(address)
-            
-            if location:
-                return {
-                    "address": location.address,
-                    "latitude": location.latitude,
-                    "longitude": location.longitude,
-                    "raw": location.raw
-                }
-            return None
+            location = await nominatim_worker.submit(
+                key, lambda: self.geolocator.geocode(address)
+            )
+            result = self._location_dict(location)
+            await geocode_cache.aset(key, result)
+            return result
             
         except (GeocoderTimedOut, GeocoderServiceError) as e:
             logger.error(f"Geocoding error: {e}")
@@ -93,24 +123,43 @@ class FreeMapsService:
     ) -> Optional[Dict[str, Any]]:
         """
         Convert coordinates to address
-        FREE - uses OpenStreetMap
+        Cached per ~11 m cell, Nominatim only on a cache miss
         """
+        key = reverse_key(latitude, longitude)
+        cached = await geocode_cache.aget(key)
+        if cached is not CACHE_MISS:
+            return cached
+        
+        from geopy.exc import GeocoderTimedOut, GeocoderServiceError
         try:
-            location = self.geolocator.reverse(f"{latitude}, {longitude}")
-            
-            if location:
-                return {
-                    "address": location.address,
-                    "latitude": location.latitude,
-                    "longitude": location.longitude,
-                    "raw": location.raw
-                }
-            return None
+            location = await nominatim_worker.submit(
+                key, lambda: self.geolocator.reverse(f"{latitude}, {longitude}")
+            )
+            result = self._location_dict(location)
+            await geocode_cache.aset(key, result)
+            return result
             
         except (GeocoderTimedOut, GeocoderServiceError) as e:
             logger.error(f"Reverse geocoding error: {e}")
             return None
     
+    def _location_dict(self, location) -> Optional[Dict[str, Any]]:
+        if not location:
+            return None
+        return {
+            "address": location.address,
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "raw": location.raw
+        }
+    
+    def search_places(self, query: str, limit: int = 5) -> List[Dict[str, Any]]:
+        """
+        Offline prefix/fuzzy search over hotels and landmarks
+        (autocomplete - never touches the network)
+        """
+        return gazetteer.search(query, limit=limit)
+    
     def calculate_distance(
         self,
         point1: Tuple[float, float],
@@ -128,12 +177,90 @@ class FreeMapsService:
             Distance in kilometers
         """
         try:
-            distance = geodesic(point1, point2).kilometers
-            return round(distance, 2)
+            distance = geo_distance.vincenty_km(point1[0], point1[1], point2[0], point2[1])
+            return round(float(distance), 2)
         except Exception as e:
             logger.error(f"Distance calculation error: {e}")
             return 0.0
     
+    def distance_matrix(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]]
+    ) -> np.ndarray:
+        """
+        Many-to-many distances in one vectorized pass
+        
+        Returns:
+            float32 array (len(origins), len(destinations)) in kilometers
+        """
+        return geo_distance.haversine_matrix(origins, destinations)
+    
+    def rank_by_distance(
+        self,
+        candidates: List[Tuple[float, float]],
+        landmarks: List[Tuple[float, float]],
+        weights: Optional[List[float]] = None,
+        top: Optional[int] = None,
+        refine: bool = True
+    ) -> List[Dict[str, Any]]:
+        """
+        Rank candidates (e.g. hotels) by weighted distance to landmarks
+        
+        The score is computed with haversine for every candidate; only the
+        `top` results are re-measured with Vincenty when `refine` is set.
+        
+        Returns:
+            [{"index": i, "score_km": float, "distances_km": [...]}, ...] best first
+        """
+        cand = geo_distance.as_points(candidates)
+        marks = geo_distance.as_points(landmarks)
+        if not len(cand) or not len(marks):
+            return []
+        
+        w = np.ones(len(marks), dtype=np.float32) if weights is None else np.asarray(weights, dtype=np.float32)
+        matrix = geo_distance.haversine_matrix(cand, marks)
+        scores = matrix @ (w / w.sum())
+        
+        top = len(cand) if top is None else min(top, len(cand))
+        best = np.argpartition(scores, top - 1)[:top]
+        
+        dist = matrix[best]
+        if refine:
+            dist = geo_distance.vincenty_km(
+                cand[best, 0:1], cand[best, 1:2], marks[:, 0], marks[:, 1]
+            ).astype(np.float32)
+            scores_best = dist @ (w / w.sum())
+        else:
+            scores_best = scores[best]
+        
+        order = np.argsort(scores_best, kind="stable")
+        return [
+            {
+                "index": int(best[i]),
+                "score_km": round(float(scores_best[i]), 2),
+                "distances_km": [round(float(x), 2) for x in dist[i]]
+            }
+            for i in order
+        ]
+    
+    def distance_to_haram(
+        self,
+        points: List[Tuple[float, float]]
+    ) -> np.ndarray:
+        """
+        Distance from each point to the nearer of Masjidil Haram / Masjid Nabawi
+        
+        Returns:
+            float32 array (len(points),) in kilometers
+        """
+        harams = [
+            (loc["lat"], loc["lon"])
+            for key, loc in self.important_locations.items()
+            if key in ("masjidil_haram", "masjid_nabawi")
+        ]
+        return geo_distance.haversine_matrix(points, harams).min(axis=1)
+    
     def get_nearby_important_locations(
         self,
         latitude: float,
@@ -142,29 +269,27 @@ class FreeMapsService:
     ) -> List[Dict[str, Any]]:
         """
         Find important Islamic locations nearby
+        Served from the offline spatial POI index
         """
-        user_location = (latitude, longitude)
-        nearby = []
-        
-        for loc_id, loc_data in self.important_locations.items():
-            loc_coords = (loc_data["lat"], loc_data["lon"])
-            distance = self.calculate_distance(user_location, loc_coords)
-            
-            if distance <= max_distance_km:
-                nearby.append({
-                    "id": loc_id,
-                    "name": loc_data["name"],
-                    "city": loc_data["city"],
-                    "distance_km": distance,
-                    "coordinates": {
-                        "latitude": loc_data["lat"],
-                        "longitude": loc_data["lon"]
-                    }
-                })
-        
-        # Sort by distance
-        nearby.sort(key=lambda x: x["distance_km"])
-        return nearby
+        return poi_index.within(
+            latitude,
+            longitude,
+            max_distance_km,
+            categories=["landmark"]
+        )
+    
+    def find_nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        categories: Optional[List[str]] = None,
+        k: int = 5,
+        max_distance_km: float = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Find the k nearest POIs (hotel, hospital, haram_gate, restaurant, atm, ...)
+        """
+        return poi_index.nearest(latitude, longitude, k, categories, max_distance_km)
     
     def get_location_info(self, location_name: str) -> Optional[Dict[str, Any]]:
         """Get info about important location"""
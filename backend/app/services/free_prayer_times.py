@@ -1,24 +1,28 @@
 # -*- coding: utf-8 -*-
 """
 Free Prayer Times Service
-Uses: api.aladhan.com (FREE, no API key!)
+Uses: local Umm Al-Qura engine (OFFLINE, no API key, no network!)
 """
-import httpx
 from typing import Dict, Any, Optional
 from datetime import datetime
+from app.services.prayer_engine import (
+    prayer_engine,
+    guess_utc_offset,
+    local_today,
+    METHOD_ID,
+    METHOD_NAME
+)
+from app.services.prayer_cache import prayer_times_cache, local_midnight_epoch
 import logging
 
 logger = logging.getLogger(__name__)
 
 class FreePrayerTimesService:
     """
-    Free prayer times using Aladhan API
+    Free prayer times computed locally (Umm Al-Qura, aladhan method 4)
     NO API KEY NEEDED!
     """
     
-    def __init__(self):
-        self.base_url = "https://api.aladhan.com/v1"
-    
     async def get_prayer_times(
         self,
         latitude: float,
@@ -27,48 +31,43 @@ class FreePrayerTimesService:
     ) -> Optional[Dict[str, Any]]:
         """
         Get prayer times for location
-        FREE API - no key needed!
+        Computed offline - no network round trip!
         """
-        if not date:
-            date = datetime.now()
-        
-        timestamp = int(date.timestamp())
-        
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.get(
-                    f"{self.base_url}/timings/{timestamp}",
-                    params={
-                        "latitude": latitude,
-                        "longitude": longitude,
-                        "method": 4  # Umm Al-Qura (Makkah)
-                    }
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    
-                    if data.get("code") == 200:
-                        timings = data["data"]["timings"]
-                        
-                        return {
-                            "date": data["data"]["date"]["readable"],
-                            "hijri": data["data"]["date"]["hijri"],
-                            "fajr": timings.get("Fajr"),
-                            "sunrise": timings.get("Sunrise"),
-                            "dhuhr": timings.get("Dhuhr"),
-                            "asr": timings.get("Asr"),
-                            "maghrib": timings.get("Maghrib"),
-                            "isha": timings.get("Isha"),
-                            "method": "Umm Al-Qura University, Makkah"
-                        }
+            utc_offset = guess_utc_offset(latitude, longitude)
+            day = date.date() if date else local_today(utc_offset)
             
-            return None
+            # Nearby users (same ~5 km geohash bucket) share one entry per day
+            bucket = prayer_times_cache.bucket(latitude, longitude)
+            result = await prayer_times_cache.get_or_load(
+                prayer_times_cache.key(bucket, day, METHOD_ID),
+                local_midnight_epoch(day, utc_offset),
+                lambda: self._compute(bucket, day, utc_offset)
+            )
+            return dict(result)
             
         except Exception as e:
-            logger.error(f"Error fetching prayer times: {e}")
+            logger.error(f"Error computing prayer times: {e}")
             return self._fallback_times()
     
+    async def _compute(self, bucket: str, day, utc_offset: float) -> Dict[str, Any]:
+        """Compute prayer times at the bucket center"""
+        latitude, longitude = prayer_times_cache.bucket_center(bucket)
+        table = prayer_engine.compute_range(latitude, longitude, day, 1, utc_offset)
+        timings = prayer_engine.timings_from_minutes(table["minutes"][0])
+        
+        return {
+            "date": day.strftime("%d %b %Y"),
+            "hijri": prayer_engine.hijri_info(*table["hijri"][0]),
+            "fajr": timings["Fajr"],
+            "sunrise": timings["Sunrise"],
+            "dhuhr": timings["Dhuhr"],
+            "asr": timings["Asr"],
+            "maghrib": timings["Maghrib"],
+            "isha": timings["Isha"],
+            "method": METHOD_NAME
+        }
+    
     def _fallback_times(self) -> Dict[str, Any]:
         """Fallback prayer times for Makkah"""
         return {
@@ -84,4 +83,4 @@ class FreePrayerTimesService:
         }
 
 # Global instance
-prayer_times_service = FreePrayerTimesService()
\ No newline at end of file
+prayer_times_service = FreePrayerTimesService()
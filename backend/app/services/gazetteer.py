@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+Offline Gazetteer
+Makkah / Madinah / Jeddah hotels and landmarks, searchable by name prefix
+with fuzzy fallback - answers most geocoding questions without Nominatim
+"""
+from bisect import bisect_left
+from difflib import get_close_matches
+from typing import Dict, Any, List, Optional, Set
+import logging
+import re
+import threading
+import unicodedata
+
+from app.services.poi_index import poi_index, CATEGORIES
+
+logger = logging.getLogger(__name__)
+
+# Categories worth geocoding by name
+GAZETTEER_CATEGORIES = ("hotel", "landmark", "haram_gate", "mosque", "hospital")
+
+# Common spellings used by jamaah -> canonical token
+TOKEN_ALIASES = {
+    "nabawy": "nabawi",
+    "nabi": "nabawi",
+    "mekkah": "makkah",
+    "mekah": "makkah",
+    "mecca": "makkah",
+    "medina": "madinah",
+    "madina": "madinah",
+    "gate": "pintu",
+    "bab": "pintu",
+    "hospital": "rs",
+}
+
+STOPWORDS = {"hotel", "the", "di", "ke", "al", "el", "by"}
+
+# Calibrated on the seed names: every full name scores 1.0 and distinctive
+# words ("swissotel", "hilton", "nabawi", "pintu 79") reach 0.5, while
+# generic ones ("king", "pintu", "royal", "ajyad street") stay below or tie
+GEOCODE_MIN_SCORE = 0.5
+
+# Tie-break when the caller's city is unknown - most questions are about Makkah
+DEFAULT_CITY = "Makkah"
+
+_NON_WORD = re.compile(r"[^\w\s]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents/diacritics and punctuation, collapse spaces"""
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _NON_WORD.sub(" ", text.lower())
+    return " ".join(text.split())
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in normalize(text).split():
+        token = TOKEN_ALIASES.get(token, token)
+        if token not in STOPWORDS:
+            tokens.append(token)
+    return tokens
+
+
+class Gazetteer:
+    """
+    Sorted-token prefix index (a flattened trie) over place names
+
+    Every name token is stored once in a sorted list; a prefix lookup is two
+    bisects. Tokens with no prefix match fall back to difflib fuzzy matching.
+    """
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        self._tokens: List[str] = []
+        self._postings: List[Set[int]] = []
+        self._city_tokens: Set[str] = set()
+        self.loaded = False
+        self._load_lock = threading.Lock()
+
+    def build(self, entries: List[Dict[str, Any]]):
+        postings: Dict[str, Set[int]] = {}
+        for i, entry in enumerate(entries):
+            for token in tokenize(entry["name"]):
+                postings.setdefault(token, set()).add(i)
+
+        self.entries = entries
+        self._city_tokens = {t for entry in entries for t in tokenize(entry["city"])}
+        self._tokens = sorted(postings)
+        self._postings = [postings[t] for t in self._tokens]
+        self.loaded = True
+
+    def ensure_loaded(self):
+        """Build from the POI index (hotels, landmarks, gates, ...)"""
+        if self.loaded:
+            return
+        with self._load_lock:
+            # The startup warmup thread and a request may race to load
+            if self.loaded:
+                return
+
+            poi_index.ensure_loaded()
+            entries = []
+            for i in range(len(poi_index)):
+                category = CATEGORIES[poi_index.codes[i]]
+                if category in GAZETTEER_CATEGORIES:
+                    entries.append({
+                        "id": str(poi_index.ids[i]),
+                        "name": str(poi_index.names[i]),
+                        "category": category,
+                        "city": str(poi_index.cities[i]),
+                        "latitude": float(poi_index.lats[i]),
+                        "longitude": float(poi_index.lons[i])
+                    })
+
+            self.build(entries)
+            logger.info(f"Gazetteer: {len(entries)} names, {len(self._tokens)} tokens")
+
+    def _prefix(self, prefix: str) -> Set[int]:
+        start = bisect_left(self._tokens, prefix)
+        end = bisect_left(self._tokens, prefix + "\uffff")
+        matches: Set[int] = set()
+        for postings in self._postings[start:end]:
+            matches |= postings
+        return matches
+
+    def _fuzzy(self, token: str) -> Set[int]:
+        matches: Set[int] = set()
+        for close in get_close_matches(token, self._tokens, n=3, cutoff=0.75):
+            matches |= self._postings[bisect_left(self._tokens, close)]
+        return matches
+
+    def search(self, query: str, limit: Optional[int] = 5, city: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Prefix search over all query tokens (AND), fuzzy per token when needed
+
+        Returns:
+            entries with a "score" in [0, 1], best first
+        """
+        self.ensure_loaded()
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        candidates: Optional[Set[int]] = None
+        fuzzy_used = False
+        for token in tokens:
+            matches = self._prefix(token)
+            if not matches and len(token) >= 3:
+                matches = self._fuzzy(token)
+                fuzzy_used = True
+            if not matches:
+                continue  # Ignore words that match nothing ("dekat", "sekitar", ...)
+            candidates = matches if candidates is None else (candidates & matches) or candidates
+
+        if not candidates:
+            return []
+
+        # City names score only when the query is nothing but a city name
+        scored = [t for t in tokens if t not in self._city_tokens]
+        ignored = self._city_tokens if scored else set()
+        scored = scored or tokens
+
+        results = []
+        query_norm = " ".join(tokens)
+        for i in candidates:
+            entry = self.entries[i]
+            if city and normalize(entry["city"]) != normalize(city):
+                continue
+            name_tokens = tokenize(entry["name"])
+            exact = sum(1 for t in scored if t in name_tokens)
+            # "Pintu King Fahd (Bab 79)" repeats "pintu", "Swissotel Makkah"
+            # carries its city - neither should dilute the score
+            core = list(dict.fromkeys(t for t in name_tokens if t not in ignored))
+            score = (exact + 0.5 * (len(scored) - exact)) / max(len(scored), len(core))
+            if " ".join(name_tokens) == query_norm:
+                score = 1.0
+            elif fuzzy_used:
+                score *= 0.8
+            results.append({**entry, "score": round(score, 3)})
+
+        results.sort(key=lambda r: (-r["score"], len(r["name"])))
+        return results[:limit]
+
+    def best_match(
+        self,
+        query: str,
+        min_score: float = GEOCODE_MIN_SCORE,
+        city: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        One confident match for geocoding, or None
+
+        Equal top scores ("pintu king fahd" in Makkah and Madinah) go to the
+        caller's `city` (or region city), DEFAULT_CITY when unknown; a tie
+        that is still left is ambiguous.
+        """
+        self.ensure_loaded()
+        if all(t in self._city_tokens for t in tokenize(query)):
+            return None  # A bare city name is Nominatim's job
+
+        results = self.search(query, limit=None)
+        if not results or results[0]["score"] < min_score:
+            return None
+
+        top = [r for r in results if r["score"] == results[0]["score"]]
+        if len(top) > 1:
+            wanted = normalize(city or DEFAULT_CITY)
+            top = [r for r in top if normalize(r["city"]) == wanted]
+        return top[0] if len(top) == 1 else None
+
+
+# Global instance
+gazetteer = Gazetteer()
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Vectorized Distance Kernels
+Many-to-many haversine in one NumPy pass, plus Vincenty (WGS-84) refinement
+for the handful of results that are actually shown to the user
+"""
+from typing import Optional, Tuple
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# WGS-84 ellipsoid
+WGS84_A = 6378.137
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def as_points(points) -> np.ndarray:
+    """(lat, lon) pair or sequence of pairs -> float64 array (n, 2)"""
+    arr = np.asarray(points, dtype=np.float64)
+    return arr.reshape(-1, 2)
+
+
+def haversine_km(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """One origin to many destinations (float64, km)"""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def haversine_matrix(origins, destinations) -> np.ndarray:
+    """
+    Great-circle distance matrix
+
+    Args:
+        origins: (n, 2) array-like of (latitude, longitude)
+        destinations: (m, 2) array-like of (latitude, longitude)
+
+    Returns:
+        float32 array (n, m) in kilometers
+    """
+    o = np.radians(as_points(origins))
+    d = np.radians(as_points(destinations))
+
+    lat1 = o[:, 0:1]
+    lat2 = d[:, 0][np.newaxis, :]
+    dlat = lat2 - lat1
+    dlon = d[:, 1][np.newaxis, :] - o[:, 1:2]
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return dist.astype(np.float32)
+
+
+def vincenty_km(
+    lat1: np.ndarray,
+    lon1: np.ndarray,
+    lat2: np.ndarray,
+    lon2: np.ndarray,
+    iterations: int = 100,
+    tolerance: float = 1e-12
+) -> np.ndarray:
+    """
+    Ellipsoidal (WGS-84) distance, element-wise over broadcastable arrays
+    Falls back to haversine where the iteration does not converge (near-antipodal)
+    """
+    lat1, lon1, lat2, lon2 = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (lat1, lon1, lat2, lon2))
+    )
+    u1 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat1)))
+    u2 = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat2)))
+    big_l = np.radians(lon2 - lon1)
+    sin_u1, cos_u1 = np.sin(u1), np.cos(u1)
+    sin_u2, cos_u2 = np.sin(u2), np.cos(u2)
+
+    lam = big_l.copy()
+    converged = np.zeros(lam.shape, dtype=bool)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(iterations):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.sqrt(
+                (cos_u2 * sin_lam) ** 2 + (cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam) ** 2
+            )
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            cos_2sm = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            c = WGS84_F / 16 * cos2_alpha * (4 + WGS84_F * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = big_l + (1 - c) * WGS84_F * sin_alpha * (
+                sigma + c * sin_sigma * (cos_2sm + c * cos_sigma * (-1 + 2 * cos_2sm ** 2))
+            )
+            converged = np.abs(lam - lam_prev) < tolerance
+            if converged.all():
+                break
+
+        u_sq = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        big_a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+        big_b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+        delta_sigma = big_b * sin_sigma * (
+            cos_2sm + big_b / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sm ** 2)
+                - big_b / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)
+            )
+        )
+        dist = WGS84_B * big_a * (sigma - delta_sigma)
+
+    fallback = ~converged | np.isnan(dist)
+    if fallback.any():
+        o = np.radians(np.stack([lat1[fallback], lon1[fallback]], axis=-1))
+        d = np.radians(np.stack([lat2[fallback], lon2[fallback]], axis=-1))
+        a = (
+            np.sin((d[:, 0] - o[:, 0]) / 2) ** 2
+            + np.cos(o[:, 0]) * np.cos(d[:, 0]) * np.sin((d[:, 1] - o[:, 1]) / 2) ** 2
+        )
+        dist[fallback] = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return dist
+
+
+def nearest_k(
+    origins,
+    destinations,
+    k: int,
+    matrix: Optional[np.ndarray] = None,
+    refine: bool = False
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k closest destinations for every origin
+
+    Ranks with the haversine matrix (argpartition, O(n*m)); with `refine`
+    the k winners per origin are re-measured with Vincenty and re-sorted.
+
+    Returns:
+        (indices int64 (n, k), distances float32 (n, k) km)
+    """
+    o = as_points(origins)
+    d = as_points(destinations)
+    if matrix is None:
+        matrix = haversine_matrix(o, d)
+
+    k = min(k, matrix.shape[1])
+    if k == 0:
+        return np.empty((len(o), 0), dtype=np.int64), np.empty((len(o), 0), dtype=np.float32)
+
+    idx = np.argpartition(matrix, k - 1, axis=1)[:, :k]
+    dist = np.take_along_axis(matrix, idx, axis=1)
+
+    if refine:
+        dist = vincenty_km(o[:, 0:1], o[:, 1:2], d[idx, 0], d[idx, 1]).astype(np.float32)
+
+    order = np.argsort(dist, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(dist, order, axis=1)
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Geocoding Infrastructure
+- GeocodeCache: persistent SQLite cache with normalized address keys
+- NominatimWorker: the ONLY caller of Nominatim - one request per second,
+  duplicate lookups coalesced, blocking geopy calls kept off the event loop
+"""
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from app.config import settings
+from app.core.metrics import EXTERNAL_API_SECONDS, metrics
+from app.services.gazetteer import normalize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parents[2] / "data" / "geocode_cache.sqlite3"
+
+POSITIVE_TTL = 90 * 24 * 3600  # Addresses rarely move
+NEGATIVE_TTL = 24 * 3600  # Retry "not found" once a day
+REVERSE_PRECISION = 4  # ~11 m - same building / hotel entrance
+
+CACHE_MISS = object()
+
+
+def address_key(address: str) -> str:
+    return "fwd:" + normalize(address)
+
+
+def reverse_key(latitude: float, longitude: float) -> str:
+    return f"rev:{round(latitude, REVERSE_PRECISION)},{round(longitude, REVERSE_PRECISION)}"
+
+
+class GeocodeCache:
+    """SQLite (WAL) key -> JSON cache shared by geocode and reverse geocode"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path or settings.GEOCODE_CACHE_PATH or DEFAULT_CACHE_PATH)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS geocode ("
+                " key TEXT PRIMARY KEY,"
+                " result TEXT,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Any:
+        """Cached result (None for a cached "not found") or CACHE_MISS"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT result, expires_at FROM geocode WHERE key = ?", (key,)
+            ).fetchone()
+            # Counted under the lock: lookups run in worker threads
+            if row is None or row[1] < time.time():
+                self.misses += 1
+                return CACHE_MISS
+            self.hits += 1
+        return json.loads(row[0]) if row[0] is not None else None
+
+    def set(self, key: str, result: Optional[Dict[str, Any]]):
+        ttl = POSITIVE_TTL if result is not None else NEGATIVE_TTL
+        payload = json.dumps(result, ensure_ascii=False) if result is not None else None
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode (key, result, expires_at) VALUES (?, ?, ?)",
+                (key, payload, time.time() + ttl)
+            )
+            conn.commit()
+
+    async def aget(self, key: str) -> Any:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, result: Optional[Dict[str, Any]]):
+        await asyncio.to_thread(self.set, key, result)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class NominatimWorker:
+    """
+    Single background worker in front of Nominatim
+
+    Nominatim's usage policy allows ~1 request/second. Every lookup goes
+    through one queue; identical pending lookups share one request.
+    """
+
+    def __init__(self, min_interval: float = 1.0):
+        self.min_interval = min_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._last_call = 0.0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.create_task(self._run())
+
+    async def submit(self, key: str, call: Callable[[], Any]) -> Any:
+        """Queue a blocking geopy call; returns its result (or raises)"""
+        future = self._pending.get(key)
+        if future is None:
+            self._ensure_started()
+            future = asyncio.get_running_loop().create_future()
+            # Callers may give up; don't warn about unretrieved exceptions
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._pending[key] = future
+            await self._queue.put((key, call, future))
+        return await asyncio.shield(future)
+
+    async def _run(self):
+        while True:
+            key, call, future = await self._queue.get()
+            try:
+                wait = self._last_call + self.min_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                self._last_call = time.monotonic()
+                with EXTERNAL_API_SECONDS.time("nominatim"):
+                    result = await asyncio.to_thread(call)
+                if not future.done():
+                    future.set_result(result)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._pending.pop(key, None)
+                self._queue.task_done()
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global instances
+geocode_cache = GeocodeCache()
+nominatim_worker = NominatimWorker(min_interval=settings.NOMINATIM_MIN_INTERVAL)
+metrics.caches.register("geocode", geocode_cache.stats)
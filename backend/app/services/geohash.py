@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Geohash helpers (pure Python, no dependency)
+Precision 5 ~ 4.9 x 4.9 km, precision 6 ~ 1.2 x 0.6 km
+"""
+from typing import Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {c: i for i, c in enumerate(BASE32)}
+
+
+def encode(latitude: float, longitude: float, precision: int = 5) -> str:
+    """Encode a coordinate to a geohash string"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if longitude >= mid:
+                value = (value << 1) | 1
+                lon_lo = mid
+            else:
+                value <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if latitude >= mid:
+                value = (value << 1) | 1
+                lat_lo = mid
+            else:
+                value <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+
+    return "".join(chars)
+
+
+def decode_bbox(geohash: str) -> Tuple[float, float, float, float]:
+    """Geohash -> (lat_min, lat_max, lon_min, lon_max)"""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+
+    for char in geohash:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def decode(geohash: str) -> Tuple[float, float]:
+    """Geohash -> center (latitude, longitude)"""
+    lat_lo, lat_hi, lon_lo, lon_hi = decode_bbox(geohash)
+    return (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Spatial POI Index
+Offline points of interest (hotels, hospitals, Haram gates, restaurants, ATMs)
+served from a uniform lat/lon grid - k-nearest and radius queries in microseconds
+
+Sources: every *.csv / *.geojson in POI_DATA_DIR (see data/poi/README.md).
+The built index is persisted as poi_index.npz and reused until a source changes.
+"""
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional
+import csv
+import json
+import logging
+import threading
+import numpy as np
+
+from app.config import settings
+from app.services.geo_distance import haversine_km
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = (
+    "hotel",
+    "hospital",
+    "pharmacy",
+    "haram_gate",
+    "restaurant",
+    "atm",
+    "mosque",
+    "landmark",
+)
+_CATEGORY_CODE = {name: code for code, name in enumerate(CATEGORIES)}
+
+# OSM tag -> category (first match wins)
+OSM_CATEGORY_TAGS = [
+    ("tourism", {"hotel", "motel", "guest_house", "hostel", "apartment"}, "hotel"),
+    ("amenity", {"hospital", "clinic", "doctors"}, "hospital"),
+    ("healthcare", {"hospital", "clinic"}, "hospital"),
+    ("amenity", {"pharmacy"}, "pharmacy"),
+    ("shop", {"chemist"}, "pharmacy"),
+    ("amenity", {"restaurant", "fast_food", "food_court", "cafe"}, "restaurant"),
+    ("amenity", {"atm", "bank", "bureau_de_change"}, "atm"),
+    ("amenity", {"place_of_worship"}, "mosque"),
+    ("tourism", {"attraction", "viewpoint", "museum"}, "landmark"),
+    ("historic", None, "landmark"),
+]
+
+KM_PER_DEG_LAT = 111.195
+CELL_DEG = 0.005  # ~550 m grid cells
+INDEX_VERSION = 1
+
+DEFAULT_POI_DIR = Path(__file__).resolve().parents[2] / "data" / "poi"
+
+
+def poi_dir() -> Path:
+    return Path(settings.POI_DATA_DIR) if settings.POI_DATA_DIR else DEFAULT_POI_DIR
+
+
+def classify_osm(tags: Dict[str, Any]) -> Optional[str]:
+    """Map OSM tags to one of CATEGORIES"""
+    if tags.get("category") in _CATEGORY_CODE:
+        return tags["category"]
+
+    # Entrances of the two Harams are tagged as gates/entrances named Bab/Gate
+    name = str(tags.get("name:en") or tags.get("name") or "").lower()
+    if tags.get("entrance") or tags.get("barrier") == "gate":
+        if "bab" in name or "gate" in name or "باب" in name:
+            return "haram_gate"
+
+    for key, values, category in OSM_CATEGORY_TAGS:
+        value = tags.get(key)
+        if value and (values is None or value in values):
+            if category == "mosque" and tags.get("religion", "muslim") != "muslim":
+                return None
+            return category
+    return None
+
+
+def _feature_point(geometry: Dict[str, Any]):
+    """(lat, lon) of a GeoJSON geometry - centroid of the first ring for areas"""
+    kind = geometry.get("type")
+    coords = geometry.get("coordinates")
+    if not coords:
+        return None
+    if kind == "Point":
+        return coords[1], coords[0]
+    if kind == "Polygon":
+        ring = np.asarray(coords[0], dtype=np.float64)
+    elif kind == "MultiPolygon":
+        ring = np.asarray(coords[0][0], dtype=np.float64)
+    elif kind == "LineString":
+        ring = np.asarray(coords, dtype=np.float64)
+    else:
+        return None
+    return float(ring[:, 1].mean()), float(ring[:, 0].mean())
+
+
+def load_geojson(path: Path) -> List[Dict[str, Any]]:
+    """Load POIs from a GeoJSON FeatureCollection (Overpass/osmium export)"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    pois = []
+    for i, feature in enumerate(data.get("features", [])):
+        tags = feature.get("properties") or {}
+        category = classify_osm(tags)
+        point = _feature_point(feature.get("geometry") or {})
+        if not category or not point:
+            continue
+        pois.append({
+            "id": str(feature.get("id") or tags.get("@id") or f"{path.stem}_{i}"),
+            "name": tags.get("name:id") or tags.get("name:en") or tags.get("name") or category,
+            "category": category,
+            "lat": point[0],
+            "lon": point[1],
+            "city": tags.get("addr:city", "")
+        })
+    return pois
+
+
+def load_csv(path: Path) -> List[Dict[str, Any]]:
+    """Load POIs from a CSV file (id,name,category,lat,lon,city)"""
+    pois = []
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            if row.get("category") not in _CATEGORY_CODE:
+                continue
+            pois.append({
+                "id": row["id"],
+                "name": row["name"],
+                "category": row["category"],
+                "lat": float(row["lat"]),
+                "lon": float(row["lon"]),
+                "city": row.get("city", "")
+            })
+    return pois
+
+
+def _cell_keys(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    rows = np.floor((lats + 90.0) / CELL_DEG).astype(np.int64)
+    cols = np.floor((lons + 180.0) / CELL_DEG).astype(np.int64)
+    return rows * 100000 + cols
+
+
+class POIIndex:
+    """
+    Grid-bucketed spatial index over POIs
+    Points are sorted by grid cell; each cell maps to a contiguous slice
+    """
+
+    def __init__(self):
+        self.lats = np.empty(0, dtype=np.float64)
+        self.lons = np.empty(0, dtype=np.float64)
+        self.codes = np.empty(0, dtype=np.uint8)
+        self.ids = np.empty(0, dtype=str)
+        self.names = np.empty(0, dtype=str)
+        self.cities = np.empty(0, dtype=str)
+        self._cells: Dict[int, slice] = {}
+        self.loaded = False
+        self._load_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    # ------------------------------------------------------------------
+    # Build / persist
+    # ------------------------------------------------------------------
+
+    def build(self, pois: Iterable[Dict[str, Any]]):
+        pois = list(pois)
+        lats = np.array([p["lat"] for p in pois], dtype=np.float64)
+        lons = np.array([p["lon"] for p in pois], dtype=np.float64)
+        order = np.argsort(_cell_keys(lats, lons), kind="stable")
+
+        self.lats = lats[order]
+        self.lons = lons[order]
+        self.codes = np.array([_CATEGORY_CODE[p["category"]] for p in pois], dtype=np.uint8)[order]
+        self.ids = np.array([p["id"] for p in pois], dtype=str)[order]
+        self.names = np.array([p["name"] for p in pois], dtype=str)[order]
+        self.cities = np.array([p.get("city", "") for p in pois], dtype=str)[order]
+        self._index_cells()
+
+    def _index_cells(self):
+        keys = _cell_keys(self.lats, self.lons)
+        unique, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        self._cells = {
+            int(key): slice(int(start), int(start + count))
+            for key, start, count in zip(unique, starts, counts)
+        }
+        self.loaded = True
+
+    def save(self, path: Path, fingerprint: str = ""):
+        np.savez(
+            path,
+            version=np.array(INDEX_VERSION),
+            fingerprint=np.array(fingerprint),
+            lats=self.lats,
+            lons=self.lons,
+            codes=self.codes,
+            ids=self.ids,
+            names=self.names,
+            cities=self.cities
+        )
+
+    def load(self, path: Path, fingerprint: str = "") -> bool:
+        """Load a persisted index; False if missing or stale"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != INDEX_VERSION or str(data["fingerprint"]) != fingerprint:
+                    return False
+                self.lats = data["lats"]
+                self.lons = data["lons"]
+                self.codes = data["codes"]
+                self.ids = data["ids"]
+                self.names = data["names"]
+                self.cities = data["cities"]
+        except (OSError, KeyError, ValueError):
+            return False
+
+        self._index_cells()
+        return True
+
+    def ensure_loaded(self, source_dir: Optional[Path] = None):
+        """Load the cached index, or rebuild it from the source files"""
+        if self.loaded:
+            return
+        with self._load_lock:
+            # The startup warmup thread and a request may race to load
+            if self.loaded:
+                return
+
+            source_dir = Path(source_dir or poi_dir())
+            sources = sorted(
+                p for p in source_dir.glob("*")
+                if p.suffix.lower() in (".csv", ".geojson", ".json")
+            )
+            fingerprint = ";".join(f"{p.name}:{p.stat().st_size}:{int(p.stat().st_mtime)}" for p in sources)
+            cache_path = source_dir / "poi_index.npz"
+
+            if self.load(cache_path, fingerprint):
+                logger.info(f"POI index loaded: {len(self)} points")
+                return
+
+            pois = []
+            for path in sources:
+                try:
+                    pois.extend(load_csv(path) if path.suffix.lower() == ".csv" else load_geojson(path))
+                except Exception as e:
+                    logger.warning(f"Skipping POI source {path.name}: {e}")
+
+            self.build(pois)
+            try:
+                self.save(cache_path, fingerprint)
+            except OSError as e:
+                logger.warning(f"Could not persist POI index: {e}")
+            logger.info(f"POI index built: {len(self)} points from {len(sources)} files")
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _candidates(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlon = dlat / max(np.cos(np.radians(lat)), 1e-6)
+
+        row_lo = int(np.floor((lat - dlat + 90.0) / CELL_DEG))
+        row_hi = int(np.floor((lat + dlat + 90.0) / CELL_DEG))
+        col_lo = int(np.floor((lon - dlon + 180.0) / CELL_DEG))
+        col_hi = int(np.floor((lon + dlon + 180.0) / CELL_DEG))
+
+        # Big radius: scanning every occupied cell is cheaper than the rectangle
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) > len(self._cells):
+            cells = self._cells.values()
+        else:
+            cells = [
+                self._cells[key]
+                for row in range(row_lo, row_hi + 1)
+                for key in range(row * 100000 + col_lo, row * 100000 + col_hi + 1)
+                if key in self._cells
+            ]
+
+        if not cells:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(s.start, s.stop) for s in cells])
+
+    def within(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        categories: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """All POIs within `radius_km`, nearest first"""
+        self.ensure_loaded()
+        idx = self._candidates(latitude, longitude, radius_km)
+        if categories:
+            codes = [_CATEGORY_CODE[c] for c in categories if c in _CATEGORY_CODE]
+            idx = idx[np.isin(self.codes[idx], codes)]
+        if not len(idx):
+            return []
+
+        dist = haversine_km(latitude, longitude, self.lats[idx], self.lons[idx])
+        keep = dist <= radius_km
+        idx, dist = idx[keep], dist[keep]
+        order = np.argsort(dist, kind="stable")[:limit]
+        return [self._result(int(i), float(d)) for i, d in zip(idx[order], dist[order])]
+
+    def nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        k: int = 5,
+        categories: Optional[Iterable[str]] = None,
+        max_km: float = 50.0
+    ) -> List[Dict[str, Any]]:
+        """k nearest POIs (expanding ring search, capped at `max_km`)"""
+        self.ensure_loaded()
+        radius = CELL_DEG * KM_PER_DEG_LAT
+        while True:
+            radius = min(radius, max_km)
+            found = self.within(latitude, longitude, radius, categories, limit=k)
+            if len(found) >= k or radius >= max_km:
+                return found
+            radius *= 2
+
+    def _result(self, i: int, distance_km: float) -> Dict[str, Any]:
+        return {
+            "id": str(self.ids[i]),
+            "name": str(self.names[i]),
+            "category": CATEGORIES[self.codes[i]],
+            "city": str(self.cities[i]),
+            "distance_km": round(distance_km, 2),
+            "coordinates": {
+                "latitude": float(self.lats[i]),
+                "longitude": float(self.lons[i])
+            }
+        }
+
+
+# Global instance
+poi_index = POIIndex()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Geohash-bucketed Prayer Times Cache
+Users within a few km share one entry per (geohash, local date, method)
+"""
+from collections import OrderedDict
+from datetime import date as Date, timedelta
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+import asyncio
+import calendar
+import logging
+import time
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services import geohash
+
+logger = logging.getLogger(__name__)
+
+
+def local_midnight_epoch(day: Date, utc_offset: float) -> float:
+    """Unix time of the local midnight that ends `day`"""
+    next_day = day + timedelta(days=1)
+    return calendar.timegm(next_day.timetuple()) - utc_offset * 3600
+
+
+class GeoBucketCache:
+    """
+    Bounded LRU keyed by (geohash prefix, local date, method)
+
+    - entries expire at the local day boundary
+    - concurrent misses for the same key share one loader call
+    """
+
+    def __init__(self, max_entries: int = 10000, precision: int = 5):
+        self.max_entries = max_entries
+        self.precision = precision
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def bucket(self, latitude: float, longitude: float) -> str:
+        return geohash.encode(latitude, longitude, self.precision)
+
+    def bucket_center(self, bucket: str) -> Tuple[float, float]:
+        """Representative coordinate - every user in the bucket gets the same answer"""
+        return geohash.decode(bucket)
+
+    def key(self, bucket: str, day: Date, method: int) -> Tuple[str, str, int]:
+        return (bucket, day.isoformat(), method)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        expires_at: float,
+        loader: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Return the cached value, or run `loader` once for all concurrent callers"""
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._store(key, expires_at, t))
+
+        # A cancelled caller must not cancel the load other callers wait on
+        return await asyncio.shield(task)
+
+    def _store(self, key: Hashable, expires_at: float, task: asyncio.Future):
+        self._inflight.pop(key, None)
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.warning(f"Cache load failed for {key}: {task.exception()}")
+            return
+        if task.result() is not None:
+            self.set(key, task.result(), expires_at)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced
+        }
+
+    def clear(self):
+        self._entries.clear()
+
+
+# Global instance
+prayer_times_cache = GeoBucketCache(
+    max_entries=settings.PRAYER_CACHE_MAX_ENTRIES,
+    precision=settings.PRAYER_CACHE_GEOHASH_PRECISION
+)
+metrics.caches.register("prayer_times", prayer_times_cache.stats)
@@ -0,0 +1,302 @@
+# -*- coding: utf-8 -*-
+"""
+Offline Prayer Times Engine
+Umm Al-Qura University, Makkah (aladhan method 4) - NO network needed!
+
+Solar position follows the PrayTimes.org formulas, evaluated for a whole
+date range in one vectorized NumPy pass. Hijri dates use the tabular
+(arithmetic) Islamic calendar, which can differ from the official Umm
+Al-Qura calendar by one day - use `hijri_adjustment` to correct.
+"""
+from datetime import date as Date, datetime, timedelta
+from typing import Dict, Any, Optional
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+PRAYER_NAMES = ("fajr", "sunrise", "dhuhr", "asr", "maghrib", "isha")
+
+# Same keys as aladhan "timings", so existing formatters keep working
+TIMING_KEYS = ("Fajr", "Sunrise", "Dhuhr", "Asr", "Maghrib", "Isha")
+
+METHOD_ID = 4
+METHOD_NAME = "Umm Al-Qura University, Makkah"
+
+# Umm Al-Qura parameters
+FAJR_ANGLE = 18.5
+SUNRISE_ANGLE = 0.833
+ISHA_MINUTES = 90
+ISHA_MINUTES_RAMADAN = 120
+ASR_FACTOR = 1  # Shafi'i / standard
+
+HIJRI_EPOCH = 1948439.5
+RAMADAN = 9
+
+HIJRI_MONTHS = [
+    ("Muharram", "مُحَرَّم"),
+    ("Safar", "صَفَر"),
+    ("Rabi al-Awwal", "رَبيع الأوّل"),
+    ("Rabi al-Thani", "رَبيع الثاني"),
+    ("Jumada al-Ula", "جُمادى الأولى"),
+    ("Jumada al-Akhirah", "جُمادى الآخرة"),
+    ("Rajab", "رَجَب"),
+    ("Shaban", "شَعْبان"),
+    ("Ramadan", "رَمَضان"),
+    ("Shawwal", "شَوّال"),
+    ("Dhul Qadah", "ذوالقعدة"),
+    ("Dhul Hijjah", "ذوالحجة"),
+]
+
+# Predefined major locations (Saudi + Indonesian embarkation cities)
+KNOWN_LOCATIONS = {
+    "makkah": {"name": "Makkah", "latitude": 21.4225, "longitude": 39.8262, "utc_offset": 3},
+    "madinah": {"name": "Madinah", "latitude": 24.5247, "longitude": 39.5692, "utc_offset": 3},
+    "jeddah": {"name": "Jeddah", "latitude": 21.5433, "longitude": 39.1728, "utc_offset": 3},
+    "jakarta": {"name": "Jakarta", "latitude": -6.2088, "longitude": 106.8456, "utc_offset": 7},
+    "surabaya": {"name": "Surabaya", "latitude": -7.2575, "longitude": 112.7521, "utc_offset": 7},
+    "medan": {"name": "Medan", "latitude": 3.5952, "longitude": 98.6722, "utc_offset": 7},
+    "makassar": {"name": "Makassar", "latitude": -5.1477, "longitude": 119.4327, "utc_offset": 8},
+    "solo": {"name": "Solo", "latitude": -7.5755, "longitude": 110.8243, "utc_offset": 7},
+    "batam": {"name": "Batam", "latitude": 1.0456, "longitude": 104.0305, "utc_offset": 7},
+    "padang": {"name": "Padang", "latitude": -0.9471, "longitude": 100.4172, "utc_offset": 7},
+    "palembang": {"name": "Palembang", "latitude": -2.9761, "longitude": 104.7754, "utc_offset": 7},
+    "banda_aceh": {"name": "Banda Aceh", "latitude": 5.5483, "longitude": 95.3238, "utc_offset": 7},
+    "banjarmasin": {"name": "Banjarmasin", "latitude": -3.3186, "longitude": 114.5944, "utc_offset": 8},
+    "balikpapan": {"name": "Balikpapan", "latitude": -1.2379, "longitude": 116.8529, "utc_offset": 8},
+    "lombok": {"name": "Lombok", "latitude": -8.5833, "longitude": 116.1167, "utc_offset": 8},
+}
+
+LOCATION_ALIASES = {
+    "mecca": "makkah",
+    "mekkah": "makkah",
+    "mekah": "makkah",
+    "makah": "makkah",
+    "medina": "madinah",
+    "madina": "madinah",
+    "jedah": "jeddah",
+    "jiddah": "jeddah",
+    "surakarta": "solo",
+    "aceh": "banda_aceh",
+    "mataram": "lombok",
+}
+
+
+def resolve_location_key(name: str) -> Optional[str]:
+    """Normalize a (loose) location name to a KNOWN_LOCATIONS key"""
+    key = (name or "").strip().lower().replace(" ", "_")
+    key = LOCATION_ALIASES.get(key, key)
+    return key if key in KNOWN_LOCATIONS else None
+
+
+def resolve_location(name: str) -> Optional[Dict[str, Any]]:
+    """Look up a predefined location by (loose) name"""
+    key = resolve_location_key(name)
+    return KNOWN_LOCATIONS[key] if key else None
+
+
+def guess_utc_offset(latitude: float, longitude: float) -> float:
+    """
+    Guess the UTC offset (hours) for a coordinate without a tz database.
+    Saudi Arabia and Indonesia do not observe DST, so a fixed offset is exact there.
+    """
+    if 16.0 <= latitude <= 32.5 and 34.5 <= longitude <= 55.7:
+        return 3.0  # Arabia Standard Time
+    if -11.5 <= latitude <= 6.5 and 94.5 <= longitude <= 141.5:
+        if longitude < 114.5:
+            return 7.0  # WIB
+        if longitude < 125.5:
+            return 8.0  # WITA
+        return 9.0  # WIT
+    return float(round(longitude / 15.0))
+
+
+def local_today(utc_offset: float) -> Date:
+    """Current calendar date at the given UTC offset"""
+    return (datetime.utcnow() + timedelta(hours=utc_offset)).date()
+
+
+# ============================================================================
+# VECTORIZED ASTRONOMY (all inputs are float64 arrays of Julian days)
+# ============================================================================
+
+def _sun_position(jd: np.ndarray):
+    """Declination (radians) and equation of time (hours)"""
+    d = jd - 2451545.0
+    g = np.radians((357.529 + 0.98560028 * d) % 360.0)
+    q = (280.459 + 0.98564736 * d) % 360.0
+    lam = np.radians((q + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g)) % 360.0)
+    e = np.radians(23.439 - 0.00000036 * d)
+
+    ra = np.degrees(np.arctan2(np.cos(e) * np.sin(lam), np.cos(lam))) / 15.0
+    eqt = q / 15.0 - ra % 24.0
+    decl = np.arcsin(np.sin(e) * np.sin(lam))
+    return decl, eqt
+
+
+def _mid_day(jd: np.ndarray, portion: float) -> np.ndarray:
+    _, eqt = _sun_position(jd + portion)
+    return (12.0 - eqt) % 24.0
+
+
+def _sun_angle_time(
+    jd: np.ndarray,
+    lat: float,
+    angle,
+    portion: float,
+    ccw: bool = False
+) -> np.ndarray:
+    """Time (hours) at which the sun reaches `angle` degrees below the horizon"""
+    decl, _ = _sun_position(jd + portion)
+    noon = _mid_day(jd, portion)
+    cos_h = (-np.sin(np.radians(angle)) - np.sin(decl) * np.sin(lat)) / (np.cos(decl) * np.cos(lat))
+    with np.errstate(invalid="ignore"):
+        t = np.degrees(np.arccos(cos_h)) / 15.0
+    return noon - t if ccw else noon + t
+
+
+def _asr_time(jd: np.ndarray, lat: float, portion: float) -> np.ndarray:
+    decl, _ = _sun_position(jd + portion)
+    angle = -np.degrees(np.arctan(1.0 / (ASR_FACTOR + np.tan(np.abs(lat - decl)))))
+    return _sun_angle_time(jd, lat, angle, portion)
+
+
+def _islamic_to_jd(year, month, day):
+    return (
+        day
+        + np.ceil(29.5 * (month - 1))
+        + (year - 1) * 354
+        + np.floor((3 + 11 * year) / 30.0)
+        + HIJRI_EPOCH - 1
+    )
+
+
+def _hijri_from_jd(jd: np.ndarray) -> np.ndarray:
+    """Tabular Islamic calendar: (n, 3) int array of year, month, day"""
+    jd = np.floor(jd) + 0.5
+    year = np.floor((30 * (jd - HIJRI_EPOCH) + 10646) / 10631.0)
+    month = np.minimum(12, np.ceil((jd - (29 + _islamic_to_jd(year, 1, 1))) / 29.5) + 1)
+    day = jd - _islamic_to_jd(year, month, 1) + 1
+    return np.stack([year, month, day], axis=1).astype(np.int32)
+
+
+def _julian_days(start: Date, days: int) -> np.ndarray:
+    """Julian day at 00:00 UTC for each date in the range"""
+    return start.toordinal() + 1721424.5 + np.arange(days, dtype=np.float64)
+
+
+def format_minutes(minutes: float) -> str:
+    """Minutes since local midnight -> HH:MM"""
+    if minutes != minutes:  # NaN (polar day/night)
+        return "--:--"
+    minutes = int(minutes) % 1440
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class PrayerTimesEngine:
+    """
+    Local prayer times calculator (Umm Al-Qura)
+    NO API, NO network - microseconds per request!
+    """
+
+    def compute_range(
+        self,
+        latitude: float,
+        longitude: float,
+        start: Date,
+        days: int = 1,
+        utc_offset: Optional[float] = None,
+        hijri_adjustment: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Compute prayer times for `days` consecutive dates in one pass
+
+        Returns:
+            {
+                "minutes": float64 array (days, 6) - minutes since local
+                           midnight in PRAYER_NAMES order (NaN if undefined),
+                "hijri": int32 array (days, 3) - year, month, day,
+                "start": first date,
+                "utc_offset": hours
+            }
+        """
+        if utc_offset is None:
+            utc_offset = guess_utc_offset(latitude, longitude)
+
+        lat = np.radians(latitude)
+        jd = _julian_days(start, days) - longitude / 360.0
+
+        fajr = _sun_angle_time(jd, lat, FAJR_ANGLE, 5 / 24.0, ccw=True)
+        sunrise = _sun_angle_time(jd, lat, SUNRISE_ANGLE, 6 / 24.0, ccw=True)
+        dhuhr = _mid_day(jd, 12 / 24.0)
+        asr = _asr_time(jd, lat, 13 / 24.0)
+        maghrib = _sun_angle_time(jd, lat, SUNRISE_ANGLE, 18 / 24.0)
+
+        shift = utc_offset - longitude / 15.0
+        fajr, sunrise, dhuhr, asr, maghrib = (
+            t + shift for t in (fajr, sunrise, dhuhr, asr, maghrib)
+        )
+
+        # High latitude safety net (aladhan default: angle based)
+        night = (sunrise - maghrib) % 24.0
+        portion = FAJR_ANGLE / 60.0 * night
+        with np.errstate(invalid="ignore"):
+            too_early = np.isnan(fajr) | (((sunrise - fajr) % 24.0) > portion)
+        fajr = np.where(too_early & ~np.isnan(portion), sunrise - portion, fajr)
+
+        hijri = _hijri_from_jd(_julian_days(start, days) + hijri_adjustment)
+        isha_offset = np.where(hijri[:, 1] == RAMADAN, ISHA_MINUTES_RAMADAN, ISHA_MINUTES) / 60.0
+        isha = maghrib + isha_offset
+
+        hours = np.stack([fajr, sunrise, dhuhr, asr, maghrib, isha], axis=1) % 24.0
+        minutes = np.rint(hours * 60.0) % 1440
+
+        return {
+            "minutes": minutes,
+            "hijri": hijri,
+            "start": start,
+            "utc_offset": utc_offset
+        }
+
+    def get_timings(
+        self,
+        latitude: float,
+        longitude: float,
+        day: Optional[Date] = None,
+        utc_offset: Optional[float] = None
+    ) -> Dict[str, str]:
+        """Aladhan-compatible timings dict for a single date"""
+        if utc_offset is None:
+            utc_offset = guess_utc_offset(latitude, longitude)
+        if day is None:
+            day = local_today(utc_offset)
+
+        table = self.compute_range(latitude, longitude, day, 1, utc_offset)
+        return self.timings_from_minutes(table["minutes"][0])
+
+    @staticmethod
+    def timings_from_minutes(row) -> Dict[str, str]:
+        """One row of minutes -> {"Fajr": "04:52", ...}"""
+        return {key: format_minutes(value) for key, value in zip(TIMING_KEYS, row)}
+
+    @staticmethod
+    def hijri_info(year: int, month: int, day: int) -> Dict[str, Any]:
+        """Aladhan-style hijri date dict"""
+        month_en, month_ar = HIJRI_MONTHS[int(month) - 1]
+        return {
+            "date": f"{int(day):02d}-{int(month):02d}-{int(year)}",
+            "day": f"{int(day):02d}",
+            "month": {"number": int(month), "en": month_en, "ar": month_ar},
+            "year": str(int(year)),
+            "designation": {"abbreviated": "AH", "expanded": "Anno Hegirae"}
+        }
+
+    def hijri_date(self, day: Date, adjustment: int = 0) -> Dict[str, Any]:
+        """Hijri date for a gregorian date - offline"""
+        jd = _julian_days(day, 1) + adjustment
+        year, month, hday = _hijri_from_jd(jd)[0]
+        return self.hijri_info(year, month, hday)
+
+
+# Global instance
+prayer_engine = PrayerTimesEngine()
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+"""
+Precomputed Prayer Tables
+Yearly Umm Al-Qura tables for popular cities, memory-mapped for O(1) lookups
+
+File layout (per year, in PRAYER_TABLE_DIR):
+    prayer_times_<year>.npy   uint16 (cities, 366, 6) minutes since local midnight
+    prayer_times_<year>.json  {"year": ..., "cities": [...], "method": ...}
+
+Build with:
+    python -m app.services.prayer_tables --years 2026 2027
+"""
+from datetime import date as Date
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import json
+import logging
+import numpy as np
+
+from app.config import settings
+from app.services.prayer_engine import (
+    prayer_engine,
+    KNOWN_LOCATIONS,
+    METHOD_ID,
+    TIMING_KEYS,
+    format_minutes
+)
+
+logger = logging.getLogger(__name__)
+
+DAYS_PER_TABLE = 366
+MISSING = np.iinfo(np.uint16).max  # polar day/night - no valid time
+
+DEFAULT_TABLE_DIR = Path(__file__).resolve().parents[2] / "data" / "prayer_tables"
+
+
+def table_dir() -> Path:
+    return Path(settings.PRAYER_TABLE_DIR) if settings.PRAYER_TABLE_DIR else DEFAULT_TABLE_DIR
+
+
+def build_table(year: int, cities: List[str], out_dir: Optional[Path] = None) -> Path:
+    """Precompute one year for `cities` and write the .npy/.json pair"""
+    out_dir = Path(out_dir or table_dir())
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    start = Date(year, 1, 1)
+    days = (Date(year + 1, 1, 1) - start).days
+    table = np.full((len(cities), DAYS_PER_TABLE, len(TIMING_KEYS)), MISSING, dtype=np.uint16)
+
+    for idx, key in enumerate(cities):
+        place = KNOWN_LOCATIONS[key]
+        minutes = prayer_engine.compute_range(
+            place["latitude"], place["longitude"], start, days, place["utc_offset"]
+        )["minutes"]
+        table[idx, :days] = np.where(np.isnan(minutes), MISSING, minutes).astype(np.uint16)
+
+    npy_path = out_dir / f"prayer_times_{year}.npy"
+    np.save(npy_path, table)
+    with open(out_dir / f"prayer_times_{year}.json", "w", encoding="utf-8") as f:
+        json.dump({"year": year, "cities": list(cities), "method": METHOD_ID}, f)
+
+    logger.info(f"Prayer table {year}: {len(cities)} cities -> {npy_path}")
+    return npy_path
+
+
+class PrayerTableStore:
+    """
+    Read-only, memory-mapped prayer tables
+    Lookup by (city, day-of-year) is a single array index - no computation
+    """
+
+    def __init__(self, directory: Optional[Path] = None):
+        self.directory = Path(directory) if directory else None
+        self._tables: Dict[int, Optional[np.ndarray]] = {}
+        self._city_index: Dict[int, Dict[str, int]] = {}
+
+    def _load(self, year: int) -> Optional[np.ndarray]:
+        if year in self._tables:
+            return self._tables[year]
+
+        base = self.directory or table_dir()
+        npy_path = base / f"prayer_times_{year}.npy"
+        meta_path = base / f"prayer_times_{year}.json"
+        table = None
+
+        try:
+            if npy_path.exists() and meta_path.exists():
+                with open(meta_path, encoding="utf-8") as f:
+                    meta = json.load(f)
+                table = np.load(npy_path, mmap_mode="r")
+                self._city_index[year] = {key: i for i, key in enumerate(meta["cities"])}
+                logger.info(f"Prayer table {year} mapped ({len(meta['cities'])} cities)")
+        except Exception as e:
+            logger.warning(f"Could not map prayer table {year}: {e}")
+            table = None
+
+        # Cache misses too, so absent years don't hit the filesystem again
+        self._tables[year] = table
+        return table
+
+    def lookup(self, city: str, day: Date) -> Optional[np.ndarray]:
+        """Row of 6 uint16 minutes (view into the mmap) or None if not tabled"""
+        table = self._load(day.year)
+        if table is None:
+            return None
+
+        idx = self._city_index[day.year].get(city)
+        if idx is None:
+            return None
+
+        row = table[idx, day.timetuple().tm_yday - 1]
+        if row[0] == MISSING and row[2] == MISSING:
+            return None
+        return row
+
+    def get_timings(self, city: str, day: Date) -> Optional[Dict[str, str]]:
+        """Aladhan-style timings from the table, or None to fall back to computing"""
+        row = self.lookup(city, day)
+        if row is None:
+            return None
+        return {
+            key: "--:--" if value == MISSING else format_minutes(value)
+            for key, value in zip(TIMING_KEYS, row)
+        }
+
+
+# Global instance
+prayer_tables = PrayerTableStore()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build memory-mapped prayer tables")
+    parser.add_argument("--years", type=int, nargs="+", default=[Date.today().year, Date.today().year + 1])
+    parser.add_argument("--cities", nargs="+", default=settings.PRAYER_TABLE_CITIES)
+    parser.add_argument("--out", type=Path, default=None)
+    args = parser.parse_args()
+
+    unknown = [c for c in args.cities if c not in KNOWN_LOCATIONS]
+    if unknown:
+        parser.error(f"Unknown cities: {', '.join(unknown)} (see KNOWN_LOCATIONS)")
+
+    for year in args.years:
+        path = build_table(year, args.cities, args.out)
+        print(f"✓ {path}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Region Resolver
+Coordinates -> Makkah / Madinah / Jeddah / Mina / Arafah / Muzdalifah / miqat
+Offline point-in-polygon - no reverse geocoding needed!
+
+Boundaries live in data/regions/regions.geojson (see README there).
+Lookup: uniform grid cell -> candidate regions (smallest first) ->
+bounding-box check -> ray-casting point-in-polygon.
+"""
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import json
+import logging
+import math
+import threading
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+GRID_DEG = 0.05  # ~5 km cells
+DEFAULT_REGIONS_PATH = Path(__file__).resolve().parents[2] / "data" / "regions" / "regions.geojson"
+
+# Polygon = [outer ring, *holes], ring = closed list of (lon, lat) edges.
+# Rings are a few dozen vertices: plain Python beats NumPy call overhead.
+Ring = List[Tuple[float, float, float, float]]
+Polygon = List[Ring]
+
+
+def _ring_area(points: np.ndarray) -> float:
+    """Shoelace area in square degrees (only used to order regions)"""
+    lons, lats = points[:, 0], points[:, 1]
+    return 0.5 * abs(float(np.dot(lons[:-1], lats[1:]) - np.dot(lons[1:], lats[:-1])))
+
+
+def _in_ring(lon: float, lat: float, ring: Ring) -> bool:
+    """Even-odd ray casting against one closed ring"""
+    inside = False
+    for x1, y1, x2, y2 in ring:
+        if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * (x2 - x1) / (y2 - y1):
+            inside = not inside
+    return inside
+
+
+def _in_polygon(lon: float, lat: float, polygon: Polygon) -> bool:
+    outer, *holes = polygon
+    if not _in_ring(lon, lat, outer):
+        return False
+    return not any(_in_ring(lon, lat, hole) for hole in holes)
+
+
+def region_label(region: Dict[str, Any]) -> str:
+    """"Mina (Makkah)", or just "Madinah" for a city"""
+    if region["name"] == region["city"] or region["kind"] == "city":
+        return region["name"]
+    return f"{region['name']} ({region['city']})"
+
+
+class RegionResolver:
+    """Grid-bucketed point-in-polygon lookup over pilgrimage regions"""
+
+    def __init__(self):
+        self.regions: List[Dict[str, Any]] = []
+        self._polygons: List[List[Polygon]] = []
+        self._bboxes: List[Tuple[float, float, float, float]] = []  # min_lon, min_lat, max_lon, max_lat
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self.loaded = False
+        self._load_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.regions)
+
+    def build(self, features: List[Dict[str, Any]]):
+        regions, polygons, bboxes, areas = [], [], [], []
+        for feature in features:
+            geometry = feature.get("geometry") or {}
+            if geometry.get("type") == "Polygon":
+                parts = [geometry["coordinates"]]
+            elif geometry.get("type") == "MultiPolygon":
+                parts = geometry["coordinates"]
+            else:
+                continue
+
+            shapes: List[Polygon] = []
+            outers = []
+            for rings in parts:
+                shape = []
+                for ring in rings:
+                    arr = np.asarray(ring, dtype=np.float64)[:, :2]
+                    if not np.array_equal(arr[0], arr[-1]):
+                        arr = np.vstack([arr, arr[:1]])
+                    shape.append([tuple(edge) for edge in np.hstack([arr[:-1], arr[1:]]).tolist()])
+                    if len(shape) == 1:
+                        outers.append(arr)
+                shapes.append(shape)
+
+            outline = np.vstack(outers)
+            props = feature.get("properties") or {}
+            regions.append({
+                "id": props.get("id") or props.get("name", "").lower(),
+                "name": props.get("name", ""),
+                "kind": props.get("kind", "city"),
+                "city": props.get("city") or props.get("name", ""),
+                "city_key": props.get("city_key"),
+                "aliases": [a.lower() for a in props.get("aliases", [])]
+            })
+            polygons.append(shapes)
+            bboxes.append((*outline.min(axis=0), *outline.max(axis=0)))
+            areas.append(sum(_ring_area(arr) for arr in outers))
+
+        # Smallest first: Mina wins over Makkah, Bir Ali over Madinah
+        order = np.argsort(areas, kind="stable") if areas else []
+        self.regions = [regions[i] for i in order]
+        self._polygons = [polygons[i] for i in order]
+        self._bboxes = [tuple(float(v) for v in bboxes[i]) for i in order]
+
+        grid: Dict[Tuple[int, int], List[int]] = {}
+        for i, (min_lon, min_lat, max_lon, max_lat) in enumerate(self._bboxes):
+            for row in range(int(np.floor(min_lat / GRID_DEG)), int(np.floor(max_lat / GRID_DEG)) + 1):
+                for col in range(int(np.floor(min_lon / GRID_DEG)), int(np.floor(max_lon / GRID_DEG)) + 1):
+                    grid.setdefault((row, col), []).append(i)
+        self._grid = grid
+        self.loaded = True
+
+    def ensure_loaded(self, path: Optional[Path] = None):
+        if self.loaded:
+            return
+        with self._load_lock:
+            # The startup warmup thread and a request may race to load
+            if self.loaded:
+                return
+
+            path = Path(path or settings.REGIONS_PATH or DEFAULT_REGIONS_PATH)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    features = json.load(f).get("features", [])
+            except (OSError, ValueError) as e:
+                logger.warning(f"Region boundaries not available ({path}): {e}")
+                features = []
+
+            self.build(features)
+            logger.info(f"Regions loaded: {len(self)} boundaries")
+
+    def _matches(self, latitude: float, longitude: float, first_only: bool) -> List[int]:
+        self.ensure_loaded()
+        cell = (math.floor(latitude / GRID_DEG), math.floor(longitude / GRID_DEG))
+        hits = []
+        for i in self._grid.get(cell, ()):
+            min_lon, min_lat, max_lon, max_lat = self._bboxes[i]
+            if not (min_lon <= longitude <= max_lon and min_lat <= latitude <= max_lat):
+                continue
+            if any(_in_polygon(longitude, latitude, shape) for shape in self._polygons[i]):
+                hits.append(i)
+                if first_only:
+                    break
+        return hits
+
+    def resolve(self, latitude: float, longitude: float) -> Optional[Dict[str, Any]]:
+        """Most specific region containing the point, or None"""
+        hits = self._matches(latitude, longitude, first_only=True)
+        return dict(self.regions[hits[0]]) if hits else None
+
+    def resolve_all(self, latitude: float, longitude: float) -> List[Dict[str, Any]]:
+        """Every region containing the point, most specific first"""
+        return [dict(self.regions[i]) for i in self._matches(latitude, longitude, first_only=False)]
+
+    def find(self, name: str) -> Optional[Dict[str, Any]]:
+        """Region by id, name or alias, with its bounding-box center as coordinates"""
+        self.ensure_loaded()
+        needle = " ".join(name.lower().split())
+        for i, region in enumerate(self.regions):
+            if needle in (region["id"], region["name"].lower()) or needle in region["aliases"]:
+                min_lon, min_lat, max_lon, max_lat = self._bboxes[i]
+                return {
+                    **region,
+                    "latitude": (min_lat + max_lat) / 2,
+                    "longitude": (min_lon + max_lon) / 2
+                }
+        return None
+
+
+# Global instance
+region_resolver = RegionResolver()
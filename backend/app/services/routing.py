@@ -0,0 +1,603 @@
+# -*- coding: utf-8 -*-
+"""
+Offline Pedestrian Routing
+Walking routes around Masjidil Haram and Masjid Nabawi - no API needed!
+
+- graph: OSM footways/streets in compact CSR arrays (indptr / neighbors / meters)
+- heuristic: ALT - exact walking distances from a few landmark nodes
+  (triangle inequality) combined with straight-line distance
+- query: A* over the CSR graph, a few milliseconds for a city extract
+- cache: LRU of routes, warmed with hotel -> nearest Haram gate at startup
+- components: every connected area above MIN_COMPONENT_NODES is kept
+  (Makkah and Madinah are separate graphs in one engine); routes are only
+  searched between nodes of the same component
+
+Sources: every *.osm (OSM XML) / *.geojson (LineStrings) in ROUTING_DATA_DIR
+(see data/routing/README.md). The built graph is cached as routing_graph.npz.
+
+Prebuild with:
+    python -m app.services.routing
+"""
+from collections import OrderedDict
+from heapq import heappush, heappop
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import argparse
+import json
+import logging
+import threading
+import xml.etree.ElementTree as ET
+import numpy as np
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.geo_distance import haversine_km
+
+logger = logging.getLogger(__name__)
+
+# Ways a pedestrian may use (motorways/trunks only with foot=yes)
+WALKABLE_HIGHWAYS = {
+    "footway", "pedestrian", "path", "steps", "corridor", "crossing",
+    "living_street", "residential", "service", "unclassified", "track", "road",
+    "tertiary", "tertiary_link", "secondary", "secondary_link", "primary", "primary_link",
+}
+NO_FOOT = {"no", "private"}
+
+WALKING_M_PER_MIN = 75.0  # ~4.5 km/h, crowded streets
+LANDMARK_COUNT = 8  # Per component of at least LANDMARK_MIN_NODES
+LANDMARK_MIN_NODES = 50  # Smaller components use the straight-line heuristic only
+MIN_COMPONENT_NODES = 20  # Smaller islands (parking decks, courtyards) are dropped
+SNAP_MAX_M = 500.0  # Further than this from any walkway -> no route
+CELL_DEG = 0.002  # ~220 m snapping grid
+GRAPH_VERSION = 2
+
+DEFAULT_ROUTING_DIR = Path(__file__).resolve().parents[2] / "data" / "routing"
+
+
+def routing_dir() -> Path:
+    return Path(settings.ROUTING_DATA_DIR) if settings.ROUTING_DATA_DIR else DEFAULT_ROUTING_DIR
+
+
+def is_walkable(tags: Dict[str, Any]) -> bool:
+    highway = tags.get("highway")
+    if not highway:
+        return False
+    foot = tags.get("foot")
+    if foot in NO_FOOT or (tags.get("access") in NO_FOOT and foot != "yes"):
+        return False
+    return highway in WALKABLE_HIGHWAYS or foot in ("yes", "designated")
+
+
+class _GraphBuilder:
+    """Collects nodes (deduplicated by key) and undirected edges"""
+
+    def __init__(self):
+        self.index: Dict[Any, int] = {}
+        self.coords: List[Tuple[float, float]] = []
+        self.edges: List[Tuple[int, int]] = []
+
+    def node(self, key, lat: float, lon: float) -> int:
+        i = self.index.get(key)
+        if i is None:
+            i = self.index[key] = len(self.coords)
+            self.coords.append((lat, lon))
+        return i
+
+    def way(self, nodes: List[int]):
+        self.edges.extend(zip(nodes, nodes[1:]))
+
+
+def load_osm_xml(path: Path, builder: _GraphBuilder):
+    """Walkable ways from an OSM XML extract (Overpass `out body;>;out skel;`)"""
+    node_coords: Dict[str, Tuple[float, float]] = {}
+    ways: List[List[str]] = []
+
+    for _, elem in ET.iterparse(str(path), events=("end",)):
+        if elem.tag == "node":
+            node_coords[elem.get("id")] = (float(elem.get("lat")), float(elem.get("lon")))
+            elem.clear()
+        elif elem.tag == "way":
+            tags = {t.get("k"): t.get("v") for t in elem.iter("tag")}
+            if is_walkable(tags):
+                ways.append([nd.get("ref") for nd in elem.iter("nd")])
+            elem.clear()
+
+    for refs in ways:
+        nodes = [
+            builder.node(("osm", ref), *node_coords[ref])
+            for ref in refs if ref in node_coords
+        ]
+        builder.way(nodes)
+
+
+def load_geojson(path: Path, builder: _GraphBuilder):
+    """Walkable LineStrings from GeoJSON (nodes shared by identical coordinates)"""
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+
+    for feature in data.get("features", []):
+        tags = feature.get("properties") or {}
+        geometry = feature.get("geometry") or {}
+        if not is_walkable(tags):
+            continue
+        if geometry.get("type") == "LineString":
+            lines = [geometry["coordinates"]]
+        elif geometry.get("type") == "MultiLineString":
+            lines = geometry["coordinates"]
+        else:
+            continue
+        for line in lines:
+            builder.way([
+                builder.node((round(lat, 7), round(lon, 7)), lat, lon)
+                for lon, lat, *_ in line
+            ])
+
+
+def _dijkstra(indptr: List[int], neighbors: List[int], lengths: List[float], source: int) -> List[float]:
+    """Single-source walking distances to every node (meters)"""
+    inf = float("inf")
+    dist = [inf] * (len(indptr) - 1)
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+    while heap:
+        d, u = heappop(heap)
+        if d > dist[u]:
+            continue
+        for j in range(indptr[u], indptr[u + 1]):
+            v = neighbors[j]
+            nd = d + lengths[j]
+            if nd < dist[v]:
+                dist[v] = nd
+                heappush(heap, (nd, v))
+    return dist
+
+
+def _finite(distances: List[float]) -> np.ndarray:
+    """Landmark row: unreachable nodes (other components) stored as 0"""
+    row = np.asarray(distances, dtype=np.float32)
+    row[np.isinf(row)] = 0.0
+    return row
+
+
+def _cell_keys(lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    rows = np.floor((lats + 90.0) / CELL_DEG).astype(np.int64)
+    cols = np.floor((lons + 180.0) / CELL_DEG).astype(np.int64)
+    return rows * 1000000 + cols
+
+
+class RoutingEngine:
+    """
+    Pedestrian graph in CSR form with ALT-accelerated A*
+
+    Connected components of at least MIN_COMPONENT_NODES nodes are kept and
+    labelled per node (`component`); two points in different components
+    (e.g. Makkah and Madinah) have no route.
+    """
+
+    def __init__(self, cache_size: int = 2048):
+        self.lats = np.empty(0, dtype=np.float64)
+        self.lons = np.empty(0, dtype=np.float64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.neighbors = np.empty(0, dtype=np.int32)
+        self.lengths = np.empty(0, dtype=np.float32)
+        self.component = np.empty(0, dtype=np.int32)  # Component label per node
+        self.landmarks = np.empty((0, 0), dtype=np.float32)  # (L, n) meters, 0 outside its component
+        self.landmark_components = np.empty(0, dtype=np.int32)  # (L,) component of each landmark
+        self.cache_size = cache_size
+        self._routes: "OrderedDict[Tuple[int, int], Tuple[float, List[int]]]" = OrderedDict()
+        self.route_hits = 0
+        self.route_misses = 0
+        self._routes_lock = threading.Lock()
+        self._adjacency: Optional[Tuple[List[int], List[int], List[float]]] = None
+        self._cells: Dict[int, np.ndarray] = {}
+        self.loaded = False
+        self._load_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.lats)
+
+    @property
+    def available(self) -> bool:
+        return len(self) > 1
+
+    # ------------------------------------------------------------------
+    # Build / persist
+    # ------------------------------------------------------------------
+
+    def build(self, coords: List[Tuple[float, float]], edges: List[Tuple[int, int]]):
+        n = len(coords)
+        if n < 2 or not edges:
+            self._set_graph(np.empty(0), np.empty(0), np.zeros(1, dtype=np.int64),
+                            np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32),
+                            np.empty(0, dtype=np.int32))
+            return
+
+        points = np.asarray(coords, dtype=np.float64)
+        pairs = np.asarray(edges, dtype=np.int64)
+        pairs = pairs[pairs[:, 0] != pairs[:, 1]]
+
+        # Both directions, shortest duplicate wins
+        src = np.concatenate([pairs[:, 0], pairs[:, 1]])
+        dst = np.concatenate([pairs[:, 1], pairs[:, 0]])
+        meters = haversine_km(points[src, 0], points[src, 1], points[dst, 0], points[dst, 1]) * 1000
+        order = np.lexsort((meters, dst, src))
+        src, dst, meters = src[order], dst[order], meters[order]
+        first = np.ones(len(src), dtype=bool)
+        first[1:] = (src[1:] != src[:-1]) | (dst[1:] != dst[:-1])
+        src, dst, meters = src[first], dst[first], meters[first]
+
+        # Keep every component big enough to walk in, renumbered 0..k-1
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=n))])
+        label, sizes = self._components(indptr.tolist(), dst.tolist(), n)
+        big = sizes >= MIN_COMPONENT_NODES
+        if not big.any():
+            big[np.argmax(sizes)] = True
+        keep = np.flatnonzero(big[label])
+        remap = np.full(n, -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        mask = remap[src] >= 0
+        src, dst, meters = remap[src[mask]], remap[dst[mask]], meters[mask]
+        # Component labels renumbered 0..c-1 over the kept components
+        relabel = np.cumsum(big) - 1
+        component = relabel[label[keep]]
+
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=len(keep)))])
+        self._set_graph(
+            points[keep, 0], points[keep, 1], indptr.astype(np.int64),
+            dst.astype(np.int32), meters.astype(np.float32), component.astype(np.int32)
+        )
+        self._build_landmarks()
+
+    @staticmethod
+    def _components(indptr: List[int], neighbors: List[int], n: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Component label per node and node count per component"""
+        label = [-1] * n
+        sizes = []
+        for start in range(n):
+            if label[start] >= 0:
+                continue
+            comp = len(sizes)
+            label[start] = comp
+            stack, size = [start], 0
+            while stack:
+                u = stack.pop()
+                size += 1
+                for j in range(indptr[u], indptr[u + 1]):
+                    v = neighbors[j]
+                    if label[v] < 0:
+                        label[v] = comp
+                        stack.append(v)
+            sizes.append(size)
+        return np.asarray(label, dtype=np.int64), np.asarray(sizes, dtype=np.int64)
+
+    def _build_landmarks(self, count: int = LANDMARK_COUNT):
+        """Farthest-point landmark selection per component, one Dijkstra per landmark"""
+        indptr, neighbors, lengths = self._lists()
+        rows: List[np.ndarray] = []
+        owners: List[int] = []
+        for comp, size in enumerate(np.bincount(self.component)):
+            if size < LANDMARK_MIN_NODES:
+                continue
+            members = self.component == comp
+            # Start from the periphery: the node farthest from an arbitrary member
+            first = _finite(_dijkstra(indptr, neighbors, lengths, int(np.argmax(members))))
+            current = int(np.argmax(np.where(members, first, -1)))
+            nearest = None
+            for _ in range(min(count, size)):
+                row = _finite(_dijkstra(indptr, neighbors, lengths, current))
+                rows.append(row)
+                owners.append(comp)
+                nearest = row if nearest is None else np.minimum(nearest, row)
+                current = int(np.argmax(np.where(members, nearest, -1)))
+        self.landmarks = np.vstack(rows) if rows else np.empty((0, len(self)), dtype=np.float32)
+        self.landmark_components = np.asarray(owners, dtype=np.int32)
+
+    def _set_graph(self, lats, lons, indptr, neighbors, lengths, component):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.indptr = indptr
+        self.neighbors = neighbors
+        self.lengths = lengths
+        self.component = np.asarray(component, dtype=np.int32)
+        self.landmarks = np.empty((0, len(self.lats)), dtype=np.float32)
+        self.landmark_components = np.empty(0, dtype=np.int32)
+        self._adjacency = None
+        self._routes.clear()
+        self._index_cells()
+
+    def _index_cells(self):
+        keys = _cell_keys(self.lats, self.lons)
+        order = np.argsort(keys, kind="stable")
+        unique, starts = np.unique(keys[order], return_index=True)
+        self._cells = {
+            int(key): nodes
+            for key, nodes in zip(unique, np.split(order, starts[1:]))
+        }
+        self.loaded = True
+
+    def _lists(self) -> Tuple[List[int], List[int], List[float]]:
+        """Plain-list CSR view - element access is much faster than numpy scalars"""
+        if self._adjacency is None:
+            self._adjacency = (self.indptr.tolist(), self.neighbors.tolist(), self.lengths.tolist())
+        return self._adjacency
+
+    def save(self, path: Path, fingerprint: str = ""):
+        np.savez(
+            path,
+            version=np.array(GRAPH_VERSION),
+            fingerprint=np.array(fingerprint),
+            lats=self.lats,
+            lons=self.lons,
+            indptr=self.indptr,
+            neighbors=self.neighbors,
+            lengths=self.lengths,
+            component=self.component,
+            landmarks=self.landmarks,
+            landmark_components=self.landmark_components
+        )
+
+    def load(self, path: Path, fingerprint: str = "") -> bool:
+        """Load a persisted graph; False if missing or stale"""
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if int(data["version"]) != GRAPH_VERSION or str(data["fingerprint"]) != fingerprint:
+                    return False
+                self._set_graph(
+                    data["lats"], data["lons"], data["indptr"], data["neighbors"], data["lengths"],
+                    data["component"]
+                )
+                self.landmarks = data["landmarks"]
+                self.landmark_components = data["landmark_components"]
+        except (OSError, KeyError, ValueError):
+            return False
+        return True
+
+    def ensure_loaded(self, source_dir: Optional[Path] = None):
+        """Load the cached graph, or rebuild it from the OSM extracts"""
+        if self.loaded:
+            return
+        with self._load_lock:
+            # The startup warmup thread and a request may race to load
+            if self.loaded:
+                return
+
+            source_dir = Path(source_dir or routing_dir())
+            sources = sorted(
+                p for p in source_dir.glob("*")
+                if p.suffix.lower() in (".osm", ".geojson")
+            )
+            fingerprint = ";".join(f"{p.name}:{p.stat().st_size}:{int(p.stat().st_mtime)}" for p in sources)
+            cache_path = source_dir / "routing_graph.npz"
+
+            if self.load(cache_path, fingerprint):
+                logger.info(f"Routing graph loaded: {len(self)} nodes")
+                return
+
+            builder = _GraphBuilder()
+            for path in sources:
+                try:
+                    if path.suffix.lower() == ".osm":
+                        load_osm_xml(path, builder)
+                    else:
+                        load_geojson(path, builder)
+                except Exception as e:
+                    logger.warning(f"Skipping routing source {path.name}: {e}")
+
+            self.build(builder.coords, builder.edges)
+            if sources:
+                try:
+                    self.save(cache_path, fingerprint)
+                except OSError as e:
+                    logger.warning(f"Could not persist routing graph: {e}")
+            logger.info(f"Routing graph built: {len(self)} nodes, {len(self.neighbors)} edges from {len(sources)} files")
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def snap(self, latitude: float, longitude: float, max_m: float = SNAP_MAX_M) -> Optional[Tuple[int, float]]:
+        """Nearest graph node and its distance in meters (None if too far)"""
+        self.ensure_loaded()
+        if not self.available:
+            return None
+
+        row = int(np.floor((latitude + 90.0) / CELL_DEG))
+        col = int(np.floor((longitude + 180.0) / CELL_DEG))
+        rings = int(np.ceil(max_m / (CELL_DEG * 111195 * max(np.cos(np.radians(latitude)), 0.1)))) + 1
+
+        best: Optional[Tuple[int, float]] = None
+        for ring in range(rings + 1):
+            cells = [
+                self._cells.get((row + dr) * 1000000 + col + dc)
+                for dr in range(-ring, ring + 1)
+                for dc in range(-ring, ring + 1)
+                if max(abs(dr), abs(dc)) == ring
+            ]
+            nodes = [c for c in cells if c is not None]
+            if nodes:
+                idx = np.concatenate(nodes)
+                dist = haversine_km(latitude, longitude, self.lats[idx], self.lons[idx]) * 1000
+                i = int(np.argmin(dist))
+                if best is None or dist[i] < best[1]:
+                    best = (int(idx[i]), float(dist[i]))
+            # A node found in ring r can only be beaten from ring r + 1
+            if best is not None and best[1] <= ring * CELL_DEG * 111195 * np.cos(np.radians(latitude)):
+                break
+
+        if best is None or best[1] > max_m:
+            return None
+        return best
+
+    def _heuristic(self, target: int) -> List[float]:
+        """Lower bound on walking meters from every node to `target`"""
+        straight = haversine_km(self.lats[target], self.lons[target], self.lats, self.lons) * 999.0
+        # Only landmarks of the target's component bound distances to it
+        rows = self.landmarks[self.landmark_components == self.component[target]]
+        if len(rows):
+            alt = np.abs(rows - rows[:, target:target + 1]).max(axis=0)
+            straight = np.maximum(straight, alt)
+        return straight.tolist()
+
+    def _astar(self, source: int, target: int) -> Optional[Tuple[float, List[int]]]:
+        indptr, neighbors, lengths = self._lists()
+        h = self._heuristic(target)
+        inf = float("inf")
+        g: Dict[int, float] = {source: 0.0}
+        parent: Dict[int, int] = {source: -1}
+        heap = [(h[source], 0.0, source)]
+
+        while heap:
+            _, d, u = heappop(heap)
+            if u == target:
+                path = [u]
+                while parent[path[-1]] >= 0:
+                    path.append(parent[path[-1]])
+                return d, path[::-1]
+            if d > g[u]:
+                continue
+            for j in range(indptr[u], indptr[u + 1]):
+                v = neighbors[j]
+                nd = d + lengths[j]
+                if nd < g.get(v, inf):
+                    g[v] = nd
+                    parent[v] = u
+                    heappush(heap, (nd + h[v], nd, v))
+        return None
+
+    def shortest_path(self, source: int, target: int) -> Optional[Tuple[float, List[int]]]:
+        """(meters, node path) between two graph nodes, LRU-cached"""
+        if self.component[source] != self.component[target]:
+            return None
+        # Walking graph is undirected: (a, b) and (b, a) share one entry
+        key = (source, target) if source <= target else (target, source)
+        # Startup warmup fills the cache from a worker thread; A* runs unlocked
+        with self._routes_lock:
+            cached = self._routes.get(key)
+            if cached is None:
+                self.route_misses += 1
+            else:
+                self.route_hits += 1
+                self._routes.move_to_end(key)
+        if cached is None:
+            cached = self._astar(*key)
+            if cached is None:
+                return None
+            with self._routes_lock:
+                self._routes[key] = cached
+                if len(self._routes) > self.cache_size:
+                    self._routes.popitem(last=False)
+
+        meters, path = cached
+        return meters, path if key[0] == source else path[::-1]
+
+    def route(
+        self,
+        from_lat: float,
+        from_lon: float,
+        to_lat: float,
+        to_lon: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Walking route between two coordinates
+
+        Returns:
+            distance/duration plus the path as [latitude, longitude] pairs,
+            or None when no graph covers either end
+        """
+        start = self.snap(from_lat, from_lon)
+        end = self.snap(to_lat, to_lon)
+        if start is None or end is None:
+            return None
+
+        found = self.shortest_path(start[0], end[0])
+        if found is None:
+            return None
+        meters, path = found
+
+        # Off-graph legs (hotel lobby -> street, street -> gate) walked straight
+        total = meters + start[1] + end[1]
+        coordinates = [[from_lat, from_lon]]
+        coordinates += [[float(self.lats[i]), float(self.lons[i])] for i in path]
+        coordinates.append([to_lat, to_lon])
+
+        return {
+            "distance_m": round(total),
+            "duration_min": max(1, round(total / WALKING_M_PER_MIN)),
+            "path": coordinates,
+            "source": "offline_graph"
+        }
+
+    def route_to_nearest(
+        self,
+        latitude: float,
+        longitude: float,
+        category: str = "haram_gate",
+        candidates: int = 3
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Walking route to the nearest POI of a category (default: Haram gate)
+        The closest few by straight line within the start's component are
+        routed; the shortest walk wins.
+        """
+        from app.services.poi_index import poi_index
+
+        start = self.snap(latitude, longitude)
+        if start is None:
+            return None
+        component = self.component[start[0]]
+
+        reachable = []
+        for poi in poi_index.nearest(latitude, longitude, k=candidates * 4, categories=[category], max_km=5):
+            coords = poi["coordinates"]
+            end = self.snap(coords["latitude"], coords["longitude"])
+            if end is not None and self.component[end[0]] == component:
+                reachable.append(poi)
+                if len(reachable) == candidates:
+                    break
+
+        best = None
+        for poi in reachable:
+            coords = poi["coordinates"]
+            found = self.route(latitude, longitude, coords["latitude"], coords["longitude"])
+            if found and (best is None or found["distance_m"] < best["distance_m"]):
+                best = {**found, "destination": poi}
+        return best
+
+    def route_cache_stats(self) -> Dict[str, int]:
+        return {"entries": len(self._routes), "hits": self.route_hits, "misses": self.route_misses}
+
+    def warm_common_routes(self, max_routes: int = 500) -> int:
+        """Precompute hotel -> nearest Haram gate routes into the LRU cache"""
+        from app.services.poi_index import poi_index, CATEGORIES
+
+        self.ensure_loaded()
+        if not self.available:
+            return 0
+
+        poi_index.ensure_loaded()
+        hotel = CATEGORIES.index("hotel")
+        warmed = 0
+        for i in np.flatnonzero(poi_index.codes == hotel)[:max_routes]:
+            if self.route_to_nearest(float(poi_index.lats[i]), float(poi_index.lons[i])):
+                warmed += 1
+        return warmed
+
+
+# Global instance
+routing_engine = RoutingEngine(cache_size=settings.ROUTE_CACHE_SIZE)
+metrics.caches.register("routes", routing_engine.route_cache_stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the offline pedestrian routing graph")
+    parser.add_argument("--source", type=Path, default=None, help="Folder with *.osm / *.geojson extracts")
+    args = parser.parse_args()
+
+    routing_engine.ensure_loaded(args.source)
+    print(f"✓ {len(routing_engine)} nodes, {len(routing_engine.neighbors)} edges, "
+          f"{len(np.unique(routing_engine.component))} components, {len(routing_engine.landmarks)} landmarks")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -2,45 +2,27 @@
 """
 Fixed API Client for Bot
 """
-import httpx
 from typing import Dict, Any, Optional
 import logging
 
+from backend_client import BackendClient, backend_client
+
 logger = logging.getLogger(__name__)
 
 class APIClient:
     """API Client with correct endpoints"""
     
-    def __init__(self, base_url: str = "http://localhost:8000"):
-        self.base_url = base_url
-        self.timeout = 30.0
+    def __init__(self, base_url: Optional[str] = None):
+        # Reuse the shared pool unless a different backend is requested
+        if base_url is None or base_url.rstrip("/") == backend_client.base_url:
+            self.client = backend_client
+        else:
+            self.client = BackendClient(base_url)
+        self.base_url = self.client.base_url
     
     async def call(self, endpoint: str, method: str = "POST", data: Dict = None) -> Optional[Dict]:
         """Make API call with error handling"""
-        url = f"{self.base_url}{endpoint}"
-        
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                if method == "POST":
-                    response = await client.post(url, json=data or {})
-                else:
-                    response = await client.get(url, params=data)
-                
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 404:
-                    logger.warning(f"Endpoint not found: {endpoint}")
-                    return None
-                else:
-                    logger.warning(f"API returned {response.status_code}")
-                    return None
-                    
-        except httpx.TimeoutException:
-            logger.warning(f"API timeout for {endpoint}")
-            return None
-        except Exception as e:
-            logger.error(f"API error: {e}")
-            return None
+        return await self.client.call_api(endpoint, method, data)
     
     async def chat(self, message: str, user_id: int) -> Optional[Dict]:
         """Send chat message - FIXED PATH"""
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Shared Backend Client
+One pooled httpx.AsyncClient for every bot -> backend call
+
+- keep-alive connection pool (and HTTP/2 when `h2` is installed), so a
+  round trip no longer pays a new TCP + TLS handshake
+- per-endpoint timeouts (prayer times answer in ms, AI chat may take 30 s)
+- jittered exponential retries, only for idempotent calls; LLM endpoints
+  are not retried once the request reached the backend (no 3 x 20 s calls)
+- latency / error metrics per endpoint (also exported, see metrics.py)
+- cacheable endpoints (API_CACHE_TTLS) are answered from response_cache
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Optional
+
+import httpx
+from loguru import logger
+
+from config import (
+    API_URL,
+    API_TIMEOUT,
+    API_RETRY_ATTEMPTS,
+    API_ENDPOINT_TIMEOUTS,
+    API_IDEMPOTENT_POSTS,
+    API_EXPENSIVE_ENDPOINTS,
+    API_CACHE_TTLS,
+    API_CACHE_DAILY,
+    API_CACHE_STALE_SECONDS,
+    API_CACHE_MAX_ENTRIES,
+    CACHE_UTC_OFFSET
+)
+from metrics import BACKEND_SECONDS
+from response_cache import ResponseCache
+
+try:
+    import h2  # noqa: F401 - enables httpx HTTP/2 support
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+RETRY_STATUS = {429, 502, 503, 504}
+# Failures where the request never reached the backend - always safe to retry
+UNSENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+BACKOFF_BASE = 0.3  # seconds
+BACKOFF_CAP = 3.0
+LATENCY_WINDOW = 512  # Recent samples kept per endpoint for percentiles
+
+
+class EndpointStats:
+    """Counters and a sliding latency window for one endpoint"""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_seconds = 0.0
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def observe(self, seconds: float, ok: bool):
+        self.requests += 1
+        self.total_seconds += seconds
+        self.latencies.append(seconds)
+        if not ok:
+            self.errors += 1
+
+    def summary(self) -> Dict[str, Any]:
+        ordered = sorted(self.latencies)
+
+        def pct(p: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 1) if ordered else 0.0
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_ms": round(self.total_seconds / self.requests * 1000, 1) if self.requests else 0.0,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0
+        }
+
+
+def endpoint_key(endpoint: str, table: Dict[str, Any] = API_ENDPOINT_TIMEOUTS) -> str:
+    """Metric/timeout key: the longest configured prefix, else the path itself"""
+    path = endpoint.split("?", 1)[0]
+    matches = [prefix for prefix in table if path.startswith(prefix)]
+    return max(matches, key=len) if matches else path
+
+
+class BackendClient:
+    """Application-lifetime HTTP client for the Umrah backend"""
+
+    def __init__(self, base_url: str = API_URL, retry_attempts: int = API_RETRY_ATTEMPTS):
+        self.base_url = base_url.rstrip("/")
+        self.retry_attempts = max(1, retry_attempts)
+        self.stats: Dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.cache = ResponseCache(API_CACHE_MAX_ENTRIES, API_CACHE_STALE_SECONDS, CACHE_UTC_OFFSET)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                http2=HTTP2_AVAILABLE,
+                timeout=API_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=100,
+                    max_keepalive_connections=20,
+                    keepalive_expiry=60.0
+                ),
+                headers={"User-Agent": "umrah-assistant-bot"}
+            )
+        return self._client
+
+    def timeout_for(self, endpoint: str) -> float:
+        return API_ENDPOINT_TIMEOUTS.get(endpoint_key(endpoint), API_TIMEOUT)
+
+    async def request(
+        self,
+        endpoint: str,
+        method: str = "POST",
+        data: Optional[Dict] = None,
+        idempotent: Optional[bool] = None,
+        timeout: Optional[float] = None
+    ) -> httpx.Response:
+        """
+        Send a request, retrying transport errors and 429/5xx gateway errors
+        when the call is idempotent (GET, or a read-only POST endpoint);
+        expensive endpoints only retry connection failures and 429/502/503
+
+        Raises:
+            httpx.HTTPError when every attempt failed
+        """
+        key = endpoint_key(endpoint)
+        if idempotent is None:
+            idempotent = method == "GET" or key in API_IDEMPOTENT_POSTS
+        attempts = self.retry_attempts if idempotent else 1
+        expensive = key in API_EXPENSIVE_ENDPOINTS
+        timeout = timeout or self.timeout_for(endpoint)
+        stats = self.stats[key]
+
+        for attempt in range(attempts):
+            started = time.perf_counter()
+            try:
+                if method == "GET":
+                    response = await self.client.get(endpoint, params=data, timeout=timeout)
+                else:
+                    response = await self.client.request(method, endpoint, json=data or {}, timeout=timeout)
+            except httpx.TransportError as e:
+                elapsed = time.perf_counter() - started
+                stats.observe(elapsed, ok=False)
+                BACKEND_SECONDS.observe(elapsed, key, "timeout" if isinstance(e, httpx.TimeoutException) else "error")
+                if attempt + 1 >= attempts or (expensive and not isinstance(e, UNSENT_ERRORS)):
+                    raise
+            else:
+                elapsed = time.perf_counter() - started
+                ok = response.status_code < 500
+                stats.observe(elapsed, ok=ok)
+                BACKEND_SECONDS.observe(elapsed, key, "ok" if ok else "error")
+                retry = response.status_code in RETRY_STATUS and not (expensive and response.status_code == 504)
+                if not retry or attempt + 1 >= attempts:
+                    return response
+
+            stats.retries += 1
+            # Full jitter: spread retries of many users over the backoff window
+            await asyncio.sleep(random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt)))
+
+    async def call_api(self, endpoint: str, method: str = "POST", data: Optional[Dict] = None) -> Optional[Dict]:
+        """
+        JSON body of a 200 response, None on any failure (callers show a fallback)
+        Cacheable endpoints may answer from cache; `stale: True` marks an
+        expired answer served because the backend failed
+        """
+        cache_prefix = endpoint_key(endpoint, API_CACHE_TTLS)
+        if cache_prefix not in API_CACHE_TTLS:
+            return await self._call_json(endpoint, method, data)
+        
+        key = self.cache.key(endpoint, method, data, daily=cache_prefix in API_CACHE_DAILY)
+        return await self.cache.get_or_fetch(
+            key,
+            API_CACHE_TTLS[cache_prefix],
+            lambda: self._call_json(endpoint, method, data)
+        )
+
+    async def _call_json(self, endpoint: str, method: str, data: Optional[Dict]) -> Optional[Dict]:
+        try:
+            response = await self.request(endpoint, method, data)
+            if response.status_code == 200:
+                return response.json()
+            logger.warning(f"API {endpoint} returned {response.status_code}")
+            return None
+        except httpx.TimeoutException:
+            logger.warning(f"API timeout for {endpoint}")
+            return None
+        except Exception as e:
+            logger.error(f"API error: {e}")
+            return None
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            **{key: stats.summary() for key, stats in self.stats.items()},
+            "cache": self.cache.stats()
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Global instance
+backend_client = BackendClient()
@@ -3,7 +3,6 @@
 import logging
 import sys
 from datetime import datetime
-import httpx
 from telegram import Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ChatAction, ParseMode
 from telegram.ext import (
@@ -11,46 +10,46 @@ from telegram.ext import (
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
+    TypeHandler,
     filters,
     ContextTypes
 )
-from config import BOT_TOKEN, API_URL
+from config import (
+    BOT_TOKEN,
+    API_URL,
+    FEATURES,
+    PRAYER_TIME_REMINDER_MINUTES,
+    BOT_MODE,
+    CONCURRENT_UPDATES,
+    MAX_PENDING_UPDATES_PER_CHAT,
+    METRICS_HOST,
+    METRICS_PORT
+)
 from user_manager import user_manager
+from reminders import ReminderScheduler
+from backend_client import backend_client
+from dispatcher import ChatOrderedUpdateProcessor
+from rate_limiter import rate_limiter, RateLimitGuard
+from send_scheduler import send_scheduler
+from persistence import create_persistence
+from metrics import metrics, timed
 from keyboards import *
 
 # Import budget handler
 from handlers.budget_handler import get_budget_handler
+from handlers.doa import get_inline_doa_handler
+from doa_index import doa_index
 
 # Logging
 from loguru import logger
 logger.remove()
 logger.add(sys.stdout, level="INFO")
 
-class APIClient:
-    """API Client"""
-    def __init__(self, base_url: str):
-        self.base_url = base_url
-        self.timeout = 30.0
-    
-    async def call_api(self, endpoint: str, method: str = "POST", data: dict = None):
-        """Make API call"""
-        url = f"{self.base_url}{endpoint}"
-        try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                if method == "POST":
-                    response = await client.post(url, json=data or {})
-                else:
-                    response = await client.get(url, params=data)
-                
-                if response.status_code == 200:
-                    return response.json()
-                return None
-        except Exception as e:
-            logger.error(f"API error: {e}")
-            return None
-
-api = APIClient(API_URL)
+# Shared pooled client for every backend call (see backend_client.py)
+api = backend_client
+reminder_scheduler = ReminderScheduler(api, user_manager)
 
+@timed("start")
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start command"""
     user = update.effective_user
@@ -79,6 +78,7 @@ Pilih menu di bawah atau tanya langsung!"""
         parse_mode="Markdown"
     )
 
+@timed("menu")
 async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Menu command"""
     await update.message.reply_text(
@@ -87,6 +87,14 @@ async def menu_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         parse_mode="Markdown"
     )
 
+def with_stale_note(result: dict, text: str) -> str:
+    """Mark answers served from cache while the backend is unreachable"""
+    if not result.get("stale"):
+        return text
+    cached_at = result.get("cached_at", "").replace("T", " ")[:16]
+    return f"{text}\n\n⚠️ Server sedang gangguan - data tersimpan ({cached_at})"
+
+@timed("sholat")
 async def sholat_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Prayer times"""
     await update.message.chat.send_action(ChatAction.TYPING)
@@ -98,10 +106,60 @@ async def sholat_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
     
     if result:
-        await update.message.reply_text(result.get("response", "Error"))
+        await update.message.reply_text(with_stale_note(result, result.get("response", "Error")))
     else:
         await update.message.reply_text("❌ Tidak dapat mengambil jadwal sholat")
 
+@timed("notifications")
+async def notifications_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Prayer reminders: /notifications [on|off] [kota]"""
+    if not FEATURES.get("scheduled_reminders"):
+        await update.message.reply_text("⚠️ Fitur pengingat sholat belum tersedia")
+        return
+    
+    chat_id = update.effective_chat.id
+    args = [a.lower() for a in (context.args or [])]
+    
+    if args and args[0] in ("off", "mati", "stop"):
+        reminder_scheduler.unsubscribe(chat_id)
+        await update.message.reply_text("🔕 Pengingat sholat dimatikan.")
+        return
+    
+    if args and args[0] in ("on", "aktif"):
+        args = args[1:]
+    
+    if not context.args and reminder_scheduler.is_subscribed(chat_id):
+        await update.message.reply_text(
+            "🔔 Pengingat sholat sedang aktif.\n\n"
+            "• /notifications off - Matikan\n"
+            "• /notifications on Madinah - Ganti kota"
+        )
+        return
+    
+    city = " ".join(args) or user_manager.get_user_location(update.effective_user.id) or "Makkah"
+    
+    # Resolve once here: the backend answers unknown names with Makkah times
+    today = await reminder_scheduler.resolve_city(city)
+    if today is None:
+        await update.message.reply_text("❌ Server sedang gangguan, coba lagi nanti.")
+        return
+    if today.get("resolved") is False or not today.get("location_key"):
+        await update.message.reply_text(
+            f"❓ Kota '{city}' tidak dikenali.\n\n"
+            "Contoh: /notifications on Makkah, Madinah, Jeddah atau Mina"
+        )
+        return
+    
+    reminder_scheduler.subscribe(chat_id, today["location_key"], today)
+    
+    await update.message.reply_text(
+        f"🔔 *Pengingat sholat aktif - {today['location']}*\n\n"
+        f"⏰ {PRAYER_TIME_REMINDER_MINUTES} menit sebelum waktu sholat\n"
+        "Ketik /notifications off untuk mematikan.",
+        parse_mode="Markdown"
+    )
+
+@timed("text")
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text messages"""
     text = update.message.text
@@ -175,6 +233,12 @@ Ketik /tips untuk tips lengkap!"""
             parse_mode="Markdown"
         )
     
+    elif text == "💰 Budget":
+        # Only reached in groups when the budget conversation is persistent
+        await update.message.reply_text(
+            "💰 Simulasi budget hanya tersedia di chat pribadi dengan bot."
+        )
+    
     elif text == "⬅️ Kembali ke Menu":
         await menu_command(update, context)
     
@@ -192,10 +256,15 @@ Ketik /tips untuk tips lengkap!"""
         )
         
         if result:
-            await update.message.reply_text(result.get("response", "Maaf, saya tidak mengerti."))
+            response = result.get("response", "Maaf, saya tidak mengerti.")
+            await update.message.reply_text(response)
+            user_manager.add_conversation(
+                update.effective_user.id, text, response, result.get("agent", "unknown")
+            )
         else:
             await update.message.reply_text("❌ Maaf, terjadi kesalahan. Coba lagi nanti.")
 
+@timed("button")
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button callbacks"""
     query = update.callback_query
@@ -212,43 +281,119 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors"""
     logger.error(f"Update {update} caused error {context.error}")
 
-def main():
-    """Start the bot"""
-    try:
-        # Create application
-        app = Application.builder().token(BOT_TOKEN).build()
-        
-        # IMPORTANT: Add budget conversation handler FIRST
-        app.add_handler(get_budget_handler())
-        
-        # Add command handlers
-        app.add_handler(CommandHandler("start", start_command))
-        app.add_handler(CommandHandler("menu", menu_command))
-        app.add_handler(CommandHandler("sholat", sholat_command))
+def register_metrics(app: Application):
+    """Queue depths and component counters, read at scrape time (see metrics.py)"""
+    processor = app.update_processor
+    metrics.gauge_from("bot_update_queue_size", "Updates received, not yet dispatched", app.update_queue.qsize)
+    metrics.gauge_from(
+        "bot_dispatcher_queued_updates", "Updates waiting behind their chat",
+        lambda: processor.stats()["queued_updates"]
+    )
+    metrics.gauge_from("bot_dispatcher_active_chats", "Chats with updates in progress", lambda: processor.stats()["active_chats"])
+    metrics.counter_from("bot_dispatcher_dropped_updates_total", "Updates dropped by flooding chats", lambda: processor.dropped)
+    metrics.counter_from("bot_rate_limited_total", "Updates rejected by the per-user rate limit", lambda: rate_limiter.throttled)
+    metrics.gauge_from("bot_send_queue_size", "Outgoing messages waiting for a send slot", lambda: send_scheduler.stats()["queued"])
+    metrics.counter_from("bot_telegram_sent_total", "Messages sent through the scheduler", lambda: send_scheduler.sent)
+    metrics.counter_from("bot_telegram_retry_after_total", "RetryAfter answers from Telegram", lambda: send_scheduler.retry_afters)
+    metrics.gauge_from("bot_telegram_send_rate", "Current global send rate (messages/s)", lambda: send_scheduler.stats()["global_rate"])
+    metrics.gauge_from("bot_storage_pending_writes", "User/conversation writes not yet flushed", lambda: user_manager.pending)
+    metrics.counter_from(
+        "bot_backend_cache_total", "Backend response cache lookups",
+        lambda: {result: value for result, value in api.cache.stats().items() if result != "entries"},
+        ["result"]
+    )
+
+def build_application() -> Application:
+    """Application with all handlers and lifecycle hooks registered"""
+    # Chats are processed in parallel (CONCURRENT_UPDATES workers),
+    # each chat's own updates strictly in order; every outgoing message
+    # is paced by the send scheduler
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(
+            ChatOrderedUpdateProcessor(CONCURRENT_UPDATES, MAX_PENDING_UPDATES_PER_CHAT)
+        )
+        .rate_limiter(send_scheduler)
+    )
+    
+    # Conversation states + user_data in Redis when REDIS_URL is set
+    persistence = create_persistence()
+    if persistence:
+        builder = builder.persistence(persistence)
+    app = builder.build()
+    register_metrics(app)
+    
+    # Rate limit runs first (group -1): throttled updates never reach the backend
+    app.add_handler(TypeHandler(Update, RateLimitGuard(rate_limiter)), group=-1)
+    
+    # IMPORTANT: Add budget conversation handler FIRST
+    app.add_handler(get_budget_handler(persistent=persistence is not None))
+    
+    # Add command handlers
+    app.add_handler(CommandHandler("start", start_command))
+    app.add_handler(CommandHandler("menu", menu_command))
+    app.add_handler(CommandHandler("sholat", sholat_command))
+    app.add_handler(CommandHandler("notifications", notifications_command))
+    
+    # Add message and callback handlers
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
+    app.add_handler(CallbackQueryHandler(button_callback))
+    
+    # Inline mode: doa search from the local catalog
+    app.add_handler(get_inline_doa_handler())
+    
+    # Error handler
+    app.add_error_handler(error_handler)
+    
+    # Set bot commands
+    async def post_init(application: Application):
+        await application.bot.set_my_commands([
+            BotCommand("start", "Mulai bot"),
+            BotCommand("menu", "Tampilkan menu"),
+            BotCommand("sholat", "Jadwal sholat"),
+            BotCommand("budget", "Simulasi budget umrah"),
+            BotCommand("notifications", "Pengingat waktu sholat"),
+            BotCommand("help", "Bantuan")
+        ])
         
-        # Add message and callback handlers
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
-        app.add_handler(CallbackQueryHandler(button_callback))
+        # Queue user/conversation writes off the handler path
+        await user_manager.start()
         
-        # Error handler
-        app.add_error_handler(error_handler)
+        # Compile the doa index before the first inline query
+        doa_index.ensure_loaded()
         
-        # Set bot commands
-        async def post_init(application: Application):
-            await application.bot.set_my_commands([
-                BotCommand("start", "Mulai bot"),
-                BotCommand("menu", "Tampilkan menu"),
-                BotCommand("sholat", "Jadwal sholat"),
-                BotCommand("budget", "Simulasi budget umrah"),
-                BotCommand("help", "Bantuan")
-            ])
+        await metrics.start(METRICS_HOST, METRICS_PORT)
         
-        app.post_init = post_init
+        # Prayer reminders
+        if FEATURES.get("scheduled_reminders"):
+            await reminder_scheduler.start(application)
+    
+    async def post_shutdown(application: Application):
+        await reminder_scheduler.stop()
+        await user_manager.stop()
+        await backend_client.aclose()
+        await rate_limiter.aclose()
+        await metrics.stop()
+    
+    app.post_init = post_init
+    app.post_shutdown = post_shutdown
+    return app
+
+def main():
+    """Start the bot"""
+    try:
+        app = build_application()
         
         # Start bot
         logger.info("🚀 Bot started successfully!")
         logger.info(f"🔗 Backend API: {API_URL}")
-        app.run_polling(allowed_updates=Update.ALL_TYPES)
+        
+        if BOT_MODE == "webhook":
+            from webhook import run_webhook
+            run_webhook(app)
+        else:
+            app.run_polling(allowed_updates=Update.ALL_TYPES)
         
     except Exception as e:
         logger.error(f"Failed to start bot: {e}")
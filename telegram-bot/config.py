@@ -38,22 +38,107 @@ ADMIN_IDS = [
     # Add your Telegram ID here for admin features
 ]
 
-# Rate Limiting
+# Rate Limiting (per user, enforced by rate_limiter.py before every handler)
 RATE_LIMIT = {
     "messages_per_minute": 20,
     "messages_per_hour": 100
 }
 
+# Optional shared state for multi-instance deployments (redis client is in requirements.txt)
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+# Redis persistence of conversation states / user_data (see persistence.py)
+CONVERSATION_STATE_TTL = 24 * 3600  # Abandoned conversations expire
+USER_DATA_TTL = 7 * 24 * 3600
+PERSISTENCE_UPDATE_INTERVAL = 5  # Seconds between write-outs
+
+# Worker sharding (see sharding.py): worker BOT_SHARD_INDEX owns chat_id % BOT_SHARD_COUNT
+BOT_SHARD_COUNT = int(os.getenv('BOT_SHARD_COUNT', '1'))
+BOT_SHARD_INDEX = int(os.getenv('BOT_SHARD_INDEX', '0'))
+
 # Logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
 LOG_FILE = 'bot.log'
 
-# Database (TinyDB for local storage)
-DB_PATH = 'user_data.json'
+# Database: "sqlite" (WAL, indexed - default) or "tinydb" (single JSON file)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite').lower()
+SQLITE_DB_PATH = os.getenv('SQLITE_DB_PATH', 'user_data.sqlite3')
+DB_PATH = 'user_data.json'  # TinyDB file - migrated into SQLite once if present
+
+# Write-behind: handlers only queue user/conversation writes; a background
+# task flushes them when this many are pending or every interval seconds
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', '200'))
+WRITE_BEHIND_INTERVAL = float(os.getenv('WRITE_BEHIND_INTERVAL', '1.0'))
+
+# Conversations: recent entries per user, archive retention, compaction period
+CONVERSATION_RING_SIZE = int(os.getenv('CONVERSATION_RING_SIZE', '20'))
+CONVERSATION_RETENTION_DAYS = int(os.getenv('CONVERSATION_RETENTION_DAYS', '90'))
+CONVERSATION_COMPACT_INTERVAL = float(os.getenv('CONVERSATION_COMPACT_INTERVAL', '3600'))
+
+# Deployment: "polling" (default) or "webhook" (ASGI server, see webhook.py)
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # Public HTTPS base URL of this service
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # Checked against X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_PORT = int(os.getenv('PORT', '8080'))
+WEBHOOK_MAX_CONNECTIONS = 40
+
+# Max updates processed at the same time (one slow AI answer no longer blocks everyone).
+# Each chat's updates still run one at a time, in order (see dispatcher.py).
+CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '64'))
+MAX_PENDING_UPDATES_PER_CHAT = 20
+
+# API Configuration (see backend_client.py)
+API_TIMEOUT = 10.0  # Endpoints not listed below
+API_RETRY_ATTEMPTS = 3  # Idempotent calls only
+
+# Per-endpoint timeouts in seconds (longest matching prefix wins)
+API_ENDPOINT_TIMEOUTS = {
+    "/api/v1/chat": 30.0,  # LLM answer
+    "/api/v1/budget/optimize": 20.0,
+    "/api/v1/advanced/prayer-times": 5.0,
+    "/api/v1/advanced/navigation": 8.0,
+    "/api/v1/advanced/emergency": 5.0,
+    "/api/v1/advanced/tips": 5.0,
+    "/health": 3.0,
+}
+
+# POST endpoints that only read/compute - safe to retry
+API_IDEMPOTENT_POSTS = {
+    "/api/v1/advanced/prayer-times",
+    "/api/v1/advanced/navigation",
+    "/api/v1/advanced/emergency",
+    "/api/v1/budget/optimize",
+}
+
+# LLM-backed endpoints: after a read timeout (or 504) the backend may still be
+# computing, so only requests that never reached it are retried
+API_EXPENSIVE_ENDPOINTS = {
+    "/api/v1/chat",
+    "/api/v1/budget/optimize",
+}
+
+# Bot-side response cache (see response_cache.py), TTL in seconds
+API_CACHE_TTLS = {
+    "/api/v1/advanced/prayer-times": 24 * 3600,  # Also keyed per local day
+    "/api/v1/advanced/tips": 24 * 3600,
+    "/api/v1/advanced/navigation": 3600,
+}
+API_CACHE_DAILY = {"/api/v1/advanced/prayer-times"}
+API_CACHE_STALE_SECONDS = 7 * 24 * 3600  # Served (marked stale) while the backend is down
+API_CACHE_MAX_ENTRIES = 2048
+CACHE_UTC_OFFSET = 3  # Local day = Saudi Arabia (UTC+3)
+
+# Outbound pacing (see send_scheduler.py) - Telegram flood limits, messages/s
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '30'))
+OUTBOUND_PRIVATE_CHAT_RATE = 1.0
+OUTBOUND_GROUP_CHAT_RATE = 20 / 60
+OUTBOUND_CHAT_BURST = 3  # Short per-chat bursts Telegram tolerates
+OUTBOUND_MAX_RETRIES = 3  # Resends after RetryAfter
 
-# API Configuration
-API_TIMEOUT = 30.0
-API_RETRY_ATTEMPTS = 3
+# Prometheus metrics (see metrics.py), GET /metrics; port 0 disables
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9464'))
 
 # Notifications
 PRAYER_TIME_REMINDER_MINUTES = 15  # Remind 15 mins before prayer
@@ -62,7 +147,17 @@ PRAYER_TIME_REMINDER_MINUTES = 15  # Remind 15 mins before prayer
 if not BOT_TOKEN or BOT_TOKEN == "8132751045:AAHPTRwRzUfJM2Q_rPFuAbpqsuyedF1cX9Q":
     raise ValueError("TELEGRAM_BOT_TOKEN not set in .env file!")
 
+if BOT_MODE == "webhook" and not WEBHOOK_URL:
+    raise ValueError("WEBHOOK_URL must be set when BOT_MODE=webhook!")
+
+if BOT_SHARD_COUNT > 1 and (BOT_MODE != "webhook" or not REDIS_URL):
+    raise ValueError("BOT_SHARD_COUNT > 1 needs BOT_MODE=webhook and REDIS_URL!")
+
+if not 0 <= BOT_SHARD_INDEX < BOT_SHARD_COUNT:
+    raise ValueError("BOT_SHARD_INDEX must be between 0 and BOT_SHARD_COUNT - 1!")
+
 print("✅ Configuration loaded successfully")
 print(f"🔗 API URL: {API_URL}")
+print(f"📡 Mode: {BOT_MODE} (max {CONCURRENT_UPDATES} concurrent updates)")
 print(f"🌍 Languages: {', '.join(LANGUAGES.keys())}")
 print(f"⚡ Features enabled: {sum(FEATURES.values())}/{len(FEATURES)}")
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Chat-Ordered Update Dispatcher
+Updates of one chat are processed strictly in order, so multi-step
+conversations (budget simulation) never see their steps race. Different
+chats run in parallel on a fixed worker pool.
+
+- one FIFO queue per chat, bounded: a flooding chat loses its newest updates
+- chats take turns: a worker runs one update, then the chat goes to the back
+  of the line, so a busy chat cannot starve the others
+- a chat's queue is dropped as soon as it drains (idle eviction) - memory
+  follows active chats only
+- updates without a chat (inline queries, polls) are not ordered
+- PTB's own process_update (final) stays in charge: its semaphore admits
+  updates into do_process_update, which queues them per chat and waits
+  for a worker - the semaphore bounds queued + running updates, the
+  worker count bounds the running ones
+"""
+import asyncio
+import itertools
+from collections import deque
+from typing import Any, Awaitable, Deque, Dict, Hashable, List, Optional, Tuple
+
+from loguru import logger
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+QueueItem = Tuple[object, Awaitable[Any], asyncio.Future]
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """Per-chat FIFO queues drained by `workers` worker tasks"""
+
+    def __init__(self, workers: int, max_queue_size: int = 20, max_admitted: Optional[int] = None):
+        # Admitted updates mostly wait in their chat's queue; one flooding
+        # chat holds at most max_queue_size of them, never every slot
+        super().__init__(max_admitted or workers * max_queue_size)
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.dropped = 0
+
+        self._queues: Dict[Hashable, Deque[QueueItem]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._unordered = itertools.count()
+
+    @staticmethod
+    def chat_key(update: object) -> Optional[int]:
+        if isinstance(update, Update) and update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    # ------------------------------------------------------------------
+    # BaseUpdateProcessor
+    # ------------------------------------------------------------------
+
+    async def initialize(self):
+        self._ready = asyncio.Queue()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"ChatDispatcher:worker_{i}")
+            for i in range(self.workers)
+        ]
+
+    async def shutdown(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        # Release callers still waiting on updates that will never run
+        for queue in self._queues.values():
+            for _, coroutine, done in queue:
+                coroutine.close()
+                if not done.done():
+                    done.set_result(None)
+        self._queues.clear()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        """Enqueue behind the chat's earlier updates; returns once processed"""
+        key = self.chat_key(update)
+        if key is None:
+            key = ("unordered", next(self._unordered))
+
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            self._ready.put_nowait(key)
+        elif len(queue) >= self.max_queue_size:
+            self.dropped += 1
+            coroutine.close()
+            logger.warning(f"Chat {key}: {self.max_queue_size} updates pending, dropping newest")
+            return
+
+        done = asyncio.get_running_loop().create_future()
+        queue.append((update, coroutine, done))
+        await done
+
+    # ------------------------------------------------------------------
+    # Workers
+    # ------------------------------------------------------------------
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            queue = self._queues[key]
+            update, coroutine, done = queue.popleft()
+            try:
+                await coroutine
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Handler errors are reported by Application.process_update already
+                logger.error(f"Update processing failed for chat {key}: {e}")
+            finally:
+                if not done.done():
+                    done.set_result(None)
+                # Chat is free again: back of the line, or evicted when drained
+                if queue:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._queues[key]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_chats": len(self._queues),
+            "queued_updates": sum(len(q) for q in self._queues.values()),
+            "dropped_updates": self.dropped,
+            "workers": len(self._workers)
+        }
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Doa Search Index
+Inline-mode lookups ("@bot talbiyah") are answered from a local catalog
+(data/doa_catalog.json) instead of the backend's RAG + LLM agent.
+
+The catalog is compiled once into in-memory indexes:
+- token prefix index: every prefix of every normalized token -> doa ids,
+  so "thaw", "zamz" or "لبي" match while the user is still typing
+- trigram index: fallback for tokens without a prefix hit (typos,
+  spelling variants the folding below does not cover)
+
+Normalization, applied to catalog and query alike:
+- Arabic: harakat, tatweel and superscript alif stripped, alif/ya/ta
+  marbuta variants folded, leading "ال"/"وال" also indexed without it
+- Latin: lowercase, accents/apostrophes/hyphens dropped, common
+  transliteration variants folded (th/ts/sy/sh -> t/s/s, dz/dh -> z/d,
+  kh -> h, q -> k) and doubled letters collapsed - "thawaf" == "tawaf",
+  "labbaik" == "labaik", "syukur" == "sukur"
+
+Title and aliases weigh more than transliteration/Arabic, which weigh more
+than the Indonesian translation; a query that is a whole title or alias
+wins over doa that merely share its words. A query over the whole catalog takes well
+under a millisecond.
+"""
+import html
+import json
+import os
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, List, Set, Tuple
+
+from loguru import logger
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "doa_catalog.json")
+
+MAX_PREFIX = 12  # Longer query tokens are looked up by their first 12 chars
+MIN_GRAM_TOKEN = 3  # Shorter tokens never fall back to trigrams
+GRAM_MATCH = 0.5  # Share of a token's trigrams a doa must contain
+GRAM_PENALTY = 0.5  # Fuzzy hits weigh half of a prefix hit
+EXACT_BONUS = 0.5  # Whole-token hits rank above mere prefixes
+PHRASE_BONUS = 4.0  # Query == a title/alias ("doa thawaf"); half when it is a run inside one
+
+# Field -> weight
+FIELD_WEIGHTS = {"title": 3.0, "aliases": 3.0, "latin": 2.0, "arabic": 2.0, "translation": 1.0}
+
+ARABIC_MARKS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+ARABIC_FOLD = str.maketrans({"أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا", "ى": "ي", "ة": "ه", "ؤ": "و", "ئ": "ي"})
+ARABIC_ARTICLE = re.compile(r"^(?:وال|فال|بال|كال|ال)(?=..)")
+LATIN_DROP = re.compile(r"['’`ʼʻ\-]")
+LATIN_FOLD = [("th", "t"), ("ts", "s"), ("sy", "s"), ("sh", "s"), ("dz", "z"), ("dh", "d"), ("kh", "h"), ("q", "k")]
+REPEATS = re.compile(r"(\w)\1+")
+TOKEN = re.compile(r"\w+")
+
+Hit = Dict[int, float]  # Doa position -> weight
+
+
+def normalize(text: str) -> str:
+    """Fold Arabic and Latin spelling variants (see module docstring)"""
+    text = ARABIC_MARKS.sub("", text).translate(ARABIC_FOLD)
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = LATIN_DROP.sub("", text)
+    for variant, folded in LATIN_FOLD:
+        text = text.replace(variant, folded)
+    return REPEATS.sub(r"\1", text)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN.findall(normalize(text)):
+        tokens.append(token)
+        bare = ARABIC_ARTICLE.sub("", token)
+        if bare != token:
+            tokens.append(bare)
+    return tokens
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class DoaIndex:
+    """Prefix + trigram index over the doa catalog"""
+
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        self.entries: List[Dict[str, Any]] = []
+        self._prefixes: Dict[str, Hit] = {}
+        self._tokens: Dict[str, Hit] = {}
+        self._grams: Dict[str, Set[int]] = {}
+        self._phrases: List[List[str]] = []
+        self._loaded = False
+
+    # ------------------------------------------------------------------
+    # Compilation
+    # ------------------------------------------------------------------
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            entries = json.load(f)["doa"]
+
+        prefixes: Dict[str, Hit] = defaultdict(dict)
+        tokens: Dict[str, Hit] = defaultdict(dict)
+        grams: Dict[str, Set[int]] = defaultdict(set)
+        phrases: List[List[str]] = []
+        for position, entry in enumerate(entries):
+            phrases.append([
+                " ".join(TOKEN.findall(normalize(name)))
+                for name in [entry.get("title") or ""] + list(entry.get("aliases") or [])
+            ])
+            for field, weight in FIELD_WEIGHTS.items():
+                value = entry.get(field) or ""
+                text = " ".join(value) if isinstance(value, list) else value
+                for token in tokenize(text):
+                    self._add(tokens, token, position, weight)
+                    for end in range(1, min(len(token), MAX_PREFIX) + 1):
+                        self._add(prefixes, token[:end], position, weight)
+                    for gram in trigrams(token):
+                        grams[gram].add(position)
+            entry["message"] = self._render(entry)
+
+        self.entries = entries
+        self._prefixes = dict(prefixes)
+        self._tokens = dict(tokens)
+        self._grams = dict(grams)
+        self._phrases = phrases
+        self._loaded = True
+        logger.info(f"📿 Doa index: {len(entries)} doa, {len(self._prefixes)} prefixes, {len(self._grams)} trigrams")
+
+    @staticmethod
+    def _add(index: Dict[str, Hit], key: str, position: int, weight: float):
+        if index[key].get(position, 0.0) < weight:
+            index[key][position] = weight
+
+    @staticmethod
+    def _render(entry: Dict[str, Any]) -> str:
+        """Message text sent into the chat (HTML), prepared once at load time"""
+        return (
+            f"🤲 <b>{html.escape(entry['title'])}</b>\n\n"
+            f"{html.escape(entry['arabic'])}\n\n"
+            f"<i>{html.escape(entry['latin'])}</i>\n\n"
+            f"Artinya: \"{html.escape(entry['translation'])}\"\n\n"
+            f"📚 {html.escape(entry['source'])}"
+        )
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    # ------------------------------------------------------------------
+    # Search
+    # ------------------------------------------------------------------
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Best matching doa for `query`; the whole catalog for an empty one"""
+        self.ensure_loaded()
+        terms = list(dict.fromkeys(TOKEN.findall(normalize(query))))
+        if not terms:
+            return self.entries[:limit]
+
+        # Doa position -> (query terms matched, score)
+        ranked: Dict[int, Tuple[int, float]] = {}
+        for term in terms:
+            for position, score in self._match(term).items():
+                matched, total = ranked.get(position, (0, 0.0))
+                ranked[position] = (matched + 1, total + score)
+
+        if not ranked:
+            return []
+        # Keep the doa matching the most terms (every term, when any doa does)
+        best = max(matched for matched, _ in ranked.values())
+        phrase = " ".join(terms)
+        order = sorted(
+            (position for position, (matched, _) in ranked.items() if matched == best),
+            key=lambda position: (-(ranked[position][1] + self._phrase_bonus(position, phrase)), position)
+        )
+        return [self.entries[position] for position in order[:limit]]
+
+    def _phrase_bonus(self, position: int, phrase: str) -> float:
+        """PHRASE_BONUS when the query is one of the doa's names, half for a run inside one"""
+        names = self._phrases[position]
+        if phrase in names:
+            return PHRASE_BONUS
+        if any(f" {phrase} " in f" {name} " for name in names):
+            return PHRASE_BONUS / 2
+        return 0.0
+
+    def _match(self, term: str) -> Hit:
+        hits = dict(self._prefixes.get(term[:MAX_PREFIX], {}))
+        for position, weight in self._tokens.get(term, {}).items():
+            hits[position] = hits.get(position, weight) + EXACT_BONUS
+        if hits or len(term) < MIN_GRAM_TOKEN:
+            return hits
+
+        # No prefix hit: doa sharing enough trigrams with the term
+        term_grams = trigrams(term)
+        counts: Dict[int, int] = defaultdict(int)
+        for gram in term_grams:
+            for position in self._grams.get(gram, ()):
+                counts[position] += 1
+        return {
+            position: GRAM_PENALTY * count / len(term_grams)
+            for position, count in counts.items()
+            if count / len(term_grams) >= GRAM_MATCH
+        }
+
+
+# Global instance
+doa_index = DoaIndex()
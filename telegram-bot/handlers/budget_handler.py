@@ -2,7 +2,14 @@
 """
 AI-Powered Budget Calculator Handler
 Uses RAG + Agentic AI for optimal recommendations
+
+Once jamaah and duration are known, all preference variants are fetched in
+the background, so the answer is usually ready when the user taps step 3.
 """
+import asyncio
+import time
+from typing import Any, Dict, Hashable, Set, Tuple
+
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ContextTypes, 
@@ -12,12 +19,117 @@ from telegram.ext import (
     filters
 )
 from telegram.constants import ChatAction
-import httpx
-from config import API_URL
+from backend_client import backend_client
+from metrics import timed
 
 # Conversation states
 CHOOSING_JAMAAH, CHOOSING_DURATION, CHOOSING_BUDGET, SHOWING_RESULTS = range(4)
 
+PREFERENCES = ("all", "ekonomis", "standar", "premium")  # "all" is the most picked
+PREFETCH_TTL = 600  # Seconds a prefetched result stays usable
+
+PrefetchKey = Tuple[int, int, str]
+
+
+async def fetch_packages(jamaah: int, duration: int, preference: str) -> Dict[str, Any]:
+    """One /budget/optimize call; raises on any failure"""
+    response = await backend_client.request(
+        "/api/v1/budget/optimize",
+        "POST",
+        {
+            "jamaah": jamaah,
+            "duration": duration,
+            "preferences": {"type": preference}
+        }
+    )
+    if response.status_code != 200:
+        raise Exception("API Error")
+    return response.json()['data']
+
+
+class BudgetPrefetcher:
+    """
+    Speculative /budget/optimize calls, deduplicated across users
+    Every (jamaah, duration, preference) runs at most once at a time; a task
+    is cancelled as soon as nobody holds it any more, and dropped after
+    PREFETCH_TTL either way.
+    """
+    
+    def __init__(self, ttl: float = PREFETCH_TTL):
+        self.ttl = ttl
+        self._tasks: Dict[PrefetchKey, asyncio.Task] = {}
+        self._holders: Dict[PrefetchKey, Set[Hashable]] = {}
+        self._started: Dict[PrefetchKey, float] = {}
+        
+        self.prefetched = 0
+        self.served_ready = 0
+    
+    def start(self, holder: Hashable, jamaah: int, duration: int):
+        """Begin fetching every preference for this jamaah/duration"""
+        self._expire()
+        for preference in PREFERENCES:
+            self._acquire(holder, (jamaah, duration, preference))
+    
+    def _acquire(self, holder: Hashable, key: PrefetchKey) -> asyncio.Task:
+        task = self._tasks.get(key)
+        if task is None or (task.done() and (task.cancelled() or task.exception())):
+            task = self._tasks[key] = asyncio.create_task(
+                fetch_packages(*key), name=f"BudgetPrefetch:{key}"
+            )
+            self._started[key] = time.monotonic()
+            self.prefetched += 1
+        self._holders.setdefault(key, set()).add(holder)
+        return task
+    
+    async def result(self, holder: Hashable, jamaah: int, duration: int, preference: str) -> Dict[str, Any]:
+        """The prefetched answer (waiting for it if still running); raises on failure"""
+        task = self._acquire(holder, (jamaah, duration, preference))
+        if task.done():
+            self.served_ready += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self.release(holder)
+    
+    def ready(self, jamaah: int, duration: int, preference: str) -> bool:
+        task = self._tasks.get((jamaah, duration, preference))
+        return task is not None and task.done() and not task.cancelled() and not task.exception()
+    
+    def release(self, holder: Hashable):
+        """Holder lost interest (answered, went back, cancelled)"""
+        for key in [key for key, holders in self._holders.items() if holder in holders]:
+            holders = self._holders[key]
+            holders.discard(holder)
+            if not holders:
+                self._drop(key)
+    
+    def _drop(self, key: PrefetchKey):
+        task = self._tasks.pop(key, None)
+        if task is not None and not task.done():
+            task.cancel()
+        elif task is not None and not task.cancelled():
+            task.exception()  # Retrieved - no "never retrieved" warning
+        self._holders.pop(key, None)
+        self._started.pop(key, None)
+    
+    def _expire(self):
+        """Abandoned conversations: drop whatever is older than the TTL"""
+        cutoff = time.monotonic() - self.ttl
+        for key in [key for key, started in self._started.items() if started < cutoff]:
+            self._drop(key)
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "in_flight": sum(1 for task in self._tasks.values() if not task.done()),
+            "prefetched": self.prefetched,
+            "served_ready": self.served_ready
+        }
+
+
+# Global instance
+budget_prefetcher = BudgetPrefetcher()
+
+@timed("budget_start")
 async def budget_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Start budget optimization"""
     if update.message:
@@ -30,6 +142,7 @@ async def budget_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         return ConversationHandler.END
     
+    budget_prefetcher.release(update.effective_user.id)
     await chat.send_action(ChatAction.TYPING)
     
     keyboard = [
@@ -63,10 +176,12 @@ async def budget_start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return CHOOSING_JAMAAH
 
+@timed("choose_jamaah")
 async def choose_jamaah(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle jamaah selection"""
     query = update.callback_query
     await query.answer()
+    budget_prefetcher.release(update.effective_user.id)
     
     jamaah_map = {
         "budget_jamaah_1": 1,
@@ -94,6 +209,7 @@ async def choose_jamaah(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return CHOOSING_DURATION
 
+@timed("choose_duration")
 async def choose_duration(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle duration selection"""
     query = update.callback_query
@@ -108,6 +224,10 @@ async def choose_duration(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     context.user_data['duration'] = duration_map.get(query.data, 10)
     
+    # Speculate: fetch every preference while the user reads step 3
+    budget_prefetcher.release(update.effective_user.id)
+    budget_prefetcher.start(update.effective_user.id, context.user_data['jamaah'], context.user_data['duration'])
+    
     keyboard = [
         [InlineKeyboardButton("💰 Ekonomis (Budget Terbatas)", callback_data="budget_pref_ekonomis")],
         [InlineKeyboardButton("⭐ Standar (Balance)", callback_data="budget_pref_standar")],
@@ -126,6 +246,7 @@ async def choose_duration(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return CHOOSING_BUDGET
 
+@timed("analyze_budget")
 async def analyze_budget(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Call AI to analyze and recommend packages"""
     query = update.callback_query
@@ -140,61 +261,48 @@ async def analyze_budget(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     context.user_data['preference'] = preference_map.get(query.data, "all")
     
-    # Show loading message
-    await query.edit_message_text(
-        "🤖 *AI sedang menganalisis...*\n\n"
-        "⏳ Mencari kombinasi terbaik dari:\n"
-        "• 50+ hotel options\n"
-        "• 10+ airlines\n"
-        "• Real-time prices\n\n"
-        "Mohon tunggu 5-10 detik...",
-        parse_mode="Markdown"
-    )
-    
-    # Call backend API
     jamaah = context.user_data['jamaah']
     duration = context.user_data['duration']
     preference = context.user_data['preference']
     
+    # Show loading message (only when the prefetch has not finished yet)
+    if not budget_prefetcher.ready(jamaah, duration, preference):
+        await query.edit_message_text(
+            "🤖 *AI sedang menganalisis...*\n\n"
+            "⏳ Mencari kombinasi terbaik dari:\n"
+            "• 50+ hotel options\n"
+            "• 10+ airlines\n"
+            "• Real-time prices\n\n"
+            "Mohon tunggu 5-10 detik...",
+            parse_mode="Markdown"
+        )
+    
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                f"{API_URL}/api/v1/budget/optimize",
-                json={
-                    "jamaah": jamaah,
-                    "duration": duration,
-                    "preferences": {"type": preference}
-                }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                packages = data['data']['packages']
-                
-                # Format recommendations
-                result_text = await format_recommendations(packages, jamaah, duration, preference)
-                
-                keyboard = [
-                    [InlineKeyboardButton("📊 Detail Paket 1", callback_data="budget_detail_0")],
-                    [InlineKeyboardButton("📊 Detail Paket 2", callback_data="budget_detail_1")],
-                    [InlineKeyboardButton("📊 Detail Paket 3", callback_data="budget_detail_2")],
-                    [InlineKeyboardButton("🔄 Hitung Ulang", callback_data="budget_restart")],
-                    [InlineKeyboardButton("❌ Selesai", callback_data="budget_done")]
-                ]
-                
-                await query.edit_message_text(
-                    result_text,
-                    reply_markup=InlineKeyboardMarkup(keyboard),
-                    parse_mode="Markdown"
-                )
-                
-                # Save packages for detail view
-                context.user_data['packages'] = packages
-                
-                return SHOWING_RESULTS
-            else:
-                raise Exception("API Error")
-                
+        data = await budget_prefetcher.result(update.effective_user.id, jamaah, duration, preference)
+        packages = data['packages']
+        
+        # Format recommendations
+        result_text = await format_recommendations(packages, jamaah, duration, preference)
+        
+        keyboard = [
+            [InlineKeyboardButton("📊 Detail Paket 1", callback_data="budget_detail_0")],
+            [InlineKeyboardButton("📊 Detail Paket 2", callback_data="budget_detail_1")],
+            [InlineKeyboardButton("📊 Detail Paket 3", callback_data="budget_detail_2")],
+            [InlineKeyboardButton("🔄 Hitung Ulang", callback_data="budget_restart")],
+            [InlineKeyboardButton("❌ Selesai", callback_data="budget_done")]
+        ]
+        
+        await query.edit_message_text(
+            result_text,
+            reply_markup=InlineKeyboardMarkup(keyboard),
+            parse_mode="Markdown"
+        )
+        
+        # Save packages for detail view
+        context.user_data['packages'] = packages
+        
+        return SHOWING_RESULTS
+        
     except Exception as e:
         await query.edit_message_text(
             f"❌ Maaf, terjadi kesalahan saat menganalisis.\n\n"
@@ -250,6 +358,7 @@ Per Orang: Rp {pkg['per_person']:,.0f}
     
     return text
 
+@timed("show_package_detail")
 async def show_package_detail(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Show detailed breakdown of selected package"""
     query = update.callback_query
@@ -320,6 +429,7 @@ Subtotal: Rp {pkg['flight']['subtotal']:,.0f}
     
     return SHOWING_RESULTS
 
+@timed("back_to_summary")
 async def back_to_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Go back to summary view"""
     query = update.callback_query
@@ -348,6 +458,7 @@ async def back_to_summary(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return SHOWING_RESULTS
 
+@timed("budget_done")
 async def budget_done(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Finish budget conversation"""
     query = update.callback_query
@@ -363,10 +474,12 @@ async def budget_done(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return ConversationHandler.END
 
+@timed("budget_cancel")
 async def budget_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Cancel budget conversation"""
     query = update.callback_query
     await query.answer("Dibatalkan")
+    budget_prefetcher.release(update.effective_user.id)
     
     await query.edit_message_text(
         "❌ Analisis budget dibatalkan.\n\n"
@@ -376,11 +489,20 @@ async def budget_cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     return ConversationHandler.END
 
-def get_budget_handler():
-    """Get the budget conversation handler"""
+def get_budget_handler(persistent: bool = False):
+    """
+    Get the budget conversation handler (persistent when the app has a persistence)
+    
+    Persistent conversations are private-chat only: workers shard by chat_id,
+    and user_data (jamaah, duration, packages) lives on the shard of the
+    user's private chat (see persistence.py)
+    """
+    entry = filters.Regex("^💰 Budget$")
+    if persistent:
+        entry = entry & filters.ChatType.PRIVATE
     return ConversationHandler(
         entry_points=[
-            MessageHandler(filters.Regex("^💰 Budget$"), budget_start)
+            MessageHandler(entry, budget_start)
         ],
         states={
             CHOOSING_JAMAAH: [
@@ -405,5 +527,5 @@ def get_budget_handler():
             CallbackQueryHandler(budget_cancel, pattern="^budget_cancel$")
         ],
         name="budget_conversation",
-        persistent=False
+        persistent=persistent
     )
@@ -1,5 +1,12 @@
-from telegram import Update
-from telegram.ext import ContextTypes
+from telegram import Update, InlineQueryResultArticle, InputTextMessageContent
+from telegram.constants import ParseMode
+from telegram.ext import ContextTypes, InlineQueryHandler
+
+from doa_index import doa_index
+from metrics import timed
+
+INLINE_RESULTS = 20  # Telegram shows at most 50 per answer
+INLINE_CACHE_TIME = 3600  # The catalog is static; let Telegram cache answers
 
 async def command_doa(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /doa command"""
@@ -20,3 +27,22 @@ Contoh: ketik "Doa thawaf"
         doa_text,
         parse_mode='Markdown'
     )
+
+@timed("inline_doa")
+async def inline_doa(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Inline mode (@bot talbiyah): doa from the local index, no backend call"""
+    query = update.inline_query
+    results = [
+        InlineQueryResultArticle(
+            id=entry["id"],
+            title=entry["title"],
+            description=entry["latin"],
+            input_message_content=InputTextMessageContent(entry["message"], parse_mode=ParseMode.HTML)
+        )
+        for entry in doa_index.search(query.query, INLINE_RESULTS)
+    ]
+    await query.answer(results, cache_time=INLINE_CACHE_TIME)
+
+def get_inline_doa_handler() -> InlineQueryHandler:
+    """Inline-query handler for the doa catalog"""
+    return InlineQueryHandler(inline_doa)
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+"""
+Bot Metrics
+Prometheus text-format metrics on a local port (METRICS_HOST:METRICS_PORT,
+GET /metrics):
+
+- bot_handler_seconds{handler}: handler latency histogram (start, menu,
+  sholat, text, budget steps, ...), bot_handler_errors_total{handler}
+- bot_backend_request_seconds{endpoint,outcome}: every backend attempt
+- bot_telegram_api_errors_total{endpoint,error}: failed Bot API calls
+- gauges/counters read from the components at scrape time: update and send
+  queue depths, rate-limit rejections, dropped updates, cache hits, ...
+
+Counters are plain ints and floats updated on the event loop thread - no
+locks, no awaits, one dict lookup per observation. Histogram buckets are
+stored per bucket and only made cumulative when scraped.
+No prometheus_client dependency: the exposition format is written here.
+"""
+import asyncio
+import functools
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from loguru import logger
+from telegram.ext import ApplicationHandlerStop
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+READ_TIMEOUT = 5  # Seconds a scrape may take to send its request line
+
+Labels = Tuple[str, ...]
+# Collector result: one value, or label values -> value
+Sample = Union[float, Dict[Labels, float]]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label combination"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    """Bucketed latency distribution per label combination"""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # Label values -> [per-bucket counts (+Inf last), sum]
+        self._series: Dict[Labels, List[Any]] = {}
+
+    def observe(self, seconds: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, seconds)] += 1
+        series[1] += seconds
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+
+class Collected:
+    """Gauge or counter whose value is read from a component at scrape time"""
+
+    def __init__(self, name: str, kind: str, help: str, read: Callable[[], Sample], labels: Sequence[str] = ()):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.read = read
+        self.labels = tuple(labels)
+
+    def render(self) -> List[str]:
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.warning(f"Metric {self.name} unavailable: {e}")
+            return []
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        for labels, sample in samples:
+            labels = labels if isinstance(labels, tuple) else (labels,)
+            lines.append(f"{self.name}{_labels(self.labels, labels)} {_number(sample)}")
+        return lines
+
+
+class MetricsRegistry:
+    """All bot metrics plus the /metrics endpoint"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge_from(self, name: str, help: str, read: Callable[[], Sample], labels: Sequence[str] = ()):
+        self._register(Collected(name, "gauge", help, read, labels))
+
+    def counter_from(self, name: str, help: str, read: Callable[[], Sample], labels: Sequence[str] = ()):
+        self._register(Collected(name, "counter", help, read, labels))
+
+    def _register(self, metric):
+        # Re-registering (e.g. a rebuilt Application) replaces the old reader
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    # ------------------------------------------------------------------
+    # Exposition
+    # ------------------------------------------------------------------
+
+    async def start(self, host: str, port: int):
+        """Serve GET /metrics on host:port (port 0 disables it)"""
+        if not port or self._server is not None:
+            return
+        try:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        except OSError as e:
+            logger.error(f"Metrics endpoint not started on {host}:{port}: {e}")
+            return
+        logger.info(f"📈 Metrics on http://{host}:{port}/metrics")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+            # Headers are not needed; stop reading at the blank line
+            while (await asyncio.wait_for(reader.readline(), READ_TIMEOUT)).strip():
+                pass
+            parts = request_line.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", self.render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"not found\n"
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n".encode("latin-1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+# Global instance
+metrics = MetricsRegistry()
+
+HANDLER_SECONDS = metrics.histogram("bot_handler_seconds", "Handler latency", ["handler"])
+HANDLER_ERRORS = metrics.counter("bot_handler_errors_total", "Handlers that raised", ["handler"])
+BACKEND_SECONDS = metrics.histogram(
+    "bot_backend_request_seconds", "Backend request attempts", ["endpoint", "outcome"]
+)
+TELEGRAM_API_ERRORS = metrics.counter(
+    "bot_telegram_api_errors_total", "Failed Telegram Bot API calls", ["endpoint", "error"]
+)
+
+
+def timed(handler: str):
+    """Decorator: record a handler's latency (and failures) as `handler`"""
+
+    def decorate(callback):
+        @functools.wraps(callback)
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await callback(*args, **kwargs)
+            except ApplicationHandlerStop:
+                raise
+            except Exception:
+                HANDLER_ERRORS.inc(handler)
+                raise
+            finally:
+                HANDLER_SECONDS.observe(time.perf_counter() - started, handler)
+
+        return wrapper
+
+    return decorate
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Redis Persistence
+ConversationHandler states and context.user_data (e.g. the budget packages)
+live in Redis instead of process memory: a restart no longer drops
+in-flight budget conversations, and several bot workers can run side by
+side when each owns a shard of the chats (see sharding.py).
+
+- one key per conversation / user, each with its own TTL, so abandoned
+  state evicts itself
+- values: compact JSON, zlib-compressed above COMPRESS_MIN bytes
+- a worker only loads the keys of its own shard at startup
+- user_data belongs to the shard of the user's private chat (user_id ==
+  chat_id): only that shard writes it, and the budget conversation that
+  fills it runs in private chats only
+
+Enabled with REDIS_URL.
+"""
+import json
+import zlib
+from typing import Any, Dict, MutableMapping, Optional, Tuple, Union
+
+from loguru import logger
+from telegram.ext import BasePersistence, PersistenceInput
+
+from config import (
+    REDIS_URL,
+    CONVERSATION_STATE_TTL,
+    USER_DATA_TTL,
+    PERSISTENCE_UPDATE_INTERVAL
+)
+from sharding import shard_router
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+KEY_PREFIX = "umrah-bot"
+COMPRESS_MIN = 512  # Bytes; smaller values are stored as plain JSON
+SCAN_BATCH = 500
+
+ConversationKey = Tuple[Union[int, str], ...]
+
+
+def dumps(value: Any) -> bytes:
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) >= COMPRESS_MIN:
+        return b"z" + zlib.compress(raw)
+    return b"j" + raw
+
+
+def loads(blob: bytes) -> Any:
+    if blob[:1] == b"z":
+        return json.loads(zlib.decompress(blob[1:]))
+    return json.loads(blob[1:])
+
+
+class RedisPersistence(BasePersistence[Dict[str, Any], Dict[str, Any], Dict[str, Any]]):
+    """user_data + conversation states in Redis, one key each with a TTL"""
+
+    def __init__(
+        self,
+        redis_url: str,
+        conversation_ttl: int = 86400,
+        user_data_ttl: int = 7 * 86400,
+        update_interval: float = 5
+    ):
+        # Only what the bot actually keeps; chat/bot/callback data stay off
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.redis = aioredis.from_url(redis_url)
+        self.conversation_ttl = conversation_ttl
+        self.user_data_ttl = user_data_ttl
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _user_key(user_id: int) -> str:
+        return f"{KEY_PREFIX}:user_data:{user_id}"
+
+    @staticmethod
+    def _conversation_key(name: str, key: ConversationKey) -> str:
+        return f"{KEY_PREFIX}:conv:{name}:{':'.join(str(part) for part in key)}"
+
+    async def _load_prefix(self, prefix: str) -> Dict[str, Any]:
+        """Every key under prefix (SCAN + batched MGET) -> decoded value"""
+        found: Dict[str, Any] = {}
+        batch = []
+        async for key in self.redis.scan_iter(match=f"{prefix}*", count=SCAN_BATCH):
+            batch.append(key)
+            if len(batch) >= SCAN_BATCH:
+                found.update(await self._mget(batch))
+                batch = []
+        if batch:
+            found.update(await self._mget(batch))
+        return found
+
+    async def _mget(self, keys) -> Dict[str, Any]:
+        values = await self.redis.mget(keys)
+        return {
+            key.decode() if isinstance(key, bytes) else key: loads(value)
+            for key, value in zip(keys, values) if value is not None
+        }
+
+    # ------------------------------------------------------------------
+    # user_data
+    # ------------------------------------------------------------------
+
+    async def get_user_data(self) -> Dict[int, Dict[str, Any]]:
+        prefix = f"{KEY_PREFIX}:user_data:"
+        data = {}
+        for key, value in (await self._load_prefix(prefix)).items():
+            user_id = int(key[len(prefix):])
+            # Private chats: user_id == chat_id, so the user belongs to one shard
+            if shard_router.owns_chat(user_id):
+                data[user_id] = value
+        logger.info(f"💾 Restored user_data for {len(data)} users")
+        return data
+
+    async def update_user_data(self, user_id: int, data: Dict[str, Any]):
+        if not shard_router.owns_chat(user_id):
+            # A group update on another shard: its (empty) copy must not
+            # overwrite or delete what the owning shard stored
+            return
+        if data:
+            await self.redis.set(self._user_key(user_id), dumps(data), ex=self.user_data_ttl)
+        else:
+            await self.redis.delete(self._user_key(user_id))
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[str, Any]):
+        # Only the owning shard reads or writes the key, so its memory is
+        # authoritative - nothing to pull
+        pass
+
+    async def drop_user_data(self, user_id: int):
+        if not shard_router.owns_chat(user_id):
+            return
+        await self.redis.delete(self._user_key(user_id))
+
+    # ------------------------------------------------------------------
+    # Conversations
+    # ------------------------------------------------------------------
+
+    async def get_conversations(self, name: str) -> MutableMapping[ConversationKey, object]:
+        prefix = f"{KEY_PREFIX}:conv:{name}:"
+        conversations = {}
+        for key, state in (await self._load_prefix(prefix)).items():
+            conversation_key = tuple(int(part) for part in key[len(prefix):].split(":"))
+            if shard_router.owns_chat(conversation_key[0]):
+                conversations[conversation_key] = state
+        logger.info(f"💾 Restored {len(conversations)} '{name}' conversations")
+        return conversations
+
+    async def update_conversation(self, name: str, key: ConversationKey, new_state: Optional[object]):
+        redis_key = self._conversation_key(name, key)
+        if new_state is None:
+            await self.redis.delete(redis_key)
+        else:
+            await self.redis.set(redis_key, dumps(new_state), ex=self.conversation_ttl)
+
+    # ------------------------------------------------------------------
+    # Not persisted (see store_data)
+    # ------------------------------------------------------------------
+
+    async def get_chat_data(self) -> Dict[int, Dict[str, Any]]:
+        return {}
+
+    async def update_chat_data(self, chat_id: int, data: Dict[str, Any]):
+        pass
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[str, Any]):
+        pass
+
+    async def drop_chat_data(self, chat_id: int):
+        pass
+
+    async def get_bot_data(self) -> Dict[str, Any]:
+        return {}
+
+    async def update_bot_data(self, data: Dict[str, Any]):
+        pass
+
+    async def refresh_bot_data(self, bot_data: Dict[str, Any]):
+        pass
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def flush(self):
+        # Every update is written through; only the connection is left
+        await self.redis.aclose()
+
+
+def create_persistence() -> Optional[RedisPersistence]:
+    """RedisPersistence when REDIS_URL is configured, else None (in-memory state)"""
+    if not REDIS_URL:
+        return None
+    if aioredis is None:
+        logger.warning("REDIS_URL set but `redis` is not installed (see requirements.txt) - conversation state stays in memory")
+        return None
+    return RedisPersistence(REDIS_URL, CONVERSATION_STATE_TTL, USER_DATA_TTL, PERSISTENCE_UPDATE_INTERVAL)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+Per-User Rate Limiter
+Enforces RATE_LIMIT (messages per minute AND per hour) with the generic
+cell rate algorithm (GCRA) before any update reaches a handler.
+
+GCRA keeps one "theoretical arrival time" (TAT) per user and window instead
+of a log of timestamps: O(1) state and O(1) work per message. A window of
+N messages per P seconds admits one message every P/N seconds on average,
+with bursts of up to N.
+
+With REDIS_URL set the TATs live in Redis and are updated by one Lua
+script, so several bot instances share the same limits. Without it, or when Redis is unreachable, state stays in memory.
+"""
+import time
+from typing import Dict, List, Optional, Tuple
+
+from loguru import logger
+from telegram import Update
+from telegram.ext import ApplicationHandlerStop, ContextTypes
+
+from config import RATE_LIMIT, REDIS_URL
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+PRUNE_EVERY = 10000  # Checks between sweeps of users whose TATs have expired
+KEY_PREFIX = "umrah-bot:ratelimit"
+
+# KEYS: one TAT key per window. ARGV: (interval, tolerance) pairs, seconds.
+# Both windows must admit the message; TATs only advance when it is allowed.
+GCRA_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local tats = {}
+local retry = 0
+for i, key in ipairs(KEYS) do
+    local tat = math.max(tonumber(redis.call('GET', key) or 0), now)
+    tats[i] = tat
+    retry = math.max(retry, tat - tonumber(ARGV[2 * i]) - now)
+end
+if retry > 0 then
+    return {0, tostring(retry)}
+end
+for i, key in ipairs(KEYS) do
+    local tat = tats[i] + tonumber(ARGV[2 * i - 1])
+    redis.call('SET', key, tostring(tat), 'PX', math.ceil((tat - now) * 1000))
+end
+return {1, '0'}
+"""
+
+
+class GCRALimiter:
+    """Multi-window GCRA, in memory or shared through Redis"""
+
+    def __init__(self, limits: Dict[str, int], redis_url: Optional[str] = None):
+        # (name, emission interval, burst tolerance) per window
+        periods = {"messages_per_minute": 60.0, "messages_per_hour": 3600.0}
+        self.windows: List[Tuple[str, float, float]] = []
+        for name, count in limits.items():
+            if name in periods and count > 0:
+                interval = periods[name] / count
+                self.windows.append((name, interval, periods[name] - interval))
+
+        self._tats: Dict[int, List[float]] = {}
+        self._checks = 0
+        self.throttled = 0
+
+        self._redis = None
+        self._script = None
+        if redis_url:
+            if aioredis is None:
+                logger.warning("REDIS_URL set but `redis` is not installed (see requirements.txt) - rate limits stay per instance")
+            else:
+                self._redis = aioredis.from_url(redis_url)
+                self._script = self._redis.register_script(GCRA_SCRIPT)
+
+    async def hit(self, user_id: int) -> float:
+        """Count one message: 0 if allowed, else seconds until the next one is"""
+        if not self.windows:
+            return 0.0
+        if self._redis is not None:
+            try:
+                return await self._hit_redis(user_id)
+            except Exception as e:
+                logger.warning(f"Redis rate limiter unavailable, using local state: {e}")
+        return self._hit_local(user_id, time.monotonic())
+
+    def _hit_local(self, user_id: int, now: float) -> float:
+        self._checks += 1
+        if self._checks % PRUNE_EVERY == 0:
+            self._prune(now)
+
+        tats = self._tats.get(user_id)
+        if tats is None:
+            tats = [now] * len(self.windows)
+        tats = [max(tat, now) for tat in tats]
+
+        retry = max(tat - tolerance - now for tat, (_, _, tolerance) in zip(tats, self.windows))
+        if retry > 0:
+            self.throttled += 1
+            return retry
+
+        self._tats[user_id] = [tat + interval for tat, (_, interval, _) in zip(tats, self.windows)]
+        return 0.0
+
+    async def _hit_redis(self, user_id: int) -> float:
+        keys = [f"{KEY_PREFIX}:{name}:{user_id}" for name, _, _ in self.windows]
+        args = []
+        for _, interval, tolerance in self.windows:
+            args += [interval, tolerance]
+        allowed, retry = await self._script(keys=keys, args=args)
+        if int(allowed):
+            return 0.0
+        self.throttled += 1
+        return float(retry)
+
+    def _prune(self, now: float):
+        """Users whose TATs are all in the past are indistinguishable from new ones"""
+        expired = [user_id for user_id, tats in self._tats.items() if max(tats) <= now]
+        for user_id in expired:
+            del self._tats[user_id]
+
+    async def aclose(self):
+        if self._redis is not None:
+            await self._redis.aclose()
+
+
+class RateLimitGuard:
+    """Update hook: stops throttled updates before any handler (or backend call) runs"""
+
+    def __init__(self, limiter: GCRALimiter):
+        self.limiter = limiter
+        # Users already told to wait -> until when (one notice per throttle period)
+        self._notified: Dict[int, float] = {}
+
+    async def __call__(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user = update.effective_user
+        if user is None or not (update.message or update.callback_query):
+            return
+
+        retry = await self.limiter.hit(user.id)
+        if retry <= 0:
+            return
+
+        now = time.monotonic()
+        if self._notified.get(user.id, 0.0) <= now:
+            self._notified = {uid: until for uid, until in self._notified.items() if until > now}
+            self._notified[user.id] = now + retry
+            await self._reply(update, retry)
+        raise ApplicationHandlerStop
+
+    @staticmethod
+    async def _reply(update: Update, retry: float):
+        wait = f"{int(retry) + 1} detik" if retry < 60 else f"{int(retry // 60) + 1} menit"
+        text = (
+            "⏳ Pelan-pelan ya, pesan Anda terlalu banyak.\n"
+            f"Silakan coba lagi dalam {wait}. 🙏"
+        )
+        try:
+            if update.callback_query:
+                await update.callback_query.answer(text, show_alert=True)
+            else:
+                await update.message.reply_text(text)
+        except Exception as e:
+            logger.warning(f"Throttle notice failed: {e}")
+
+
+# Global instance
+rate_limiter = GCRALimiter(RATE_LIMIT, REDIS_URL)
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+"""
+Prayer Reminder Scheduler
+Sends "X menit lagi waktu sholat" to subscribed jamaah
+
+Design:
+- one min-heap entry per (city, day, prayer), not per user - the heap stays
+  tiny no matter how many jamaah subscribe
+- prayer times are fetched in bulk, once per city per local day
+- subscriptions live in user_manager, so the schedule is rebuilt after restart
+- fan-out is queued at bulk priority; the send scheduler paces it under
+  Telegram's flood limits behind interactive replies
+- each fan-out runs as its own task: the timer loop only pops due events,
+  so a city with thousands of subscribers never delays another reminder
+- planning runs as a task too, so a slow or unreachable backend never
+  holds up reminders that are already on the heap
+- cities are resolved by the backend at subscribe time and stored by their
+  canonical key ("medina" -> "madinah"); unknown names are rejected
+"""
+import asyncio
+import calendar
+import heapq
+import itertools
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+from config import PRAYER_TIME_REMINDER_MINUTES
+from send_scheduler import PRIORITY_BULK
+
+# Prayers that get a reminder (sunrise is not a prayer)
+REMINDER_PRAYERS = [
+    ("Fajr", "Subuh"),
+    ("Dhuhr", "Dzuhur"),
+    ("Asr", "Ashar"),
+    ("Maghrib", "Maghrib"),
+    ("Isha", "Isya"),
+]
+
+FANOUT_CHUNK = 200  # Sends queued at once (pacing is the send scheduler's job)
+PLAN_INTERVAL = 3600  # Re-check today/tomorrow tables every hour
+LATE_GRACE = 120  # Skip reminders that are more than 2 min overdue
+
+
+class ReminderScheduler:
+    """Min-heap reminder engine for prayer time notifications"""
+
+    def __init__(
+        self,
+        api,
+        users,
+        minutes_before: int = PRAYER_TIME_REMINDER_MINUTES,
+        fanout_chunk: int = FANOUT_CHUNK
+    ):
+        self.api = api
+        self.users = users
+        self.minutes_before = minutes_before
+        self.fanout_chunk = fanout_chunk
+
+        # (fire_ts, seq, city, day_iso, prayer_key, prayer_time)
+        self.heap: List[Tuple[float, int, str, str, str, str]] = []
+        self.subscribers: Dict[str, Set[int]] = defaultdict(set)
+        self.planned: Set[Tuple[str, str]] = set()
+        self.utc_offsets: Dict[str, float] = {}
+        self.labels: Dict[str, str] = {}
+
+        self.bot = None
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._next_plan = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._fanouts: Set[asyncio.Task] = set()
+        self._planner: Optional[asyncio.Task] = None
+
+    # ------------------------------------------------------------------
+    # Subscriptions
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """Rebuild in-memory subscriber sets from persistent storage"""
+        self.subscribers.clear()
+        for user in self.users.get_reminder_subscribers():
+            city = (user.get('reminder_city') or 'makkah').lower()
+            self.subscribers[city].add(user['user_id'])
+
+        total = sum(len(chats) for chats in self.subscribers.values())
+        logger.info(f"⏰ Reminders: {total} subscribers in {len(self.subscribers)} cities")
+
+    async def resolve_city(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Today's prayer data for a city name, as the backend resolved it
+
+        Returns None when the backend is unreachable; data["resolved"] is
+        False for a name the backend does not know (it answers with Makkah).
+        """
+        return await self._fetch_day(name.strip())
+
+    def subscribe(self, chat_id: int, city: str, today: Optional[Dict[str, Any]] = None):
+        """
+        Subscribe a private chat (chat_id == user_id) to a city's reminders
+
+        `city` is the canonical key from resolve_city (data["location_key"]);
+        passing that data as `today` schedules today's reminders right away.
+        """
+        city = city.strip().lower()
+        self.unsubscribe(chat_id, persist=False)
+        self.subscribers[city].add(chat_id)
+        self.users.set_reminder(chat_id, city)
+
+        if today and (city, today["date"]) not in self.planned:
+            self._push_day(city, today)
+
+        # Tomorrow (or a city resolved without data): plan on the next loop iteration
+        self._next_plan = 0.0
+        self._wakeup.set()
+
+    def unsubscribe(self, chat_id: int, persist: bool = True):
+        for chats in self.subscribers.values():
+            chats.discard(chat_id)
+        if persist:
+            self.users.set_reminder(chat_id, None)
+
+    def is_subscribed(self, chat_id: int) -> bool:
+        return any(chat_id in chats for chats in self.subscribers.values())
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    async def start(self, application):
+        """Start the background loop (call from Application.post_init)"""
+        self.bot = application.bot
+        self.load()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._planner:
+            self._planner.cancel()
+            await asyncio.gather(self._planner, return_exceptions=True)
+            self._planner = None
+        # Fan-outs still being paced out are abandoned on shutdown
+        fanouts = list(self._fanouts)
+        for task in fanouts:
+            task.cancel()
+        await asyncio.gather(*fanouts, return_exceptions=True)
+        self._fanouts.clear()
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    async def _fetch_day(self, city: str, day: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        payload = {"location": city}
+        if day:
+            payload["date"] = f"{day}T00:00:00"
+
+        result = await self.api.call_api("/api/v1/advanced/prayer-times", "POST", payload)
+        if not result or "data" not in result:
+            return None
+        return result["data"]
+
+    def _push_day(self, city: str, data: Dict[str, Any]):
+        """Push one city's reminders for one local day onto the heap"""
+        day_iso = data["date"]
+        offset = float(data.get("utc_offset", 3))
+        self.utc_offsets[city] = offset
+        self.labels[city] = data.get("location") or city.title()
+        self.planned.add((city, day_iso))
+
+        midnight = calendar.timegm(datetime.fromisoformat(day_iso).timetuple()) - offset * 3600
+        now = time.time()
+
+        for key, _ in REMINDER_PRAYERS:
+            hhmm = data["timings"].get(key, "--:--")
+            if ":" not in hhmm or hhmm.startswith("-"):
+                continue
+            hours, minutes = (int(part) for part in hhmm.split(":"))
+            fire_ts = midnight + (hours * 60 + minutes - self.minutes_before) * 60
+            if fire_ts > now:
+                heapq.heappush(self.heap, (fire_ts, next(self._seq), city, day_iso, key, hhmm))
+        # The loop may be sleeping towards a later event
+        self._wakeup.set()
+
+    async def _plan(self):
+        """Make sure every subscribed city has today and tomorrow scheduled"""
+        for city in [c for c, chats in self.subscribers.items() if chats]:
+            try:
+                if city not in self.utc_offsets:
+                    data = await self._fetch_day(city)
+                    if not data:
+                        continue
+                    if not self._canonical(city, data):
+                        continue
+                    if (city, data["date"]) not in self.planned:
+                        self._push_day(city, data)
+
+                offset = self.utc_offsets[city]
+                today = (datetime.utcnow() + timedelta(hours=offset)).date()
+                for day in (today, today + timedelta(days=1)):
+                    if (city, day.isoformat()) in self.planned:
+                        continue
+                    data = await self._fetch_day(city, day.isoformat())
+                    if data:
+                        self._push_day(city, data)
+            except Exception as e:
+                logger.error(f"Reminder planning failed for {city}: {e}")
+
+        # Forget planned days older than yesterday
+        cutoff = (datetime.utcnow() - timedelta(days=2)).date().isoformat()
+        self.planned = {key for key in self.planned if key[1] >= cutoff}
+
+    def _canonical(self, city: str, data: Dict[str, Any]) -> bool:
+        """
+        Check a stored city against the backend's answer
+
+        Subscriptions saved before cities were resolved may hold an alias
+        ("medina") or an unknown name; the first are moved to the canonical
+        key, the second get no reminders rather than Makkah times.
+        """
+        if data.get("resolved") is False:
+            logger.warning(f"Reminder city {city!r} is unknown; {len(self.subscribers[city])} subscribers skipped")
+            return False
+
+        key = data.get("location_key")
+        if not key or key == city:
+            return True
+
+        chats = self.subscribers.pop(city, set())
+        self.subscribers[key] |= chats
+        for chat_id in chats:
+            self.users.set_reminder(chat_id, key)
+        logger.info(f"⏰ Reminders: {len(chats)} subscribers moved from {city!r} to {key!r}")
+        self._next_plan = 0.0
+        return False
+
+    def _start_plan(self):
+        """Plan in the background; the timer loop never waits on the backend"""
+        self._planner = asyncio.create_task(self._plan(), name="reminder:plan")
+        self._planner.add_done_callback(self._plan_done)
+
+    def _plan_done(self, task: asyncio.Task):
+        self._planner = None
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Reminder planning failed: {task.exception()}")
+        self._wakeup.set()
+
+    # ------------------------------------------------------------------
+    # Dispatch
+    # ------------------------------------------------------------------
+
+    async def _run(self):
+        while True:
+            try:
+                now = time.time()
+                if now >= self._next_plan and self._planner is None:
+                    self._next_plan = now + PLAN_INTERVAL
+                    self._start_plan()
+
+                now = time.time()
+                while self.heap and self.heap[0][0] <= now:
+                    event = heapq.heappop(self.heap)
+                    if now - event[0] <= LATE_GRACE:
+                        self._start_fanout(event)
+
+                next_due = self.heap[0][0] if self.heap else float("inf")
+                # While a plan is running its completion wakes the loop
+                next_plan = self._next_plan if self._planner is None else float("inf")
+                timeout = max(0.0, min(next_due, next_plan) - time.time())
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Reminder loop error: {e}")
+                await asyncio.sleep(5)
+
+    def _start_fanout(self, event: Tuple[float, int, str, str, str, str]):
+        """Run one reminder's fan-out in the background; never awaited by the loop"""
+        task = asyncio.create_task(self._fire(event), name=f"reminder:{event[2]}:{event[4]}")
+        self._fanouts.add(task)
+        task.add_done_callback(self._fanout_done)
+
+    def _fanout_done(self, task: asyncio.Task):
+        self._fanouts.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Reminder fan-out {task.get_name()} failed: {task.exception()}")
+
+    async def _fire(self, event: Tuple[float, int, str, str, str, str]):
+        _, _, city, _, key, hhmm = event
+        chats = list(self.subscribers.get(city, ()))
+        if not chats:
+            return
+
+        name = dict(REMINDER_PRAYERS)[key]
+        text = (
+            f"⏰ *{self.minutes_before} menit lagi waktu {name}*\n\n"
+            f"🕌 {name}: {hhmm} ({self.labels.get(city, city.title())})\n"
+            "Bersiaplah untuk sholat berjamaah 🤲"
+        )
+
+        sent = await self._send_batched(chats, text)
+        logger.info(f"⏰ {name} reminder {city}: {sent}/{len(chats)} sent")
+
+    async def _send_batched(self, chats: List[int], text: str) -> int:
+        """Queue sends chunk by chunk; the send scheduler paces the actual rate"""
+        sent = 0
+        for i in range(0, len(chats), self.fanout_chunk):
+            batch = chats[i:i + self.fanout_chunk]
+            results = await asyncio.gather(*(self._send(chat, text) for chat in batch))
+            sent += sum(results)
+        return sent
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        for _ in range(2):
+            try:
+                await self.bot.send_message(
+                    chat_id, text, parse_mode="Markdown", rate_limit_args=PRIORITY_BULK
+                )
+                return True
+            except RetryAfter as e:
+                await asyncio.sleep(e.retry_after)
+            except Forbidden:
+                # User blocked the bot - stop reminding them
+                self.unsubscribe(chat_id)
+                return False
+            except TelegramError as e:
+                logger.warning(f"Reminder to {chat_id} failed: {e}")
+                return False
+        return False
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Backend Response Cache
+Prayer times change once a day per city, tips and navigation answers are
+static - the bot keeps them instead of asking the backend on every tap.
+
+- key: (endpoint, method, normalized params[, local date]) - "Makkah ",
+  "makkah" and "MAKKAH" are one entry; daily endpoints roll over at local
+  midnight (Saudi time)
+- TTL per endpoint (API_CACHE_TTLS), bounded LRU
+- request coalescing: concurrent misses for one key share a single call
+- stale serving: when the backend fails, an expired entry (up to
+  API_CACHE_STALE_SECONDS old) is returned with `stale: True` and
+  `cached_at`, so handlers can show it with a note instead of an error
+  (for daily endpoints the latest day on record, e.g. yesterday's table)
+"""
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, NamedTuple, Optional
+
+from loguru import logger
+
+
+class CacheEntry(NamedTuple):
+    value: Dict[str, Any]
+    expires: float  # time.monotonic()
+    cached_at: str  # ISO wall-clock time of the backend answer
+
+
+def normalize_params(value: Any) -> Any:
+    """Case/whitespace-insensitive strings, coordinates rounded to ~10 m"""
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    if isinstance(value, float):
+        return round(value, 4)
+    if isinstance(value, dict):
+        return {k: normalize_params(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [normalize_params(v) for v in value]
+    return value
+
+
+class ResponseCache:
+    """TTL + LRU cache of backend JSON answers with coalescing and stale fallback"""
+
+    def __init__(self, max_entries: int = 2048, stale_seconds: float = 7 * 86400, utc_offset: float = 3):
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self.utc_offset = utc_offset
+
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        # Request without the day -> its newest cached key (stale fallback across days)
+        self._latest: Dict[Hashable, Hashable] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.stale_served = 0
+
+    def key(self, endpoint: str, method: str, data: Optional[Dict], daily: bool = False) -> Hashable:
+        params = json.dumps(normalize_params(data or {}), sort_keys=True, ensure_ascii=False)
+        local_day = None
+        if daily:
+            local_day = (datetime.now(timezone.utc) + timedelta(hours=self.utc_offset)).date().isoformat()
+        return endpoint, method, params, local_day
+
+    async def get_or_fetch(
+        self,
+        key: Hashable,
+        ttl: float,
+        fetch: Callable[[], Awaitable[Optional[Dict[str, Any]]]]
+    ) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires > time.monotonic():
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.value
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            # A task of its own: a cancelled caller must not cancel the others
+            task = self._inflight[key] = asyncio.ensure_future(self._load(key, ttl, fetch))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _load(self, key: Hashable, ttl: float, fetch) -> Optional[Dict[str, Any]]:
+        try:
+            value = await fetch()
+        except Exception as e:
+            logger.warning(f"Cached fetch failed: {e}")
+            value = None
+        finally:
+            self._inflight.pop(key, None)
+
+        now = time.monotonic()
+        if value is not None:
+            self._entries[key] = CacheEntry(value, now + ttl, datetime.now().isoformat(timespec="seconds"))
+            self._entries.move_to_end(key)
+            self._latest[key[:3]] = key
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                if self._latest.get(evicted[:3]) == evicted:
+                    del self._latest[evicted[:3]]
+            return value
+
+        entry = self._entries.get(self._latest.get(key[:3], key))
+        if entry is not None and now - entry.expires < self.stale_seconds:
+            self.stale_served += 1
+            return {**entry.value, "stale": True, "cached_at": entry.cached_at}
+        return None
+
+    def clear(self):
+        self._entries.clear()
+        self._latest.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "stale_served": self.stale_served
+        }
@@ -0,0 +1,374 @@
+# -*- coding: utf-8 -*-
+"""
+Outbound Send Scheduler
+Every message the bot sends goes through one scheduler (PTB rate limiter
+hook), paced to Telegram's flood limits instead of tripping them:
+
+- token buckets: one global (~30 messages/s) and one per chat (1/s in
+  private chats, 20/min in groups), small bursts allowed
+- priorities: interactive replies overtake queued broadcasts for the
+  global tokens; a chat's own messages keep their order
+- RetryAfter: the chat is paused for the requested time, the global rate
+  backs off multiplicatively and creeps back up on success (AIMD), then the
+  request is retried
+- edit coalescing: an edit still waiting to be sent is dropped when a newer
+  edit of the same message arrives; both callers get the newer result
+
+Usage: interactive calls need nothing; bulk sends pass
+`rate_limit_args=PRIORITY_BULK`.
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from loguru import logger
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from config import (
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_PRIVATE_CHAT_RATE,
+    OUTBOUND_GROUP_CHAT_RATE,
+    OUTBOUND_CHAT_BURST,
+    OUTBOUND_MAX_RETRIES
+)
+from metrics import TELEGRAM_API_ERRORS
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+# Only message-producing calls are paced; everything else goes straight out
+PACED_PREFIXES = ("send", "edit", "copyMessage", "forwardMessage")
+UNPACED_ENDPOINTS = {"sendChatAction"}
+
+BACKOFF_FACTOR = 0.75  # Global rate multiplier per RetryAfter
+RECOVERY_STEP = 0.1  # Messages/s regained per successful send
+MIN_GLOBAL_RATE = 1.0
+PRUNE_EVERY = 1000  # Grants between sweeps of idle chat states
+
+Result = Union[bool, Dict[str, Any], List[Dict[str, Any]]]
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def refund(self):
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class ChatState:
+    """Per-chat bucket, FIFO lock and RetryAfter pause"""
+
+    __slots__ = ("bucket", "lock", "paused_until", "pending")
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, burst)
+        self.lock = asyncio.Lock()
+        self.paused_until = 0.0
+        self.pending = 0
+
+
+class EditSlot:
+    """A queued edit; `superseded_by` is set when a newer edit replaces it"""
+
+    __slots__ = ("done", "superseded_by")
+
+    def __init__(self):
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on it - never warn about an unretrieved error
+        self.done.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.superseded_by: Optional["EditSlot"] = None
+
+
+class SendScheduler(BaseRateLimiter[Union[int, Dict[str, Any]]]):
+    """Global + per-chat token buckets with priorities, AIMD backoff and edit coalescing"""
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        private_chat_rate: float = 1.0,
+        group_chat_rate: float = 20 / 60,
+        chat_burst: float = 3,
+        max_retries: int = 3
+    ):
+        self.max_global_rate = global_rate
+        self.private_chat_rate = private_chat_rate
+        self.group_chat_rate = group_chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._global = TokenBucket(global_rate, global_rate)
+        self._paused_until = 0.0
+        self._chats: Dict[Union[int, str], ChatState] = {}
+        self._edits: Dict[Tuple, EditSlot] = {}
+
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pump: Optional[asyncio.Task] = None
+        self._grants = 0
+
+        self.sent = 0
+        self.superseded = 0
+        self.retry_afters = 0
+
+    # ------------------------------------------------------------------
+    # BaseRateLimiter
+    # ------------------------------------------------------------------
+
+    async def initialize(self):
+        self._start()
+
+    async def shutdown(self):
+        if self._pump is not None:
+            self._pump.cancel()
+            await asyncio.gather(self._pump, return_exceptions=True)
+            self._pump = None
+        # Let whatever is still queued go out unpaced rather than hang
+        for _, _, granted in self._waiters:
+            if not granted.done():
+                granted.set_result(None)
+        self._waiters.clear()
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Result]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Union[int, Dict[str, Any]]],
+    ) -> Result:
+        if endpoint in UNPACED_ENDPOINTS or not endpoint.startswith(PACED_PREFIXES):
+            try:
+                return await callback(*args, **kwargs)
+            except Exception as e:
+                TELEGRAM_API_ERRORS.inc(endpoint, type(e).__name__)
+                raise
+
+        priority = self._priority(rate_limit_args)
+        edit_key = self._edit_key(endpoint, data)
+        edit = None
+        if edit_key is not None:
+            edit = EditSlot()
+            previous = self._edits.get(edit_key)
+            if previous is not None:
+                previous.superseded_by = edit
+            self._edits[edit_key] = edit
+
+        chat_id = data.get("chat_id")
+        chat = self._chat(chat_id) if chat_id is not None else None
+        if chat:
+            chat.pending += 1
+        try:
+            result = await self._send(callback, args, kwargs, priority, chat, edit, edit_key)
+        except asyncio.CancelledError:
+            if edit:
+                edit.done.cancel()
+            raise
+        except Exception as e:
+            if not (edit and edit.superseded_by):  # A superseded edit reports the newer one's error
+                TELEGRAM_API_ERRORS.inc(endpoint, type(e).__name__)
+            if edit and not edit.done.done():
+                edit.done.set_exception(e)
+            raise
+        finally:
+            if chat:
+                chat.pending -= 1
+            if edit_key is not None and self._edits.get(edit_key) is edit:
+                del self._edits[edit_key]
+
+        if edit and not edit.done.done():
+            edit.done.set_result(result)
+        return result
+
+    # ------------------------------------------------------------------
+    # Sending
+    # ------------------------------------------------------------------
+
+    async def _send(self, callback, args, kwargs, priority: int, chat: Optional[ChatState],
+                    edit: Optional[EditSlot], edit_key: Optional[Tuple]) -> Result:
+        for attempt in range(self.max_retries + 1):
+            if chat:
+                await chat.lock.acquire()
+            try:
+                if chat:
+                    await self._wait_chat(chat)
+                await self._grant(priority)
+
+                if edit and edit.superseded_by is not None:
+                    # A newer edit of this message is queued - skip this one
+                    self._global.refund()
+                    self.superseded += 1
+                else:
+                    if edit_key is not None and self._edits.get(edit_key) is edit:
+                        del self._edits[edit_key]  # In flight: can no longer be superseded
+                    if chat:
+                        chat.bucket.consume(time.monotonic())
+                    try:
+                        result = await callback(*args, **kwargs)
+                    except RetryAfter as e:
+                        self._backoff(chat, e.retry_after)
+                        if attempt >= self.max_retries:
+                            raise
+                        continue
+                    self.sent += 1
+                    self._recover()
+                    return result
+            finally:
+                if chat:
+                    chat.lock.release()
+
+            # Superseded: answer with the newest edit's outcome (outside the chat lock)
+            while edit.superseded_by is not None:
+                edit = edit.superseded_by
+            return await asyncio.shield(edit.done)
+
+    async def _wait_chat(self, chat: ChatState):
+        while True:
+            now = time.monotonic()
+            delay = max(chat.paused_until - now, chat.bucket.wait_time(now))
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def _grant(self, priority: int):
+        """Wait for a global token; lower priority value is served first"""
+        self._start()
+        granted = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._seq), granted))
+        self._wakeup.set()
+        await granted
+
+    def _start(self):
+        if self._pump is None:
+            self._wakeup = asyncio.Event()
+            self._pump = asyncio.create_task(self._run(), name="SendScheduler:pump")
+
+    async def _run(self):
+        while True:
+            while not self._waiters:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+
+            now = time.monotonic()
+            delay = max(self._paused_until - now, self._global.wait_time(now))
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, granted = heapq.heappop(self._waiters)
+            if granted.done():  # Caller went away
+                continue
+            self._global.consume(now)
+            granted.set_result(None)
+
+            self._grants += 1
+            if self._grants % PRUNE_EVERY == 0:
+                self._prune(now)
+
+    # ------------------------------------------------------------------
+    # Adaptation
+    # ------------------------------------------------------------------
+
+    def _backoff(self, chat: Optional[ChatState], retry_after: float):
+        now = time.monotonic()
+        self.retry_afters += 1
+        if chat:
+            chat.paused_until = max(chat.paused_until, now + retry_after)
+        else:
+            self._paused_until = max(self._paused_until, now + retry_after)
+        self._global.rate = max(MIN_GLOBAL_RATE, self._global.rate * BACKOFF_FACTOR)
+        logger.warning(
+            f"Telegram RetryAfter {retry_after}s - global rate now {self._global.rate:.1f}/s"
+        )
+
+    def _recover(self):
+        if self._global.rate < self.max_global_rate:
+            self._global.rate = min(self.max_global_rate, self._global.rate + RECOVERY_STEP)
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _priority(rate_limit_args: Optional[Union[int, Dict[str, Any]]]) -> int:
+        if isinstance(rate_limit_args, dict):
+            return int(rate_limit_args.get("priority", PRIORITY_INTERACTIVE))
+        if isinstance(rate_limit_args, int):
+            return rate_limit_args
+        return PRIORITY_INTERACTIVE
+
+    @staticmethod
+    def _edit_key(endpoint: str, data: Dict[str, Any]) -> Optional[Tuple]:
+        if not endpoint.startswith("edit"):
+            return None
+        if data.get("inline_message_id"):
+            return endpoint, data["inline_message_id"]
+        if data.get("chat_id") is not None and data.get("message_id") is not None:
+            return endpoint, data["chat_id"], data["message_id"]
+        return None
+
+    def _chat(self, chat_id: Union[int, str]) -> ChatState:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            # Negative ids and @usernames are groups / channels
+            group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_chat_rate if group else self.private_chat_rate
+            chat = self._chats[chat_id] = ChatState(rate, self.chat_burst)
+        return chat
+
+    def _prune(self, now: float):
+        """Forget idle chats whose bucket is full again (nothing left to enforce)"""
+        idle = [
+            chat_id for chat_id, chat in self._chats.items()
+            if not chat.pending and chat.paused_until <= now and chat.bucket.full(now)
+        ]
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._waiters),
+            "chats": len(self._chats),
+            "sent": self.sent,
+            "superseded_edits": self.superseded,
+            "retry_afters": self.retry_afters,
+            "global_rate": round(self._global.rate, 2)
+        }
+
+
+# Global instance
+send_scheduler = SendScheduler(
+    OUTBOUND_GLOBAL_RATE,
+    OUTBOUND_PRIVATE_CHAT_RATE,
+    OUTBOUND_GROUP_CHAT_RATE,
+    OUTBOUND_CHAT_BURST,
+    OUTBOUND_MAX_RETRIES
+)
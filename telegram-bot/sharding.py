@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+Chat Sharding
+Several bot workers split the chats between them: worker i of N owns every
+chat with chat_id % N == i, keeps that chat's state (persistence.py) and
+processes all of its updates - so a chat is never handled by two workers.
+
+Webhook mode only: whichever worker receives an update from the load
+balancer pushes it onto the owning worker's Redis list; each worker drains
+its own list into its Application. With BOT_SHARD_COUNT=1 (default)
+nothing is routed.
+"""
+import asyncio
+import json
+from typing import Any, Dict, Optional
+
+from loguru import logger
+from telegram import Update
+from telegram.ext import Application
+
+from config import REDIS_URL, BOT_SHARD_COUNT, BOT_SHARD_INDEX
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+KEY_PREFIX = "umrah-bot:updates"
+POP_TIMEOUT = 5  # Seconds per blocking pop, so shutdown is noticed
+
+
+class ShardRouter:
+    """Maps chats to workers and moves updates between them"""
+
+    def __init__(self, shard_count: int = 1, shard_index: int = 0, redis_url: str = ""):
+        self.shard_count = max(1, shard_count)
+        self.shard_index = shard_index
+        self.redis = None
+        if self.shard_count > 1:
+            if aioredis is None or not redis_url:
+                raise RuntimeError("BOT_SHARD_COUNT > 1 needs REDIS_URL and the `redis` package")
+            self.redis = aioredis.from_url(redis_url)
+        self._task: Optional[asyncio.Task] = None
+        self.forwarded = 0
+        self.received = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.shard_count > 1
+
+    def shard_of(self, chat_id: int) -> int:
+        return chat_id % self.shard_count
+
+    def owns_chat(self, chat_id: int) -> bool:
+        return self.shard_of(chat_id) == self.shard_index
+
+    def target(self, update: Update) -> int:
+        """Shard that must process this update (chat-less ones stay here)"""
+        chat = update.effective_chat
+        return self.shard_of(chat.id) if chat else self.shard_index
+
+    async def forward(self, shard: int, payload: Dict[str, Any]):
+        await self.redis.rpush(f"{KEY_PREFIX}:{shard}", json.dumps(payload, separators=(",", ":")))
+        self.forwarded += 1
+
+    # ------------------------------------------------------------------
+    # Consumer
+    # ------------------------------------------------------------------
+
+    async def start(self, application: Application):
+        """Feed updates forwarded by other workers into `application`"""
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._consume(application), name="ShardRouter:consumer")
+            logger.info(f"🧩 Shard {self.shard_index}/{self.shard_count} consuming forwarded updates")
+
+    async def _consume(self, application: Application):
+        key = f"{KEY_PREFIX}:{self.shard_index}"
+        while True:
+            try:
+                item = await self.redis.blpop([key], timeout=POP_TIMEOUT)
+                if item is None:
+                    continue
+                update = Update.de_json(json.loads(item[1]), application.bot)
+                await application.update_queue.put(update)
+                self.received += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Shard consumer error: {e}")
+                await asyncio.sleep(1)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.redis is not None:
+            await self.redis.aclose()
+
+
+# Global instance
+shard_router = ShardRouter(BOT_SHARD_COUNT, BOT_SHARD_INDEX, REDIS_URL)
@@ -1,22 +1,54 @@
 # -*- coding: utf-8 -*-
 """
 User Data Manager - Stores user preferences and state
+
+Backends (STORAGE_BACKEND in config.py):
+- sqlite: SQLiteUserManager - WAL mode, indexed by user_id (default)
+- tinydb: UserManager - single JSON file, rewritten on every write
+
+Conversations: a fixed-size ring per user (CONVERSATION_RING_SIZE) holds
+the recent context; older entries are evicted into an append-only archive
+that background compaction trims to CONVERSATION_RETENTION_DAYS.
 """
 from tinydb import TinyDB, Query
-from typing import Dict, Any, Optional
-from datetime import datetime
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime, timedelta
+import asyncio
+import itertools
+import json
 import logging
+import os
+import sqlite3
+import threading
+import time
+
+from config import (
+    STORAGE_BACKEND,
+    DB_PATH,
+    SQLITE_DB_PATH,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_INTERVAL,
+    CONVERSATION_RING_SIZE,
+    CONVERSATION_RETENTION_DAYS,
+    CONVERSATION_COMPACT_INTERVAL
+)
 
 logger = logging.getLogger(__name__)
 
 class UserManager:
     """Manage user data and preferences"""
     
+    # TinyDB is not thread-safe: the write-behind flusher must not call it
+    # from a worker thread while handlers read it on the event loop
+    thread_safe = False
+    
     def __init__(self, db_path: str = 'user_data.json'):
         self.db = TinyDB(db_path)
         self.users = self.db.table('users')
-        self.conversations = self.db.table('conversations')
+        self.conversations = self.db.table('conversations')  # Archive
+        self.recent = self.db.table('recent_conversations')  # One ring per user
         self.progress = self.db.table('progress')
+        self.ring_size = CONVERSATION_RING_SIZE
         
     def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user data"""
@@ -57,21 +89,63 @@ class UserManager:
         """Set user's location"""
         self.create_or_update_user(user_id, {'location': location})
     
+    def set_reminder(self, user_id: int, city: Optional[str]):
+        """Subscribe to prayer reminders for a city (None = unsubscribe)"""
+        self.create_or_update_user(user_id, {
+            'reminders': city is not None,
+            'reminder_city': city
+        })
+    
+    def get_reminder_subscribers(self) -> List[Dict[str, Any]]:
+        """All users subscribed to prayer reminders"""
+        User = Query()
+        return self.users.search(User.reminders == True)
+    
     def add_conversation(self, user_id: int, message: str, response: str, agent: str = "unknown"):
         """Add conversation to history"""
-        self.conversations.insert({
+        self._append_conversations([{
             'user_id': user_id,
             'message': message,
             'response': response[:500],  # Store summary
             'agent': agent,
             'timestamp': datetime.now().isoformat()
-        })
+        }])
+    
+    def _append_conversations(self, conversations: List[Dict[str, Any]]):
+        """Push onto each user's ring; entries falling off go to the archive"""
+        User = Query()
+        by_user: Dict[int, List[Dict[str, Any]]] = {}
+        for conversation in conversations:
+            by_user.setdefault(conversation['user_id'], []).append(conversation)
+        
+        evicted = []
+        for user_id, items in by_user.items():
+            ring = self.recent.get(User.user_id == user_id)
+            entries = (ring['items'] if ring else []) + items
+            evicted.extend(entries[:-self.ring_size])
+            entries = entries[-self.ring_size:]
+            if ring:
+                self.recent.update({'items': entries}, User.user_id == user_id)
+            else:
+                self.recent.insert({'user_id': user_id, 'items': entries})
+        if evicted:
+            self.conversations.insert_multiple(evicted)
     
     def get_conversation_history(self, user_id: int, limit: int = 10):
         """Get recent conversation history"""
         User = Query()
-        results = self.conversations.search(User.user_id == user_id)
-        return sorted(results, key=lambda x: x['timestamp'], reverse=True)[:limit]
+        ring = self.recent.get(User.user_id == user_id)
+        results = list(reversed(ring['items']))[:limit] if ring else []
+        if len(results) < limit:
+            # Older than the ring: archive (and conversations stored before the ring)
+            archived = self.conversations.search(User.user_id == user_id)
+            results += sorted(archived, key=lambda x: x['timestamp'], reverse=True)[:limit - len(results)]
+        return results
+    
+    def compact(self, retention_days: int = CONVERSATION_RETENTION_DAYS) -> int:
+        """Drop archived conversations older than the retention window"""
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        return len(self.conversations.remove(Query().timestamp < cutoff))
     
     def update_progress(self, user_id: int, step: str, completed: bool = True):
         """Update umrah progress"""
@@ -110,9 +184,576 @@ class UserManager:
         completed = sum(1 for step in steps if progress.get(step, {}).get('completed', False))
         return int((completed / len(steps)) * 100)
     
+    def write_batch(self, users: Dict[int, Dict[str, Any]], conversations: List[Dict[str, Any]]):
+        """Apply coalesced user updates and queued conversations (write-behind flush)"""
+        for user_id, data in users.items():
+            self.create_or_update_user(user_id, data)
+        if conversations:
+            self._append_conversations(conversations)
+    
     def close(self):
         """Close database connection"""
         self.db.close()
 
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL,
+    reminders INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_users_reminders ON users (reminders) WHERE reminders = 1;
+CREATE TABLE IF NOT EXISTS conversations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    message TEXT,
+    response TEXT,
+    agent TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_user ON conversations (user_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_conversations_timestamp ON conversations (timestamp);
+CREATE TABLE IF NOT EXISTS recent_conversations (
+    user_id INTEGER NOT NULL,
+    slot INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    message TEXT,
+    response TEXT,
+    agent TEXT,
+    timestamp TEXT NOT NULL,
+    PRIMARY KEY (user_id, slot)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS progress (
+    user_id INTEGER PRIMARY KEY,
+    steps TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Fixed SQL strings: sqlite3 keeps them prepared in its statement cache
+SQL_GET_USER = "SELECT data FROM users WHERE user_id = ?"
+SQL_UPSERT_USER = (
+    "INSERT INTO users (user_id, data, reminders) VALUES (?, ?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET data = excluded.data, reminders = excluded.reminders"
+)
+SQL_REMINDER_USERS = "SELECT data FROM users WHERE reminders = 1"
+SQL_ARCHIVE_CONVERSATION = (
+    "INSERT INTO conversations (user_id, message, response, agent, timestamp) VALUES (?, ?, ?, ?, ?)"
+)
+SQL_ARCHIVED = (
+    "SELECT user_id, message, response, agent, timestamp FROM conversations "
+    "WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?"
+)
+SQL_RING_HEAD = "SELECT MAX(seq) FROM recent_conversations WHERE user_id = ?"
+SQL_RING_EVICT = (
+    "INSERT INTO conversations (user_id, message, response, agent, timestamp) "
+    "SELECT user_id, message, response, agent, timestamp FROM recent_conversations "
+    "WHERE user_id = ? AND slot = ?"
+)
+SQL_RING_PUT = (
+    "INSERT INTO recent_conversations (user_id, slot, seq, message, response, agent, timestamp) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (user_id, slot) DO UPDATE SET "
+    "seq = excluded.seq, message = excluded.message, response = excluded.response, "
+    "agent = excluded.agent, timestamp = excluded.timestamp"
+)
+SQL_RING = (
+    "SELECT user_id, message, response, agent, timestamp FROM recent_conversations "
+    "WHERE user_id = ? ORDER BY seq DESC LIMIT ?"
+)
+# Ring size changed: keep the newest CONVERSATION_RING_SIZE per user, archive the rest
+SQL_RING_MISFIT = "SELECT 1 FROM recent_conversations WHERE slot != seq % ? LIMIT 1"
+_RING_OLD = (
+    "seq <= (SELECT MAX(seq) FROM recent_conversations AS newest "
+    "WHERE newest.user_id = recent_conversations.user_id) - ?"
+)
+SQL_RING_FOLD = (
+    "INSERT INTO conversations (user_id, message, response, agent, timestamp) "
+    "SELECT user_id, message, response, agent, timestamp FROM recent_conversations "
+    "WHERE " + _RING_OLD + " ORDER BY seq"
+)
+SQL_RING_TRIM = "DELETE FROM recent_conversations WHERE " + _RING_OLD
+SQL_PURGE_ARCHIVE = (
+    "DELETE FROM conversations WHERE id IN "
+    "(SELECT id FROM conversations WHERE timestamp < ? LIMIT ?)"
+)
+SQL_GET_PROGRESS = "SELECT steps FROM progress WHERE user_id = ?"
+SQL_UPSERT_PROGRESS = (
+    "INSERT INTO progress (user_id, steps) VALUES (?, ?) "
+    "ON CONFLICT (user_id) DO UPDATE SET steps = excluded.steps"
+)
+
+MIGRATION_BATCH = 1000
+COMPACT_BATCH = 5000  # Archive rows deleted per transaction
+CONVERSATION_KEYS = ('user_id', 'message', 'response', 'agent', 'timestamp')
+
+
+class SQLiteUserManager(UserManager):
+    """
+    Same API as UserManager on SQLite (WAL)
+    Lookups go through the user_id primary key: O(log n) instead of a scan
+    
+    Writes use `conn` (guarded by `_lock`); reads use their own read-only
+    connection, so a write-behind flush transaction never blocks a handler
+    lookup - WAL lets readers see the last committed state meanwhile.
+    """
+    
+    thread_safe = True
+    
+    def __init__(self, db_path: str = 'user_data.sqlite3', migrate_from: Optional[str] = None):
+        self.db_path = db_path
+        self.ring_size = CONVERSATION_RING_SIZE
+        self._lock = threading.RLock()
+        self._read_lock = threading.Lock()
+        self.conn = sqlite3.connect(
+            db_path,
+            check_same_thread=False,
+            isolation_level=None,  # Explicit transactions below
+            cached_statements=64
+        )
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # Only takes effect on a new file
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        
+        if db_path == ':memory:':
+            # A second connection would open a different, empty database
+            self.reader, self._read_lock = self.conn, self._lock
+        else:
+            self.reader = sqlite3.connect(db_path, check_same_thread=False, cached_statements=64)
+            self.reader.execute("PRAGMA query_only=ON")
+        
+        if migrate_from and os.path.exists(migrate_from):
+            self.migrate_tinydb(migrate_from)
+        
+        # A CONVERSATION_RING_SIZE change must be applied before the first
+        # push: _ring_push assumes slot == seq % ring_size
+        self._refit_rings()
+    
+    # ------------------------------------------------------------------
+    # Users
+    # ------------------------------------------------------------------
+    
+    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get user data"""
+        with self._read_lock:
+            row = self.reader.execute(SQL_GET_USER, (user_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def create_or_update_user(self, user_id: int, data: Dict[str, Any]):
+        """Create or update user"""
+        self.write_batch({user_id: data}, [])
+    
+    def _merge_user(self, user_id: int, data: Dict[str, Any], now: str):
+        row = self.conn.execute(SQL_GET_USER, (user_id,)).fetchone()
+        if row:
+            data = {**json.loads(row[0]), **data, 'updated_at': now}
+        else:
+            data = {**data, 'user_id': user_id, 'created_at': now, 'updated_at': now}
+        self.conn.execute(SQL_UPSERT_USER, self._user_row(user_id, data))
+    
+    @staticmethod
+    def _user_row(user_id: int, data: Dict[str, Any]) -> Tuple[int, str, int]:
+        return user_id, json.dumps(data, ensure_ascii=False), 1 if data.get('reminders') else 0
+    
+    def get_reminder_subscribers(self) -> List[Dict[str, Any]]:
+        """All users subscribed to prayer reminders"""
+        with self._read_lock:
+            rows = self.reader.execute(SQL_REMINDER_USERS).fetchall()
+        return [json.loads(row[0]) for row in rows]
+    
+    # ------------------------------------------------------------------
+    # Conversations
+    # ------------------------------------------------------------------
+    
+    def add_conversation(self, user_id: int, message: str, response: str, agent: str = "unknown"):
+        """Add conversation to history"""
+        self.write_batch({}, [{
+            'user_id': user_id,
+            'message': message,
+            'response': response[:500],  # Store summary
+            'agent': agent,
+            'timestamp': datetime.now().isoformat()
+        }])
+    
+    def _ring_push(self, conversation: Dict[str, Any]):
+        """Overwrite the user's oldest ring slot, archiving what was there"""
+        user_id = conversation['user_id']
+        head = self.conn.execute(SQL_RING_HEAD, (user_id,)).fetchone()[0]
+        seq = 0 if head is None else head + 1
+        slot = seq % self.ring_size
+        if seq >= self.ring_size:
+            self.conn.execute(SQL_RING_EVICT, (user_id, slot))
+        self.conn.execute(SQL_RING_PUT, (
+            user_id, slot, seq, conversation['message'], conversation['response'],
+            conversation['agent'], conversation['timestamp']
+        ))
+    
+    def get_conversation_history(self, user_id: int, limit: int = 10):
+        """Get recent conversation history - O(limit), independent of archive size"""
+        with self._read_lock:
+            rows = self.reader.execute(SQL_RING, (user_id, limit)).fetchall()
+            if len(rows) < limit:
+                # Older than the ring: index range scan on the archive
+                rows += self.reader.execute(SQL_ARCHIVED, (user_id, limit - len(rows))).fetchall()
+        return [dict(zip(CONVERSATION_KEYS, row)) for row in rows]
+    
+    def compact(self, retention_days: int = CONVERSATION_RETENTION_DAYS) -> int:
+        """
+        Background maintenance: trim the archive to the retention window in
+        small transactions, re-fit rings after a CONVERSATION_RING_SIZE
+        change, then give pages back and truncate the WAL
+        """
+        cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+        removed = 0
+        while True:
+            with self._lock:
+                deleted = self.conn.execute(SQL_PURGE_ARCHIVE, (cutoff, COMPACT_BATCH)).rowcount
+            removed += deleted
+            if deleted < COMPACT_BATCH:
+                break
+        
+        with self._lock:
+            self._refit_rings()
+            self.conn.execute("PRAGMA incremental_vacuum")
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return removed
+    
+    def _refit_rings(self):
+        """Re-slot every ring for the current ring_size (no-op when they fit)"""
+        with self._lock:
+            if not self.conn.execute(SQL_RING_MISFIT, (self.ring_size,)).fetchone():
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.execute(SQL_RING_FOLD, (self.ring_size,))
+                self.conn.execute(SQL_RING_TRIM, (self.ring_size,))
+                # Two steps: negative slots first so no row collides mid-update
+                self.conn.execute("UPDATE recent_conversations SET slot = -1 - slot")
+                self.conn.execute("UPDATE recent_conversations SET slot = seq % ?", (self.ring_size,))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+    
+    # ------------------------------------------------------------------
+    # Progress
+    # ------------------------------------------------------------------
+    
+    def update_progress(self, user_id: int, step: str, completed: bool = True):
+        """Update umrah progress"""
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(SQL_GET_PROGRESS, (user_id,)).fetchone()
+                steps = json.loads(row[0]) if row else {}
+                steps[step] = {
+                    'completed': completed,
+                    'timestamp': datetime.now().isoformat()
+                }
+                self.conn.execute(SQL_UPSERT_PROGRESS, (user_id, json.dumps(steps)))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+    
+    def get_progress(self, user_id: int) -> Dict[str, Any]:
+        """Get user's umrah progress"""
+        with self._read_lock:
+            row = self.reader.execute(SQL_GET_PROGRESS, (user_id,)).fetchone()
+        return json.loads(row[0]) if row else {}
+    
+    def write_batch(self, users: Dict[int, Dict[str, Any]], conversations: List[Dict[str, Any]]):
+        """Apply coalesced user updates and queued conversations in one transaction"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for user_id, data in users.items():
+                    self._merge_user(user_id, data, now)
+                for conversation in conversations:
+                    self._ring_push(conversation)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+    
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+    
+    def migrate_tinydb(self, json_path: str, batch_size: int = MIGRATION_BATCH) -> Dict[str, int]:
+        """
+        One-shot import of a TinyDB user_data.json (skipped if already done)
+        Not streamed: the JSON file is parsed whole (TinyDB itself keeps it in
+        memory too), then inserted in batches of `batch_size` in one transaction
+        """
+        marker = f"migrated:{os.path.abspath(json_path)}"
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM meta WHERE key = ?", (marker,)).fetchone():
+                return {}
+        
+        with open(json_path, encoding='utf-8') as f:
+            tables = json.load(f)
+        
+        def users() -> Iterator[Tuple[int, str, int]]:
+            for doc in tables.get('users', {}).values():
+                if 'user_id' in doc:
+                    yield self._user_row(int(doc['user_id']), doc)
+        
+        def conversations() -> Iterator[Tuple]:
+            # Old entries (and TinyDB rings) all go to the archive
+            rings = tables.get('recent_conversations', {}).values()
+            docs = itertools.chain(
+                tables.get('conversations', {}).values(),
+                itertools.chain.from_iterable(ring.get('items', []) for ring in rings)
+            )
+            for doc in docs:
+                yield (doc.get('user_id'), doc.get('message'), doc.get('response'),
+                       doc.get('agent', 'unknown'), doc.get('timestamp', ''))
+        
+        def progress() -> Iterator[Tuple[int, str]]:
+            for doc in tables.get('progress', {}).values():
+                yield int(doc['user_id']), json.dumps(doc.get('steps', {}))
+        
+        counts = {}
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for name, sql, rows in (
+                    ('users', SQL_UPSERT_USER, users()),
+                    ('conversations', SQL_ARCHIVE_CONVERSATION, conversations()),
+                    ('progress', SQL_UPSERT_PROGRESS, progress()),
+                ):
+                    counts[name] = 0
+                    batch = []
+                    for row in rows:
+                        batch.append(row)
+                        if len(batch) >= batch_size:
+                            self.conn.executemany(sql, batch)
+                            counts[name] += len(batch)
+                            batch.clear()
+                    if batch:
+                        self.conn.executemany(sql, batch)
+                        counts[name] += len(batch)
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES (?, ?)",
+                    (marker, datetime.now().isoformat())
+                )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        
+        logger.info(f"Migrated {json_path} to SQLite: {counts}")
+        return counts
+    
+    def close(self):
+        """Close database connection"""
+        with self._read_lock:
+            if self.reader is not self.conn:
+                self.reader.close()
+        with self._lock:
+            self.conn.close()
+
+
+class WriteBehindUserManager(UserManager):
+    """
+    Async write-behind in front of a UserManager store
+    Handlers only touch memory: user updates are coalesced per user,
+    conversations appended, and a background task flushes them once
+    WRITE_BEHIND_BATCH_SIZE writes are pending or every WRITE_BEHIND_INTERVAL
+    seconds - in a worker thread for thread-safe stores (SQLite), inline on
+    the event loop for TinyDB. Reads see pending writes.
+    """
+    
+    def __init__(
+        self,
+        store: UserManager,
+        batch_size: int = 200,
+        interval: float = 1.0,
+        compact_interval: float = 3600.0
+    ):
+        self.store = store
+        self.batch_size = max(1, batch_size)
+        self.interval = interval
+        self.compact_interval = compact_interval
+        self._next_compact = 0.0
+        
+        self._users: Dict[int, Dict[str, Any]] = {}
+        self._conversations: List[Dict[str, Any]] = []
+        # Batch being written right now - still visible to reads
+        self._flushing_users: Dict[int, Dict[str, Any]] = {}
+        self._flushing_conversations: List[Dict[str, Any]] = []
+        
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+    
+    @property
+    def pending(self) -> int:
+        return len(self._users) + len(self._conversations)
+    
+    # ------------------------------------------------------------------
+    # Writes (memory only while the flusher runs)
+    # ------------------------------------------------------------------
+    
+    def create_or_update_user(self, user_id: int, data: Dict[str, Any]):
+        """Create or update user"""
+        if self._task is None:
+            # Not started (scripts, shutdown): write through
+            self.store.create_or_update_user(user_id, data)
+            return
+        self._users[user_id] = {**self._users.get(user_id, {}), **data}
+        self._notify()
+    
+    def add_conversation(self, user_id: int, message: str, response: str, agent: str = "unknown"):
+        """Add conversation to history"""
+        if self._task is None:
+            self.store.add_conversation(user_id, message, response, agent)
+            return
+        self._conversations.append({
+            'user_id': user_id,
+            'message': message,
+            'response': response[:500],  # Store summary
+            'agent': agent,
+            'timestamp': datetime.now().isoformat()
+        })
+        self._notify()
+    
+    def _notify(self):
+        if self.pending >= self.batch_size:
+            self._wakeup.set()
+    
+    # ------------------------------------------------------------------
+    # Reads (store + pending overlay)
+    # ------------------------------------------------------------------
+    
+    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Get user data"""
+        user = self.store.get_user(user_id)
+        overlay = {**self._flushing_users.get(user_id, {}), **self._users.get(user_id, {})}
+        if not overlay:
+            return user
+        return {**(user or {'user_id': user_id}), **overlay}
+    
+    def get_reminder_subscribers(self) -> List[Dict[str, Any]]:
+        """All users subscribed to prayer reminders"""
+        users = {user['user_id']: user for user in self.store.get_reminder_subscribers()}
+        for user_id in {*self._flushing_users, *self._users}:
+            user = self.get_user(user_id)
+            if user.get('reminders'):
+                users[user_id] = user
+            else:
+                users.pop(user_id, None)
+        return list(users.values())
+    
+    def get_conversation_history(self, user_id: int, limit: int = 10):
+        """Get recent conversation history"""
+        pending = [
+            c for c in self._flushing_conversations + self._conversations
+            if c['user_id'] == user_id
+        ]
+        stored = self.store.get_conversation_history(user_id, limit) if len(pending) < limit else []
+        return sorted(stored + pending, key=lambda x: x['timestamp'], reverse=True)[:limit]
+    
+    def update_progress(self, user_id: int, step: str, completed: bool = True):
+        """Update umrah progress"""
+        self.store.update_progress(user_id, step, completed)
+    
+    def get_progress(self, user_id: int) -> Dict[str, Any]:
+        """Get user's umrah progress"""
+        return self.store.get_progress(user_id)
+    
+    # ------------------------------------------------------------------
+    # Flushing
+    # ------------------------------------------------------------------
+    
+    async def flush(self):
+        """Write everything pending in one batch"""
+        async with self._flush_lock:
+            if not self.pending:
+                return
+            self._flushing_users, self._users = self._users, {}
+            self._flushing_conversations, self._conversations = self._conversations, []
+            try:
+                await self._offload(
+                    self.store.write_batch, self._flushing_users, self._flushing_conversations
+                )
+            except Exception as e:
+                # Put the batch back in front of newer writes and retry next round
+                logger.error(f"Write-behind flush failed: {e}")
+                for user_id, data in self._flushing_users.items():
+                    self._users[user_id] = {**data, **self._users.get(user_id, {})}
+                self._conversations[:0] = self._flushing_conversations
+            finally:
+                self._flushing_users, self._flushing_conversations = {}, []
+    
+    async def _offload(self, call, *args):
+        """Worker thread for thread-safe stores; TinyDB runs inline (no concurrent reads)"""
+        if self.store.thread_safe:
+            return await asyncio.to_thread(call, *args)
+        return call(*args)
+    
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+            
+            if time.monotonic() >= self._next_compact:
+                self._next_compact = time.monotonic() + self.compact_interval
+                await self.compact()
+    
+    async def compact(self):
+        """Conversation retention / compaction (worker thread for SQLite)"""
+        async with self._flush_lock:
+            try:
+                removed = await self._offload(self.store.compact)
+                if removed:
+                    logger.info(f"Compaction removed {removed} archived conversations")
+            except Exception as e:
+                logger.error(f"Conversation compaction failed: {e}")
+    
+    async def start(self):
+        """Start the background flusher (call from Application.post_init)"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._next_compact = time.monotonic() + self.compact_interval
+        self._task = asyncio.create_task(self._run(), name="UserManager:write_behind")
+    
+    async def stop(self):
+        """Stop the flusher and write out everything still pending"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        await self.flush()
+        self._task = None
+        if self.pending:
+            # Last resort: synchronous write so nothing is lost on shutdown
+            self.store.write_batch(self._users, self._conversations)
+            self._users, self._conversations = {}, []
+    
+    def close(self):
+        """Close database connection"""
+        self.store.close()
+
+
 # Global instance
-user_manager = UserManager()
\ No newline at end of file
+if STORAGE_BACKEND == 'tinydb':
+    user_store = UserManager(DB_PATH)
+else:
+    user_store = SQLiteUserManager(SQLITE_DB_PATH, migrate_from=DB_PATH)
+user_manager = WriteBehindUserManager(
+    user_store,
+    WRITE_BEHIND_BATCH_SIZE,
+    WRITE_BEHIND_INTERVAL,
+    CONVERSATION_COMPACT_INTERVAL
+)
\ No newline at end of file
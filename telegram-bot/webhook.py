@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Webhook Server
+Telegram pushes updates to a small ASGI app (Starlette + uvicorn) instead of
+long polling. The endpoint only enqueues the update and answers 200 at once;
+the Application processes queued updates concurrently (CONCURRENT_UPDATES).
+With several workers (BOT_SHARD_COUNT), updates of chats owned by another
+worker are handed over through Redis (see sharding.py).
+"""
+import hmac
+from contextlib import asynccontextmanager
+
+import uvicorn
+from loguru import logger
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from telegram.ext import Application
+
+from config import (
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_PORT,
+    WEBHOOK_MAX_CONNECTIONS
+)
+from sharding import shard_router
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def create_app(application: Application) -> Starlette:
+    """ASGI app that feeds Telegram updates into `application`"""
+
+    async def telegram_webhook(request: Request) -> Response:
+        if WEBHOOK_SECRET and not hmac.compare_digest(
+            request.headers.get(SECRET_HEADER, ""), WEBHOOK_SECRET
+        ):
+            return Response(status_code=403)
+
+        try:
+            payload = await request.json()
+            update = Update.de_json(payload, application.bot)
+        except Exception as e:
+            logger.warning(f"Invalid webhook payload: {e}")
+            return Response(status_code=400)
+
+        if shard_router.enabled:
+            shard = shard_router.target(update)
+            if shard != shard_router.shard_index:
+                await shard_router.forward(shard, payload)
+                return Response()
+
+        await application.update_queue.put(update)
+        return Response()
+
+    async def health(request: Request) -> Response:
+        return PlainTextResponse("ok" if application.running else "starting",
+                                 status_code=200 if application.running else 503)
+
+    @asynccontextmanager
+    async def lifespan(app: Starlette):
+        await application.initialize()
+        if application.post_init:
+            await application.post_init(application)
+
+        await application.bot.set_webhook(
+            url=f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET or None,
+            allowed_updates=Update.ALL_TYPES,
+            max_connections=WEBHOOK_MAX_CONNECTIONS
+        )
+        await application.start()
+        await shard_router.start(application)
+        logger.info(f"🌐 Webhook active: {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+
+        try:
+            yield
+        finally:
+            # Keep the webhook registered: Telegram queues updates during redeploys
+            await shard_router.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+            await application.shutdown()
+            if application.post_shutdown:
+                await application.post_shutdown(application)
+
+    return Starlette(
+        routes=[
+            Route(WEBHOOK_PATH, telegram_webhook, methods=["POST"]),
+            Route("/health", health, methods=["GET"]),
+        ],
+        lifespan=lifespan
+    )
+
+
+def run_webhook(application: Application):
+    """Serve the webhook with uvicorn (blocks until shutdown)"""
+    uvicorn.run(
+        create_app(application),
+        host="0.0.0.0",
+        port=WEBHOOK_PORT,
+        log_level="warning"
+    )